@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from typing import Union
+from typing import TYPE_CHECKING, Union, Optional
 from c4dot5.nodes import Node, LeafNode, DecisionNode
 from c4dot5.attributes import NodeAttributes, from_str_to_enum
 from c4dot5.attributes import NodeType, AttributeType
@@ -8,8 +9,12 @@ from c4dot5.training import create_leaf_node
 from c4dot5.splitting import get_split_gain_continuous, get_split_gain_categorical
 from c4dot5.exceptions import LeafNotFound
 from c4dot5.predictor import PredictionHandler
+from c4dot5.compiling import CompiledTree, compile_tree, build_nodes
 from c4dot5.exceptions import RootNodeNotFound, PredictionHandlerNotFound
 
+if TYPE_CHECKING:
+    from scipy import sparse
+
 
 class DecisionTree:
     """ class implementing a decision tree """
@@ -29,24 +34,40 @@ class DecisionTree:
                 }
         self.prediction_handler = None
         self.complete_dataset = None
+        self.compiled_tree = None
+        # the nodes of a loaded compiled tree are created only when needed
+        self._nodes_to_build = False
+        # type of the training values of the categorical attributes
+        self.category_types = {}
     
+    def __setstate__(self, state: dict):
+        # trees pickled before the compiled tree are compiled when first needed
+        state.setdefault('compiled_tree', None)
+        # trees pickled before the loading of compiled trees have their nodes
+        state.setdefault('_nodes_to_build', False)
+        # trees pickled before the types of the categories cast no value
+        state.setdefault('category_types', {})
+        self.__dict__.update(state)
+
     def get_attributes(self) -> dict:
         """ returns the dictionary mapping data attributes and types """
         return self._attributes
 
     def get_root_node(self) -> DecisionNode:
         """ Returns the root node of the tree """
+        self._build_nodes()
         if not self._root_node:
             raise RootNodeNotFound("Fit the decision tree before accessing the root node.")
         return self._root_node
 
     def get_nodes(self) -> Union[set[Node], set]:
         """ Returns nodes added in the tree """
+        self._build_nodes()
         return self._nodes
 
     def get_leaves_nodes(self) -> set[LeafNode]:
         """ Returns a list of the leaves nodes """
-        return {node for node in self._nodes if isinstance(node, LeafNode)}
+        return {node for node in self.get_nodes() if isinstance(node, LeafNode)}
 
     def get_leaf_node(self, leaf_label: str) -> list[LeafNode]:
         """ Returns the leaf node with the desired label """
@@ -62,24 +83,96 @@ class DecisionTree:
         """ Add a node to the tree's set of nodes and connects it to its parent node """
         self._nodes.add(node)
         self._root_node = node
+        self.compiled_tree = None
 
     def add_node(self, node: Node):
         """ Add a node to the tree's set of nodes and connects it to its parent node """
         self._nodes.add(node)
         parent_node = node.get_parent_node()
         parent_node.add_child(node)
+        self.compiled_tree = None
 
     def delete_node(self, node: Node):
         """ Removes a node from the tree's set of nodes and disconnects it from its parent node """
         parent_node = node.get_parent_node()
         parent_node.delete_child(node)
         self._nodes.remove(node)
+        self.compiled_tree = None
+
+    def compile(self) -> CompiledTree:
+        """ Flattens the tree in arrays used for the inference """
+        self.compiled_tree = compile_tree(self.get_root_node(), self.category_types)
+        return self.compiled_tree
+
+    def load_compiled_tree(self, compiled_tree: CompiledTree):
+        """ Uses a compiled tree (e.g. read from a file) as the tree, its nodes are created when first needed """
+        self._nodes = set()
+        self._root_node = None
+        self.compiled_tree = compiled_tree
+        self.category_types = dict(compiled_tree.category_types)
+        self._nodes_to_build = True
+
+    def _build_nodes(self):
+        """ creates the nodes of the loaded compiled tree """
+        if not self._nodes_to_build:
+            return
+        self._nodes_to_build = False
+        compiled_tree = self.compiled_tree
+        nodes = build_nodes(compiled_tree, self._attributes)
+        self.add_root_node(nodes[0])
+        for node in nodes[1:]:
+            self.add_node(node)
+        # the compiled tree is still valid, with the ids of the new nodes
+        compiled_tree.node_ids = np.array([node.get_id() for node in nodes], dtype=object)
+        self.compiled_tree = compiled_tree
+
+    def get_compiled_tree(self) -> CompiledTree:
+        """ Returns the compiled tree, compiling it if the tree changed """
+        compiled_tree = self.compiled_tree
+        if compiled_tree is None:
+            compiled_tree = self.compile()
+        return compiled_tree
 
     def predict(self, data_input: pd.DataFrame) -> tuple[list[str], list[dict]]:
         """ Returns the target predicted by the tree for every row in data_input """
         if not self.prediction_handler:
             raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
-        return self.prediction_handler.predict(data_input, self.get_root_node())
+        return self.prediction_handler.predict(data_input, self.get_compiled_tree())
+
+    def predict_labels(self, data_input: pd.DataFrame) -> list:
+        """ Returns the target predicted by the tree for every row in data_input, without the distributions """
+        if not self.prediction_handler:
+            raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
+        return self.prediction_handler.predict_labels(data_input, self.get_compiled_tree())
+
+    def predict_proba(self, data_input: pd.DataFrame, classes: np.ndarray) -> np.ndarray:
+        """ Returns the probabilities of the classes for every row in data_input """
+        if not self.prediction_handler:
+            raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
+        return self.prediction_handler.predict_proba(data_input, self.get_compiled_tree(), classes)
+
+    def predict_labels_proba(self, data_input: pd.DataFrame, classes: np.ndarray) -> tuple[list, np.ndarray]:
+        """ Returns the target predicted and the probabilities of the classes for every row in data_input """
+        if not self.prediction_handler:
+            raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
+        return self.prediction_handler.predict_labels_proba(data_input, self.get_compiled_tree(), classes)
+
+    def apply(self, data_input: pd.DataFrame, sparse_output: Optional[bool]=None) -> Union[np.ndarray, 'sparse.csr_matrix']:
+        """ Returns the leaf (node index in the compiled tree) reached by every row in data_input """
+        if not self.prediction_handler:
+            raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
+        return self.prediction_handler.apply(data_input, self.get_compiled_tree(), sparse_output)
+
+    def decision_path(self, data_input: pd.DataFrame) -> 'sparse.csr_matrix':
+        """ Returns the indicator of the nodes (index in the compiled tree) visited by every row in data_input """
+        if not self.prediction_handler:
+            raise PredictionHandlerNotFound("Fit the decision tree before predicting.")
+        return self.prediction_handler.decision_path(data_input, self.get_compiled_tree())
+
+    def set_category_types(self, category_types: dict):
+        """ sets the type of the training values of the categorical attributes """
+        self.category_types = category_types
+        self.compiled_tree = None
 
     def set_prediction_handler(self, prediciton_handler: PredictionHandler):
         self.prediction_handler = prediciton_handler
@@ -1,14 +1,24 @@
+import os
+import numpy as np
 import pandas as pd
 import pickle
-from typing import Union, Callable
+from types import ModuleType
+from typing import TYPE_CHECKING, Union, Callable, Iterable, Iterator, Mapping, Optional
 from c4dot5.DecisionTree import DecisionTree
-from c4dot5.traininghandler import TrainingHandler
+from c4dot5.traininghandler import TrainingHandler, get_workers_number
 from c4dot5.attributes import TrainingAttributes
 from c4dot5.nodes import Node, LeafNode
-from c4dot5.predictor import PredictionHandler
-from c4dot5.visualizer import Visualizer
+from c4dot5.predictor import PredictionHandler, predict_chunks
+from c4dot5.compiling import CompiledTree
+from c4dot5.streaming import read_chunks, write_chunk
+from c4dot5.exporting import export_model
+from c4dot5.generating import generate_predictor_source, load_predictor
 from c4dot5.training import class_entropy
-from c4dot5.rules_extractor import initialize_rules_extractor
+from c4dot5.impurity import ImpurityKernel
+
+if TYPE_CHECKING:
+    from scipy import sparse
+    from c4dot5.visualizer import Visualizer
 
 
 class DecisionTreeClassifier:
@@ -18,7 +28,15 @@ class DecisionTreeClassifier:
             max_depth: int=10,
             node_purity: float=0.9,
             min_instances: int=2,
-            evaluate_split_fn: Callable=class_entropy,
+            evaluate_split_fn: Union[ImpurityKernel, Callable]=class_entropy,
+            n_jobs: int=1,
+            subtree_jobs: int=1,
+            subtree_min_rows: int=10000,
+            subtree_backend: str='process',
+            growth_order: str='depth-first',
+            presort: bool=True,
+            split_strategy: str='exact',
+            n_bins: int=255,
             ):
         self.decision_tree = DecisionTree(attributes_map)
         training_attributes = TrainingAttributes(
@@ -28,13 +46,29 @@ class DecisionTreeClassifier:
         self.training_handler = TrainingHandler(
                 self.decision_tree,
                 training_attributes,
-                evaluate_split_fn)
+                evaluate_split_fn,
+                n_jobs,
+                subtree_jobs,
+                subtree_min_rows,
+                subtree_backend,
+                growth_order,
+                presort,
+                split_strategy,
+                n_bins)
+        # generated predictor and the compiled tree it comes from
+        self._predictor = None
+        # classes of the training data, the columns of predict_proba
+        self.classes_ = None
 
     def fit(self, dataset: pd.DataFrame):
         """ fit the input dataset """
-        self.training_handler.split_dataset(dataset)
-        self.decision_tree.set_prediction_handler(
-                PredictionHandler(self.decision_tree.get_leaves_nodes()))
+        self.classes_ = self.training_handler.split_dataset(dataset).classes
+        self.decision_tree.set_prediction_handler(PredictionHandler())
+        self.compile()
+
+    def compile(self) -> CompiledTree:
+        """ flattens the fitted tree in the arrays used for the inference """
+        return self.decision_tree.compile()
 
     def get_attributes(self) -> dict:
         """ returns the dictionary mapping data attributes and types """
@@ -56,14 +90,147 @@ class DecisionTreeClassifier:
         """ Returns the leaf node with the desired label """
         return self.decision_tree.get_leaf_node(leaf_label)
 
-    def predict(self, data_input: pd.DataFrame, distribution=False) -> Union[list[str], tuple[list[str], list[dict]]]:
-        """ Returns the target predicted by the tree for every row in data_input """
-        predictions, predictions_distribution = self.decision_tree.predict(data_input)
-        if distribution:
-            return predictions, predictions_distribution
-        return predictions
+    def predict(self, data_input: pd.DataFrame, distribution=False, n_jobs: int=1) -> Union[list[str], tuple[list[str], list[dict]]]:
+        """ Returns the target predicted by the tree for every row in data_input
+
+        With n_jobs different from 1 (-1 for all the cpus), large inputs are split
+        in chunks of rows predicted in parallel threads.
+        """
+        # compiled before starting the threads
+        self.decision_tree.get_compiled_tree()
+        if not distribution:
+            chunks = predict_chunks(self.decision_tree.predict_labels, data_input, get_workers_number(n_jobs))
+            return [prediction for chunk in chunks for prediction in chunk]
+        chunks = predict_chunks(self.decision_tree.predict, data_input, get_workers_number(n_jobs))
+        return ([prediction for predictions, _ in chunks for prediction in predictions],
+                [distribution for _, distributions in chunks for distribution in distributions])
+
+    def predict_proba(self, data_input: pd.DataFrame, n_jobs: int=1) -> np.ndarray:
+        """ Returns the probabilities of the classes for every row in data_input,
+        one column for every class in classes_ """
+        # compiled before starting the threads
+        self.decision_tree.get_compiled_tree()
+        chunks = predict_chunks(
+                lambda chunk: self.decision_tree.predict_proba(chunk, self.classes_),
+                data_input, get_workers_number(n_jobs))
+        return np.concatenate(chunks)
+
+    def predict_stream(
+            self, source: Union[str, os.PathLike, pd.DataFrame, Iterable[pd.DataFrame]],
+            chunksize: int=100000, proba: bool=False,
+            output: Optional[Union[str, os.PathLike]]=None, n_jobs: int=1) -> Iterator[pd.DataFrame]:
+        """ Predicts source a chunk at a time, yielding the predictions of every chunk
+
+        source is the path of a CSV or Parquet file, a dataframe or an iterable of dataframes.
+        The predictions have the column 'prediction' and, with proba, one column of probabilities
+        for every class in classes_. If output is given, every chunk is also appended to the
+        CSV file output as soon as it is predicted; only one chunk is kept in memory.
+        """
+        # compiled before starting the threads
+        compiled_tree = self.decision_tree.get_compiled_tree()
+        # the chunks are read with the types of the training values of the categories
+        for chunk_idx, chunk in enumerate(read_chunks(source, chunksize, compiled_tree.category_types)):
+            if not proba:
+                predictions = pd.DataFrame({'prediction': self.predict(chunk, n_jobs=n_jobs)})
+            else:
+                # the labels and the probabilities from the same routing of the rows
+                chunks = predict_chunks(
+                        lambda rows: self.decision_tree.predict_labels_proba(rows, self.classes_),
+                        chunk, get_workers_number(n_jobs))
+                predictions = pd.DataFrame({'prediction': [label for labels, _ in chunks for label in labels]})
+                probabilities = np.concatenate([probabilities for _, probabilities in chunks])
+                for class_idx, target in enumerate(self.classes_):
+                    predictions[f'proba_{target}'] = probabilities[:, class_idx]
+            if output is not None:
+                write_chunk(predictions, output, chunk_idx == 0)
+            yield predictions
+
+    def apply(self, data_input: pd.DataFrame, sparse_output: Optional[bool]=None) -> Union[np.ndarray, 'sparse.csr_matrix']:
+        """ Returns the leaf reached by every row in data_input, as index of the node in the compiled tree
+
+        If unknown values send a row to more leaves (or sparse_output is True), returns the
+        (rows x nodes) sparse matrix of the weight of every leaf reached, its share of the pooled examples.
+        """
+        return self.decision_tree.apply(data_input, sparse_output)
+
+    def decision_path(self, data_input: pd.DataFrame) -> 'sparse.csr_matrix':
+        """ Returns the (rows x nodes) sparse indicator of the nodes visited by every row in data_input,
+        the columns are the indices of the nodes in the compiled tree """
+        return self.decision_tree.decision_path(data_input)
+
+    def get_compiled_tree(self) -> CompiledTree:
+        """ returns the flat arrays representation of the fitted tree """
+        return self.decision_tree.get_compiled_tree()
+
+    def get_predictor_source(self) -> str:
+        """ returns the python module predicting single rows with the fitted tree """
+        return generate_predictor_source(
+                self.decision_tree.get_compiled_tree(), list(self.get_attributes()))
 
-    def create_visualizer(self, title: str) -> Visualizer:
+    def get_predictor_module(self) -> ModuleType:
+        """ returns the module generated from the fitted tree, compiled once and cached """
+        compiled_tree = self.decision_tree.get_compiled_tree()
+        predictor = getattr(self, '_predictor', None)
+        if predictor is None or predictor[0] is not compiled_tree:
+            predictor = (compiled_tree, load_predictor(
+                generate_predictor_source(compiled_tree, list(self.get_attributes()))))
+            self._predictor = predictor
+        return predictor[1]
+
+    def get_predictor(self) -> Callable:
+        """ returns the function predicting a single row (a dict or a tuple ordered as the attributes map)
+
+        The function is generated from the fitted tree, compiled once and cached.
+        It returns the predicted class, or the distribution over the classes when
+        unknown values send the row to more leaves.
+        """
+        return self.get_predictor_module().predict
+
+    def predict_one(self, record: Mapping, distribution=False) -> Union[str, tuple[str, dict]]:
+        """ Returns the target predicted for a single record, a mapping from the attributes to their values
+
+        Missing keys, None, nan and '?' are unknown values. The record is not
+        converted into a dataframe: the generated predictor reads it directly.
+        """
+        predictor_module = self.get_predictor_module()
+        if not distribution:
+            return predictor_module.predict_label(record)
+        prediction_distribution = predictor_module.predict_distribution(record)
+        return max(zip(prediction_distribution.values(), prediction_distribution.keys()))[1], prediction_distribution
+
+    def predict_records(self, records: Iterable[Mapping], distribution=False) -> Union[list[str], tuple[list[str], list[dict]]]:
+        """ Returns the target predicted for every record, as predict_one """
+        predictor_module = self.get_predictor_module()
+        if not distribution:
+            predict_label = predictor_module.predict_label
+            return [predict_label(record) for record in records]
+        predict_distribution = predictor_module.predict_distribution
+        distributions = [predict_distribution(record) for record in records]
+        return ([max(zip(record_distribution.values(), record_distribution.keys()))[1]
+                 for record_distribution in distributions], distributions)
+
+    def export_predictor(self, file_path: str):
+        """ saves the generated predictor as a python module, usable without c4dot5 """
+        with open(file_path, 'w') as file:
+            file.write(self.get_predictor_source())
+
+    def __getstate__(self) -> dict:
+        # the generated function can't be pickled, it is generated again when needed
+        state = self.__dict__.copy()
+        state['_predictor'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._predictor = None
+        if 'classes_' not in state:
+            # classifiers pickled before classes_: the classes of the leaves
+            self.classes_ = np.array(sorted({target for leaf in self.decision_tree.get_leaves_nodes()
+                                             for target in leaf.get_classes()}), dtype=object)
+
+    def create_visualizer(self, title: str) -> 'Visualizer':
+        # graphviz is imported only when a tree is drawn
+        from c4dot5.visualizer import Visualizer
         visualizer = Visualizer(self.decision_tree, title)
         visualizer.create_digraph()
         return visualizer
@@ -74,7 +241,12 @@ class DecisionTreeClassifier:
 
     # TODO make tests
     def get_rules(self, extraction_method: str='standard', view_tree: bool=False, folder_name: str='figures', print_rules=True) -> dict:
-        rules_extractor = initialize_rules_extractor(extraction_method, self.training_handler.complete_dataset, self.decision_tree)
+        # statsmodels is imported only when the rules are extracted
+        from c4dot5.rules_extractor import initialize_rules_extractor
+        from c4dot5.visualizer import Visualizer
+        # training rows all have weight 1
+        dataset = self.training_handler.complete_dataset.assign(weight=1.0)
+        rules_extractor = initialize_rules_extractor(extraction_method, dataset, self.decision_tree)
         rules_extractor.compute()
         rules = rules_extractor.get_rules()
         if view_tree:
@@ -87,3 +259,10 @@ class DecisionTreeClassifier:
     def save(self, file_path: str):
         with open(file_path, 'wb') as file:
             pickle.dump(self, file)
+
+    def save_model(self, file_path: str, training_data: bool=False):
+        """ saves only what the inference needs in the binary model format, load it with importing.import_model
+
+        The training data (needed to extract the rules) are saved only if training_data is True.
+        """
+        export_model(self, file_path, training_data)
@@ -19,6 +19,13 @@ class AttributeType(Enum):
     BOOLEAN = "boolean"
 
 
+class GrowthOrder(Enum):
+    """ orders in which the nodes of the tree are grown """
+    DEPTH_FIRST = "depth-first"
+    BREADTH_FIRST = "breadth-first"
+    LEVEL_WISE = "level-wise"
+
+
 @dataclass
 class TrainingAttributes:
     """ attributes defining the when the training stops """
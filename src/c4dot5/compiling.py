@@ -0,0 +1,174 @@
+""" Functions flattening a decision tree in arrays for the inference """
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+from c4dot5.nodes import Node, LeafNode, DecisionNodeContinuous, DecisionNodeCategorical
+from c4dot5.attributes import DecisionNodeAttributes, LeafNodeAttributes, NodeType
+
+LEAF = 0
+CONTINUOUS = 1
+CATEGORICAL = 2
+
+
+@dataclass
+class CompiledTree:
+    """ flat arrays representation of a decision tree
+
+    Nodes are numbered breadth-first from the root (0). For every node:
+    kind is LEAF, CONTINUOUS or CATEGORICAL, feature the index of its attribute
+    in attributes (-1 for leaves) and threshold the threshold of the continuous test.
+    The children of node i are children[children_offset[i]:children_offset[i+1]]:
+    continuous nodes have the low and the high child (-1 if missing), categories maps
+    the values of a categorical node (as strings) to its children.
+    Leaf i has the class weights class_counts[leaf_index[i]], in the order of classes,
+    and class_present tells the classes in the leaf. leaf_totals and leaf_labels
+    keep the total weight and the index of the predicted class of every leaf.
+    levels and node_attributes keep the level and the attribute name (None for
+    the leaves) of the nodes, to build them again.
+    category_types maps the categorical attributes to the type of their training values
+    ('bool', 'int', 'float' or 'str'), to read the values to predict as in the training.
+    """
+    attributes: list
+    kind: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    children_offset: np.ndarray
+    children: np.ndarray
+    categories: list
+    parent: np.ndarray
+    labels: np.ndarray
+    node_ids: np.ndarray
+    leaf_index: np.ndarray
+    classes: np.ndarray
+    class_counts: np.ndarray
+    class_present: np.ndarray
+    leaf_totals: np.ndarray
+    leaf_labels: np.ndarray
+    levels: np.ndarray
+    node_attributes: list
+    category_types: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def get_children(self, node_idx: int) -> np.ndarray:
+        """ returns the indices of the children of a node """
+        return self.children[self.children_offset[node_idx]:self.children_offset[node_idx + 1]]
+
+    def get_path(self, node_idx: int) -> list[int]:
+        """ returns the indices of the nodes from the root to node_idx """
+        path = [node_idx]
+        while self.parent[path[-1]] != -1:
+            path.append(self.parent[path[-1]])
+        return path[::-1]
+
+
+def compile_tree(root_node: Node, category_types: Optional[dict]=None) -> CompiledTree:
+    """ flattens the tree below root_node in a CompiledTree """
+    nodes, parent, nodes_children = [], [], []
+    queue = deque([(root_node, -1)])
+    while queue:
+        node, parent_idx = queue.popleft()
+        nodes.append(node)
+        parent.append(parent_idx)
+        nodes_children.append(get_ordered_children(node))
+        for child in nodes_children[-1]:
+            if child is not None:
+                queue.append((child, len(nodes) - 1))
+    position = {node.get_id(): idx for idx, node in enumerate(nodes)}
+    leaves = [node for node in nodes if isinstance(node, LeafNode)]
+    classes = np.array(sorted({target for leaf in leaves for target in leaf.get_classes()}), dtype=object)
+    class_position = {target: idx for idx, target in enumerate(classes)}
+    class_counts = np.zeros((len(leaves), len(classes)))
+    class_present = np.zeros((len(leaves), len(classes)), dtype=bool)
+    attributes = []
+    kind = np.zeros(len(nodes), dtype=np.int8)
+    feature = np.full(len(nodes), -1, dtype=np.int32)
+    threshold = np.full(len(nodes), np.nan)
+    leaf_index = np.full(len(nodes), -1, dtype=np.int32)
+    children_offset = np.zeros(len(nodes) + 1, dtype=np.int64)
+    children, categories = [], []
+    n_leaves = 0
+    for idx, node in enumerate(nodes):
+        node_children = [-1 if child is None else position[child.get_id()] for child in nodes_children[idx]]
+        children.extend(node_children)
+        children_offset[idx + 1] = len(children)
+        categories.append(None)
+        if isinstance(node, LeafNode):
+            leaf_index[idx] = n_leaves
+            n_leaves += 1
+            for target, count in node.get_classes().items():
+                class_counts[leaf_index[idx], class_position[target]] = count
+                class_present[leaf_index[idx], class_position[target]] = True
+            continue
+        attribute = node.get_attribute().split(":")[0]
+        if attribute not in attributes:
+            attributes.append(attribute)
+        feature[idx] = attributes.index(attribute)
+        if isinstance(node, DecisionNodeContinuous):
+            kind[idx] = CONTINUOUS
+            threshold[idx] = node.get_node_attributes().threshold
+        else:
+            kind[idx] = CATEGORICAL
+            categories[idx] = {
+                    value: position[child.get_id()] for value, child in node.get_children_by_value().items()}
+    return CompiledTree(
+            attributes, kind, feature, threshold, children_offset, np.array(children, dtype=np.int32),
+            categories, np.array(parent, dtype=np.int32),
+            np.array([node.get_label() for node in nodes], dtype=object),
+            np.array([node.get_id() for node in nodes], dtype=object),
+            leaf_index, classes, class_counts, class_present,
+            *get_leaves_predictions(class_counts, class_present),
+            np.array([node.get_level() for node in nodes], dtype=np.int32),
+            [None if isinstance(node, LeafNode) else node.get_attribute() for node in nodes],
+            dict(category_types or {}))
+
+def get_leaves_predictions(class_counts: np.ndarray, class_present: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ returns the total weight and the predicted class of the leaves
+
+    the predicted class has the maximum rounded probability, the greatest on ties
+    """
+    leaf_totals = class_counts.sum(axis=1)
+    leaf_distributions = class_counts / leaf_totals[:, np.newaxis]
+    rounded = np.where(class_present, np.round(leaf_distributions, 4), -1)
+    is_max = rounded == rounded.max(axis=1, keepdims=True)
+    leaf_labels = class_counts.shape[1] - 1 - np.argmax(is_max[:, ::-1], axis=1)
+    return leaf_totals, leaf_labels
+
+def get_ordered_children(node: Node) -> list[Optional[Node]]:
+    """ returns the children of a node: low and high child (None if missing)
+    for continuous nodes, sorted by label for the categorical ones """
+    if isinstance(node, LeafNode):
+        return []
+    if isinstance(node, DecisionNodeContinuous):
+        return list(node.get_low_high_children())
+    return sorted(node.get_children(), key=lambda child: child.get_label())
+
+def build_nodes(compiled_tree: CompiledTree, attributes_map: dict) -> list[Node]:
+    """ creates again the nodes of a compiled tree, in the order of its indices
+
+    attributes_map gives the type of the attributes of the decision nodes
+    """
+    nodes = []
+    for idx, label in enumerate(compiled_tree.labels.tolist()):
+        parent_node = None if compiled_tree.parent[idx] == -1 else nodes[compiled_tree.parent[idx]]
+        level = int(compiled_tree.levels[idx])
+        if compiled_tree.kind[idx] == LEAF:
+            leaf = compiled_tree.leaf_index[idx]
+            present = compiled_tree.class_present[leaf]
+            nodes.append(LeafNode(LeafNodeAttributes(level, label, NodeType.LEAF_NODE, dict(zip(
+                compiled_tree.classes[present].tolist(), compiled_tree.class_counts[leaf][present].tolist()))),
+                parent_node))
+            continue
+        attribute_type = attributes_map[compiled_tree.attributes[compiled_tree.feature[idx]]]
+        if compiled_tree.kind[idx] == CONTINUOUS:
+            nodes.append(DecisionNodeContinuous(DecisionNodeAttributes(
+                level, label, NodeType.DECISION_NODE_CONTINUOUS, compiled_tree.node_attributes[idx],
+                attribute_type, float(compiled_tree.threshold[idx])), parent_node))
+        else:
+            nodes.append(DecisionNodeCategorical(DecisionNodeAttributes(
+                level, label, NodeType.DECISION_NODE_CATEGORICAL, compiled_tree.node_attributes[idx],
+                attribute_type, None), parent_node))
+    return nodes
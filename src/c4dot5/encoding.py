@@ -0,0 +1,242 @@
+""" Columnar encoding of the dataset used in the training """
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+import pandas as pd
+from c4dot5.attributes import AttributeType
+
+UNKNOWN_VALUE = '?'
+UNKNOWN_CODE = -1
+
+
+@dataclass
+class EncodedDataset:
+    """ columnar store of the training data
+
+    continuous attributes are float64 arrays (nan when unknown), categorical and
+    boolean attributes are integer codes (-1 when unknown) indexing their vocabulary.
+    The target is encoded as the index of the class in the sorted classes array.
+    sorted_values keeps the sorted unique known values of every continuous attribute,
+    to search the values of the dataset (e.g. the global thresholds) in logarithmic time.
+    If the continuous attributes are binned, bin_edges keeps the upper edge of every
+    bin (a value of the dataset) and bin_codes the bin of every row (0 when unknown).
+    The store is never modified during the training.
+    """
+    attributes: dict
+    columns: dict
+    vocabularies: dict
+    missing: dict
+    target: np.ndarray
+    classes: np.ndarray
+    weight: np.ndarray
+    sorted_values: dict
+    bin_edges: dict = field(default_factory=dict)
+    bin_codes: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.target)
+
+    def get_category_types(self) -> dict:
+        """ returns the type of the values of every categorical and boolean attribute
+        ('bool', 'int', 'float' or 'str'), the attributes with mixed types are left out """
+        category_types = {name: get_values_type(vocabulary) for name, vocabulary in self.vocabularies.items()}
+        return {name: value_type for name, value_type in category_types.items() if value_type is not None}
+
+
+class NodeData:
+    """ rows of the encoded dataset reaching a node, with their weights
+
+    The encoded dataset is shared by all the nodes: a node only holds the indices
+    of its rows (unknown values included) and the weight of each of them.
+    If sorted_positions is given, it maps every continuous attribute to the positions
+    of the node rows with known value, sorted by value: the children inherit
+    it from the parent, so that the columns are sorted only once at the root.
+    """
+    def __init__(self, dataset: EncodedDataset, rows: np.ndarray, weight: np.ndarray,
+                 sorted_positions: Optional[dict]=None):
+        self.dataset = dataset
+        self.rows = rows
+        self.weight = weight
+        self.target = dataset.target[rows]
+        self.sorted_positions = sorted_positions
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def attributes(self) -> dict:
+        return self.dataset.attributes
+
+    @property
+    def classes(self) -> np.ndarray:
+        return self.dataset.classes
+
+    def get_column(self, attr_name: str) -> np.ndarray:
+        """ returns the values (or codes) of the attribute in the node rows """
+        return self.dataset.columns[attr_name][self.rows]
+
+    def get_missing(self, attr_name: str) -> np.ndarray:
+        """ returns the mask of the node rows with unknown attribute value """
+        return self.dataset.missing[attr_name][self.rows]
+
+    def get_vocabulary(self, attr_name: str) -> np.ndarray:
+        return self.dataset.vocabularies[attr_name]
+
+    def get_sorted_positions(self, attr_name: str) -> np.ndarray:
+        """ returns the positions of the node rows with known value of a
+        continuous attribute, sorted by value """
+        if self.sorted_positions is not None:
+            return self.sorted_positions[attr_name]
+        known_positions = np.flatnonzero(~self.get_missing(attr_name))
+        return known_positions[np.argsort(self.get_column(attr_name)[known_positions], kind='stable')]
+
+    def subset(self, mask: np.ndarray) -> NodeData:
+        """ returns the node rows selected by mask, keeping their weights """
+        return self.select(np.flatnonzero(mask), self.weight[mask])
+
+    def select(self, positions: np.ndarray, weight: np.ndarray) -> NodeData:
+        """ returns the node rows at positions with the new weights
+
+        the sorted positions of the selected rows keep the order of the parent ones
+        """
+        sorted_positions = None
+        if self.sorted_positions is not None:
+            new_positions = np.full(len(self), -1, dtype=np.int64)
+            new_positions[positions] = np.arange(len(positions))
+            sorted_positions = {}
+            for attr_name, parent_positions in self.sorted_positions.items():
+                child_positions = new_positions[parent_positions]
+                sorted_positions[attr_name] = child_positions[child_positions >= 0]
+        return NodeData(self.dataset, self.rows[positions], weight, sorted_positions)
+
+    def partition(self, child_ids: np.ndarray, n_children: int) -> list[NodeData]:
+        """ returns the data of the children of a split, given the child of every node row
+
+        The rows with child -1 (unknown value of the split attribute) go to all the
+        children after their known rows, weighted with the fraction of the known rows
+        in the child. The sorted positions of the parent are partitioned among all
+        the children in one stable pass per attribute.
+        """
+        known_counts = np.bincount(child_ids[child_ids >= 0], minlength=n_children)
+        # rows grouped by child in the parent order, the unknown ones first
+        row_order = np.argsort(child_ids, kind='stable')
+        group_starts = np.concatenate([[0], np.cumsum(np.bincount(child_ids + 1, minlength=n_children + 1))])
+        unknown = row_order[:group_starts[1]]
+        # position of every row in its child (in the unknown rows for the unknown ones)
+        child_positions = np.empty(len(self), dtype=np.int64)
+        child_positions[row_order] = np.arange(len(self)) - group_starts[child_ids[row_order] + 1]
+        children_sorted_positions = [None] * n_children
+        if self.sorted_positions is not None:
+            children_sorted_positions = [{} for _ in range(n_children)]
+            for attr_name, parent_positions in self.sorted_positions.items():
+                positions_ids = child_ids[parent_positions]
+                order = np.argsort(positions_ids, kind='stable')
+                bounds = np.cumsum(np.bincount(positions_ids + 1, minlength=n_children + 1))
+                if bounds[0] == 0:
+                    grouped = np.split(child_positions[parent_positions[order]], bounds[1:-1])
+                    for child_sorted_positions, positions in zip(children_sorted_positions, grouped):
+                        child_sorted_positions[attr_name] = positions
+                    continue
+                # the unknown rows are merged in the sorted positions of every child
+                unknown_order = order[:bounds[0]]
+                for child_id, child_order in enumerate(np.split(order[bounds[0]:], bounds[1:-1] - bounds[0])):
+                    merged = np.sort(np.concatenate([child_order, unknown_order]), kind='stable')
+                    children_sorted_positions[child_id][attr_name] = child_positions[parent_positions[merged]] + \
+                            np.where(positions_ids[merged] < 0, known_counts[child_id], 0)
+        unknown_fractions = known_counts / np.count_nonzero(child_ids >= 0)
+        children = []
+        for child_id, sorted_positions in enumerate(children_sorted_positions):
+            positions = np.concatenate([row_order[group_starts[child_id + 1]:group_starts[child_id + 2]], unknown])
+            weight = np.concatenate([self.weight[positions[:known_counts[child_id]]],
+                                     unknown_fractions[child_id] * self.weight[unknown]])
+            children.append(NodeData(self.dataset, self.rows[positions], weight, sorted_positions))
+        return children
+
+    def get_class_counts(self, mask: np.ndarray=None) -> np.ndarray:
+        """ returns the weight of every target class in the rows selected by mask """
+        target, weight = self.target, self.weight
+        if mask is not None:
+            target, weight = target[mask], weight[mask]
+        return np.bincount(target, weights=weight, minlength=len(self.classes))
+
+    def get_target_dataframe(self, mask: np.ndarray=None) -> pd.DataFrame:
+        """ returns the 'target' and 'weight' columns of the rows selected by mask """
+        target, weight = self.target, self.weight
+        if mask is not None:
+            target, weight = target[mask], weight[mask]
+        return pd.DataFrame({'target': self.classes[target], 'weight': weight})
+
+    @classmethod
+    def from_dataset(cls, dataset: EncodedDataset, presort: bool=False) -> NodeData:
+        """ returns the root node data, containing all the rows
+
+        with presort the continuous columns are sorted once here
+        """
+        root_data = cls(dataset, np.arange(len(dataset)), dataset.weight.copy())
+        if presort:
+            root_data.sorted_positions = {
+                    attr_name: root_data.get_sorted_positions(attr_name)
+                    for attr_name, attr_type in dataset.attributes.items()
+                    if attr_type == AttributeType.CONTINUOUS}
+        return root_data
+
+
+def encode_dataset(dataset: pd.DataFrame, attributes_map: dict, n_bins: Optional[int]=None) -> EncodedDataset:
+    """ encodes the dataset once before the training
+
+    nan and '?' are both considered unknown values.
+    With n_bins, the continuous attributes are also binned in at most n_bins quantile bins.
+    """
+    attributes, columns, vocabularies, missing, sorted_values = {}, {}, {}, {}, {}
+    bin_edges, bin_codes = {}, {}
+    for name in dataset.columns:
+        if name == 'target':
+            continue
+        attr_type = attributes_map[name]
+        column = dataset[name]
+        unknown = (column.isna() | (column == UNKNOWN_VALUE)).to_numpy()
+        if unknown.any():
+            column = column.where(~unknown)
+        if attr_type == AttributeType.CONTINUOUS:
+            columns[name] = column.to_numpy(dtype=np.float64)
+            sorted_values[name] = np.unique(columns[name][~unknown])
+            if n_bins is not None:
+                bin_edges[name], bin_codes[name] = get_quantile_bins(columns[name], unknown, n_bins)
+        else:
+            codes, vocabulary = pd.factorize(column)
+            columns[name] = codes.astype(np.int32)
+            vocabularies[name] = np.asarray(vocabulary, dtype=object)
+        attributes[name] = attr_type
+        missing[name] = unknown
+    target, classes = pd.factorize(dataset['target'], sort=True)
+    return EncodedDataset(
+            attributes, columns, vocabularies, missing,
+            target.astype(np.int32), np.asarray(classes, dtype=object),
+            np.ones(len(dataset), dtype=np.float64), sorted_values, bin_edges, bin_codes)
+
+def get_values_type(values: np.ndarray) -> Optional[str]:
+    """ returns the type of all the values ('bool', 'int', 'float' or 'str'), None if they are mixed """
+    if len(values) == 0:
+        return None
+    for value_type, types in (('bool', (bool, np.bool_)), ('int', (int, np.integer)),
+                              ('float', (float, np.floating)), ('str', (str,))):
+        if all(isinstance(value, types) for value in values):
+            return value_type
+    return None
+
+def get_quantile_bins(column: np.ndarray, unknown: np.ndarray, n_bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """ bins the known values of a continuous column in at most n_bins quantile bins
+
+    Returns the upper edge of every bin, which is a value of the column, and the bin
+    of every row: a value is in the first bin whose edge is greater than or equal to it.
+    """
+    known_values = column[~unknown]
+    if len(known_values) == 0:
+        return np.empty(0), np.zeros(len(column), dtype=np.uint8)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:]
+    bin_edges = np.unique(np.quantile(known_values, quantiles, method='inverted_cdf'))
+    codes_dtype = np.uint8 if n_bins <= 256 else np.uint16
+    bin_codes = np.zeros(len(column), dtype=codes_dtype)
+    bin_codes[~unknown] = np.searchsorted(bin_edges, known_values, side='left')
+    return bin_edges, bin_codes
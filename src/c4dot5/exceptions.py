@@ -20,3 +20,6 @@ class ChildrenNotFound(Exception):
 
 class WrongSplitEvaluationFunction(Exception):
     pass
+
+class PredictionRequestError(Exception):
+    pass
@@ -0,0 +1,107 @@
+""" Functions saving a classifier in the c4dot5 binary model format
+
+The file starts with MAGIC, the format version (uint32) and the length (uint64)
+of a JSON header. The header keeps the attributes map, the parameters of the
+classifier, the classes and the non numeric parts of the compiled tree (attributes,
+labels, vocabularies of the categorical nodes and types of their training values).
+It is followed by the numeric
+arrays of the compiled tree, every one starting at an offset multiple of ALIGNMENT,
+as described in the header. The training data are saved only if requested.
+"""
+import io
+import os
+import json
+import threading
+import struct
+import numpy as np
+from c4dot5.compiling import CompiledTree
+from c4dot5.generating import to_python
+
+MAGIC = b"C4DOT5MD"
+# version 2 does not save the distributions of the leaves, ignored when reading version 1
+FORMAT_VERSION = 2
+# version and header length after the magic bytes
+PREAMBLE = struct.Struct("<IQ")
+ALIGNMENT = 64
+ARRAY_FIELDS = (
+        "kind", "feature", "threshold", "children_offset", "children", "parent", "leaf_index",
+        "class_counts", "class_present", "leaf_totals", "leaf_labels", "levels")
+
+
+def export_model(classifier, file_path: str, training_data: bool=False):
+    """ Saves what the classifier needs for the inference in file_path
+
+    The training data (needed only to extract the rules) are saved if training_data is True.
+    """
+    compiled_tree = classifier.get_compiled_tree()
+    header = {
+        "attributes_map": {name: attribute_type.value for name, attribute_type in classifier.get_attributes().items()},
+        "parameters": get_classifier_parameters(classifier),
+        "classes": [to_python(target) for target in classifier.classes_],
+        "tree": {
+            "attributes": list(compiled_tree.attributes),
+            "classes": [to_python(target) for target in compiled_tree.classes],
+            "labels": compiled_tree.labels.tolist(),
+            "node_attributes": compiled_tree.node_attributes,
+            "categories": compiled_tree.categories,
+            "category_types": compiled_tree.category_types,
+            },
+        "arrays": {},
+        "training_data": None,
+        }
+    sections = [np.ascontiguousarray(getattr(compiled_tree, name)) for name in ARRAY_FIELDS]
+    for name, array in zip(ARRAY_FIELDS, sections):
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "nbytes": array.nbytes}
+    if training_data:
+        buffer = io.BytesIO()
+        classifier.training_handler.complete_dataset.to_pickle(buffer, compression=None)
+        sections.append(buffer.getvalue())
+        header["training_data"] = {"nbytes": len(sections[-1])}
+    # the offsets depend on the length of the header, that contains them
+    offsets_length = 0
+    while True:
+        offset = get_aligned(len(MAGIC) + PREAMBLE.size + offsets_length)
+        descriptions = list(header["arrays"].values())
+        if training_data:
+            descriptions.append(header["training_data"])
+        for description in descriptions:
+            description["offset"] = offset
+            offset = get_aligned(offset + description["nbytes"])
+        encoded_header = json.dumps(header).encode("utf-8")
+        if len(encoded_header) <= offsets_length:
+            break
+        offsets_length = len(encoded_header) + ALIGNMENT
+    # written in a new file that replaces the old one, so that the processes
+    # mapping the old file keep reading it
+    temporary_path = f"{os.fspath(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(PREAMBLE.pack(FORMAT_VERSION, len(encoded_header)))
+        file.write(encoded_header)
+        for description, section in zip(descriptions, sections):
+            file.write(b"\0" * (description["offset"] - file.tell()))
+            file.write(section if isinstance(section, bytes) else section.tobytes())
+    os.replace(temporary_path, file_path)
+
+def get_aligned(offset: int) -> int:
+    """ returns the first offset multiple of ALIGNMENT not before offset """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def get_classifier_parameters(classifier) -> dict:
+    """ returns the parameters the classifier has been created with
+    (the split evaluation function is not saved) """
+    training_handler = classifier.training_handler
+    training_attributes = training_handler.training_attributes
+    return {
+        "max_depth": training_attributes.max_depth,
+        "node_purity": training_attributes.node_purity,
+        "min_instances": training_attributes.min_instances,
+        "n_jobs": training_handler.n_jobs,
+        "subtree_jobs": training_handler.subtree_jobs,
+        "subtree_min_rows": training_handler.subtree_min_rows,
+        "subtree_backend": training_handler.subtree_backend,
+        "growth_order": training_handler.growth_order.value,
+        "presort": training_handler.presort,
+        "split_strategy": training_handler.split_strategy,
+        "n_bins": training_handler.n_bins,
+        }
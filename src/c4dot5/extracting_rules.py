@@ -2,12 +2,9 @@ from __future__ import annotations
 from copy import copy
 import pandas as pd
 import numpy as np
-import multiprocessing
-from tqdm import tqdm
 from c4dot5.nodes import LeafNode, DecisionNode
 from c4dot5.DecisionTree import DecisionTree
 from c4dot5.attributes import LeafNodeAttributes, NodeType
-from statsmodels.stats.proportion import proportion_confint
 
 
 def extract_rules_from_leaf(node: LeafNode) -> list[str]:
@@ -58,6 +55,9 @@ def extract_rules_with_pruning(dt, data_in) -> dict:
 
         leaves = dt.get_leaves_nodes()
         inputs = [(leaf, keep_rule, p_threshold, data_in) for leaf in leaves]
+        # imported here: they are not needed to predict or to extract the rules without pruning
+        import multiprocessing
+        from tqdm import tqdm
         print("Starting multiprocessing rules pruning on {} leaves...".format(str(len(leaves))))
         with multiprocessing.Pool() as pool:
             result = list(tqdm(pool.imap(_simplify_rule_multiprocess, inputs), total=len(leaves)))
@@ -304,5 +304,6 @@ def _compute_number_predicted_errors(node, target_value, data_in) -> float:
     node_instances = data_in.query(query)
     wrong_instances = node_instances[node_instances['target'] != target_value]
 
+    from statsmodels.stats.proportion import proportion_confint
     # TODO Sometimes both len are 0 so the upper bound is 'nan' (this also raises a warning since division by 0)
     return len(node_instances) * proportion_confint(len(wrong_instances), len(node_instances), method='beta', alpha=0.50)[1]
@@ -1,39 +1,25 @@
 """ Functions related to te filtering of a dataset """
 
-import pandas as pd
 import numpy as np
+import pandas as pd
+from c4dot5.encoding import NodeData
 
-def filter_dataset_cat(data: pd.DataFrame, attr_name: str, attr_value: str) -> pd.DataFrame:
-    """ create the dataset corresponding to the split of a categorical value """
-    data_knw = data[data[attr_name] != '?'].copy(deep=True)
-    split_data_knw = data_knw[data_knw[attr_name] == attr_value].copy(deep=True)
-    data_unknw = data[data[attr_name] == '?'].copy(deep=True)
-    return create_weight_ds(data_knw, data_unknw, split_data_knw)
-
-def filter_dataset_low(data: pd.DataFrame, attr_name: str, threshold: float) -> pd.DataFrame:
-    """ create the dataset corresponding to the low split of a continuous value """
-    data_knw = data[data[attr_name] != '?'].copy(deep=True)
-    data_unknw = data[data[attr_name] == '?'].copy(deep=True)
-    # lower than the threshold
-    split_data_knw = data_knw[data_knw[attr_name] <= threshold].copy(deep=True)
-    return create_weight_ds(data_knw, data_unknw, split_data_knw)
+def filter_dataset_cat(data: NodeData, attr_name: str) -> tuple[np.ndarray, list[NodeData]]:
+    """ create the datasets corresponding to the split of a categorical attribute
 
-def filter_dataset_high(data: pd.DataFrame, attr_name: str, threshold: float) -> pd.DataFrame:
-    """ create the dataset corresponding to the high split of a continuous value """
-    data_knw = data[data[attr_name] != '?'].copy(deep=True)
-    data_unknw = data[data[attr_name] == '?'].copy(deep=True)
-    # higher than the threshold
-    split_data_knw = data_knw[data_knw[attr_name] > threshold].copy(deep=True)
-    return create_weight_ds(data_knw, data_unknw, split_data_knw)
+    Returns the codes of the known values in the node, in order of appearance,
+    and the dataset of each of them
+    """
+    codes = data.get_column(attr_name)
+    missing = data.get_missing(attr_name)
+    attr_codes = pd.unique(codes[~missing])
+    children = np.full(len(data.get_vocabulary(attr_name)), -1, dtype=np.int32)
+    children[attr_codes] = np.arange(len(attr_codes))
+    child_ids = np.where(missing, -1, children[codes])
+    return attr_codes, data.partition(child_ids, len(attr_codes))
 
-def create_weight_ds(
-        data_knw: pd.DataFrame,
-        data_unknw: pd.DataFrame,
-        split_data_knw: pd.DataFrame) -> pd.DataFrame:
-    """ create the weight for the unkonwn part of data """
-    weight_unknw = len(split_data_knw) / len(data_knw)
-    weight_unknw = np.array([weight_unknw] * len(data_unknw))
-    weight = (weight_unknw * np.array(data_unknw['weight'].copy(deep=True))).tolist()
-    data_unknw = data_unknw
-    data_unknw.loc[:, ['weight']] = weight
-    return pd.concat([split_data_knw, data_unknw], ignore_index=True)
+def filter_dataset_cont(data: NodeData, attr_name: str, threshold: float) -> list[NodeData]:
+    """ create the datasets corresponding to the low and the high split of a continuous value """
+    # unknown values are nan and never satisfy the test
+    child_ids = np.where(data.get_missing(attr_name), -1, data.get_column(attr_name) > threshold)
+    return data.partition(child_ids.astype(np.int32), 2)
@@ -0,0 +1,184 @@
+""" Functions generating the python code of a predictor from a compiled tree """
+from types import ModuleType
+import numpy as np
+from c4dot5.compiling import CompiledTree, LEAF, CONTINUOUS, CATEGORICAL
+
+# deeper tests are moved in their own function (python limits the nested blocks)
+MAX_NESTING = 40
+
+HEADER = '''""" Predictor of a C4.5 decision tree, generated by c4dot5 """
+try:
+    from c4dot5.exceptions import ChildrenNotFound
+except ImportError:
+    class ChildrenNotFound(Exception):
+        """ raised when the value of an attribute has no child in a node """
+
+'''
+
+FUNCTIONS = '''
+
+def predict(row):
+    """ Returns the class predicted for row, a dict or a tuple ordered as ATTRIBUTES
+
+    If a test finds an unknown value (missing, None, nan or '?') the row reaches
+    more leaves and the pooled distribution over the classes is returned instead.
+    """
+    if row.__class__ is tuple:
+        return _predict_tuple_0(row)
+    return _predict_dict_0(row)
+
+def predict_label(row):
+    """ Returns the class predicted for row, also when the row reaches more leaves
+
+    the pooled distribution gives the class with the maximum probability, the greatest on ties
+    """
+    prediction = predict(row)
+    if prediction.__class__ is not dict:
+        return prediction
+    return max(zip(prediction.values(), prediction.keys()))[1]
+
+def predict_distribution(row):
+    """ Returns the distribution over the classes of the leaves reached by row """
+    return _get_distribution(row, 0)
+
+def _get_value(row, attr_idx):
+    if row.__class__ is tuple:
+        return row[attr_idx]
+    return row.get(ATTRIBUTES[attr_idx])
+
+def _reach_leaves(row, node_idx):
+    leaves = []
+    nodes = [node_idx]
+    while nodes:
+        node_idx = nodes.pop()
+        if KIND[node_idx] == LEAF:
+            leaves.append(node_idx)
+            continue
+        value = _get_value(row, FEATURE[node_idx])
+        if value is None or value != value or value == '?':
+            nodes.extend(child for child in CHILDREN[node_idx] if child != -1)
+            continue
+        if KIND[node_idx] == CONTINUOUS:
+            child = CHILDREN[node_idx][0 if float(value) <= THRESHOLD[node_idx] else 1]
+        else:
+            child = CATEGORIES[node_idx].get(value if value.__class__ is str else f"{value}", -1)
+        if child == -1:
+            raise ChildrenNotFound(f"Can't find children for node [{LABELS[node_idx]}] "
+                                   f"and attribute [{ATTRIBUTES[FEATURE[node_idx]]}] with value {value}")
+        nodes.append(child)
+    return leaves
+
+def _get_distribution(row, node_idx):
+    leaves = _reach_leaves(row, node_idx)
+    total_count = 0.0
+    for leaf in leaves:
+        total_count += LEAF_TOTAL[leaf]
+    distribution = {}
+    for class_idx, target in enumerate(CLASSES):
+        probability = 0.0
+        present = False
+        for leaf in leaves:
+            probability += LEAF_COUNTS[leaf][class_idx] / total_count
+            present = present or LEAF_PRESENT[leaf][class_idx]
+        if present:
+            distribution[target] = round(probability * 10000.0) / 10000.0
+    return distribution
+'''
+
+
+def generate_predictor_source(compiled_tree: CompiledTree, attributes: list) -> str:
+    """ Returns the source code of a module predicting single rows with the tree
+
+    The tests of the tree are inlined as nested if statements, reading the rows
+    as dicts or as tuples ordered as attributes. Rows with unknown values are
+    pooled over the leaves with the tables of the tree written in the module.
+    """
+    attributes = list(attributes)
+    feature = [-1 if attr_idx == -1 else attributes.index(compiled_tree.attributes[attr_idx])
+               for attr_idx in compiled_tree.feature.tolist()]
+    lines = [HEADER]
+    lines.append(f"ATTRIBUTES = {tuple(attributes)!r}")
+    lines.append(f"CLASSES = {tuple(to_python(target) for target in compiled_tree.classes)!r}")
+    lines.append(f"LEAF, CONTINUOUS, CATEGORICAL = {LEAF}, {CONTINUOUS}, {CATEGORICAL}")
+    lines.append(f"KIND = {tuple(compiled_tree.kind.tolist())!r}")
+    lines.append(f"FEATURE = {tuple(feature)!r}")
+    lines.append(f"THRESHOLD = ({''.join(f'{get_float_source(threshold)}, ' for threshold in compiled_tree.threshold)})")
+    lines.append(f"CHILDREN = {tuple(tuple(compiled_tree.get_children(idx).tolist()) for idx in range(len(compiled_tree)))!r}")
+    lines.append(f"CATEGORIES = {tuple(compiled_tree.categories)!r}")
+    lines.append(f"LABELS = {tuple(compiled_tree.labels.tolist())!r}")
+    leaves = [compiled_tree.leaf_index[idx] for idx in range(len(compiled_tree))]
+    lines.append("LEAF_COUNTS = ({})".format(''.join(
+        'None, ' if leaf == -1 else f"({''.join(f'{get_float_source(count)}, ' for count in compiled_tree.class_counts[leaf])}), "
+        for leaf in leaves)))
+    lines.append("LEAF_TOTAL = ({})".format(''.join(
+        'None, ' if leaf == -1 else f"{get_float_source(compiled_tree.leaf_totals[leaf])}, " for leaf in leaves)))
+    lines.append("LEAF_PRESENT = ({})".format(''.join(
+        'None, ' if leaf == -1 else f"{tuple(compiled_tree.class_present[leaf].tolist())!r}, " for leaf in leaves)))
+    lines.append(FUNCTIONS)
+    for access in ("dict", "tuple"):
+        functions = [0]
+        while functions:
+            node_idx = functions.pop()
+            lines.append(f"def _predict_{access}_{node_idx}(row):")
+            lines.extend(generate_node_source(compiled_tree, feature, attributes, access, node_idx, 1, functions))
+            lines.append("")
+    return "\n".join(lines)
+
+def generate_node_source(
+        compiled_tree: CompiledTree, feature: list, attributes: list, access: str,
+        node_idx: int, nesting: int, functions: list) -> list[str]:
+    """ Returns the lines testing the rows reaching node_idx """
+    indent = "    " * nesting
+    if compiled_tree.kind[node_idx] == LEAF:
+        class_idx = compiled_tree.leaf_labels[compiled_tree.leaf_index[node_idx]]
+        return [f"{indent}return {to_python(compiled_tree.classes[class_idx])!r}"]
+    if nesting > MAX_NESTING:
+        functions.append(node_idx)
+        return [f"{indent}return _predict_{access}_{node_idx}(row)"]
+    if access == "dict":
+        value = f"row.get({attributes[feature[node_idx]]!r})"
+    else:
+        value = f"row[{feature[node_idx]}]"
+    lines = [
+        f"{indent}value = {value}",
+        f"{indent}if value is None or value != value or value == '?':",
+        f"{indent}    return _get_distribution(row, {node_idx})"]
+    children = compiled_tree.get_children(node_idx).tolist()
+    if compiled_tree.kind[node_idx] == CONTINUOUS:
+        low_test = f"float(value) <= {get_float_source(compiled_tree.threshold[node_idx])}"
+        tests = [(test, child) for test, child in zip([low_test, f"not {low_test}"], children) if child != -1]
+    else:
+        lines.append(f"{indent}if value.__class__ is not str:")
+        lines.append(f"{indent}    value = f\"{{value}}\"")
+        tests = [(f"value == {category!r}", child)
+                 for category, child in compiled_tree.categories[node_idx].items()]
+    for test_idx, (test, child) in enumerate(tests):
+        if compiled_tree.kind[node_idx] == CONTINUOUS and test_idx == 1:
+            # the high child takes the remaining rows
+            lines.append(f"{indent}else:")
+        else:
+            lines.append(f"{indent}{'if' if test_idx == 0 else 'elif'} {test}:")
+        lines.extend(generate_node_source(
+            compiled_tree, feature, attributes, access, child, nesting + 1, functions))
+    if compiled_tree.kind[node_idx] != CONTINUOUS or len(tests) < len(children):
+        lines.append(f"{indent}raise ChildrenNotFound(f\"Can't find children for node [{{LABELS[{node_idx}]}}] \"")
+        lines.append(f"{indent}                       f\"and attribute [{{ATTRIBUTES[{feature[node_idx]}]}}] with value {{value}}\")")
+    return lines
+
+def get_float_source(value: float) -> str:
+    """ returns the python expression of a float """
+    if np.isfinite(value):
+        return repr(float(value))
+    return f"float('{value}')"
+
+def to_python(value):
+    """ converts the numpy scalars in python objects """
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def load_predictor(source: str) -> ModuleType:
+    """ compiles the source of a generated predictor and returns it as a module """
+    module = ModuleType("c4dot5_predictor")
+    exec(compile(source, "<c4dot5-predictor>", "exec"), module.__dict__)
+    return module
@@ -1,7 +1,88 @@
+import io
+import os
 import pickle
+import threading
+from typing import Callable, Optional
+import numpy as np
+import pandas as pd
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.exporting import MAGIC
+from c4dot5.runtime import read_header, read_arrays, create_compiled_tree
+from c4dot5.predictor import PredictionHandler
 
 
 def import_classifier(file_path: str):
+    """ loads a classifier saved with save() (pickle) or with save_model() """
     with open(file_path, 'rb') as file:
+        if file.read(len(MAGIC)) == MAGIC:
+            return import_model(file_path)
+        file.seek(0)
         classifier = pickle.load(file)
     return classifier
+
+def import_model(file_path: str) -> DecisionTreeClassifier:
+    """ loads a classifier saved with save_model(), its nodes are created only when needed """
+    with open(file_path, 'rb') as file:
+        header = read_header(file)
+        file.seek(0)
+        content = file.read()
+    return create_classifier(header, read_arrays(header, content), read_training_data(header, content))
+
+def map_model(file_path: str) -> DecisionTreeClassifier:
+    """ loads a classifier saved with save_model(), memory-mapping its arrays read-only
+
+    The arrays are not read: their pages are loaded by the operating system when
+    the model is used and the processes mapping the same file share them.
+    The file must not be modified while mapped: save_model() replaces it with a new file.
+    """
+    with open(file_path, 'rb') as file:
+        header = read_header(file)
+    mapped_file = np.memmap(file_path, dtype=np.uint8, mode='r')
+    return create_classifier(header, read_arrays(header, mapped_file), read_training_data(header, mapped_file))
+
+def read_training_data(header: dict, content) -> Optional[pd.DataFrame]:
+    """ returns the training data saved in the model file, if any """
+    description = header["training_data"]
+    if description is None:
+        return None
+    return pd.read_pickle(io.BytesIO(
+        bytes(content[description["offset"]:description["offset"] + description["nbytes"]])), compression=None)
+
+def create_classifier(header: dict, arrays: dict, training_data=None) -> DecisionTreeClassifier:
+    """ creates the classifier of a model file from its header and arrays """
+    classifier = DecisionTreeClassifier(dict(header["attributes_map"]), **header["parameters"])
+    classifier.decision_tree.load_compiled_tree(create_compiled_tree(header, arrays))
+    classifier.decision_tree.set_prediction_handler(PredictionHandler())
+    classifier.classes_ = np.array(header["classes"], dtype=object)
+    classifier.training_handler.complete_dataset = training_data
+    return classifier
+
+
+class ModelReloader:
+    """ Keeps the classifier of a model file, loading it again when the file changes
+
+    The file is checked at every get_classifier() (one stat), the classifiers
+    already returned keep working on the previous version of the file.
+    """
+    def __init__(self, file_path: str, loader: Callable=map_model):
+        self.file_path = file_path
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._signature = None
+        self._classifier = None
+
+    def get_classifier(self) -> DecisionTreeClassifier:
+        """ returns the classifier of the current version of the file """
+        signature = get_file_signature(self.file_path)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._classifier = self.loader(self.file_path)
+                    self._signature = signature
+        return self._classifier
+
+
+def get_file_signature(file_path: str) -> tuple[int, int, int]:
+    """ returns what changes when a file is replaced or modified """
+    stat = os.stat(file_path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,81 @@
+""" Impurity kernels evaluating the splits on per-class weight counts """
+from abc import ABC, abstractmethod
+from typing import Callable, Union
+import numpy as np
+import pandas as pd
+from c4dot5.exceptions import WrongSplitEvaluationFunction
+from c4dot5.training import class_entropy
+
+
+class ImpurityKernel(ABC):
+    """ Evaluates the impurity of splits described by per-class weight counts
+
+    class_counts has one column per target class (in the order of the classes
+    found in the training data) and one row per split; a single split can be
+    passed as a one-dimensional array. The kernel returns one impurity per split.
+    """
+    @abstractmethod
+    def __call__(self, class_counts: np.ndarray) -> Union[np.ndarray, float]:
+        pass
+
+
+class EntropyKernel(ImpurityKernel):
+    """ weighted entropy of the splits, the default of C4.5 """
+    def __call__(self, class_counts: np.ndarray) -> Union[np.ndarray, float]:
+        totals = class_counts.sum(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ops = class_counts / totals
+            entropy_terms = np.where(ops > 0, ops * np.log2(ops), 0.0)
+        return - np.sum(entropy_terms, axis=-1)
+
+
+class GiniKernel(ImpurityKernel):
+    """ weighted gini index of the splits """
+    def __call__(self, class_counts: np.ndarray) -> Union[np.ndarray, float]:
+        totals = class_counts.sum(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ops = np.where(totals > 0, class_counts / totals, 0.0)
+        return 1 - np.sum(ops ** 2, axis=-1)
+
+
+class DataFrameKernel(ImpurityKernel):
+    """ Adapter of the functions evaluating a dataframe with 'target' and 'weight' columns
+
+    The function receives one row for every class present in the split,
+    with the total weight of the class.
+    """
+    def __init__(self, evaluate_split_fn: Callable, classes: np.ndarray):
+        self.evaluate_split_fn = evaluate_split_fn
+        self.classes = classes
+
+    def __call__(self, class_counts: np.ndarray) -> Union[np.ndarray, float]:
+        if class_counts.ndim == 1:
+            return self.evaluate_counts(class_counts)
+        return np.array([self.evaluate_counts(split_counts) for split_counts in class_counts])
+
+    def evaluate_counts(self, class_counts: np.ndarray) -> float:
+        """ evaluates the function on the dataframe of a single split """
+        present = class_counts > 0
+        data = pd.DataFrame({'target': self.classes[present], 'weight': class_counts[present]})
+        try:
+            impurity = self.evaluate_split_fn(data)
+        except Exception as exc:
+            raise WrongSplitEvaluationFunction("Do you used a custom split evaluation function? \
+                    Check its compatibility with the 'target' and 'weight' dataframe.") from exc
+        if not isinstance(impurity, float):
+            raise WrongSplitEvaluationFunction("The output of the split evaluation function \
+                    must be a float.")
+        return impurity
+
+
+def get_impurity_kernel(evaluate_split_fn: Union[ImpurityKernel, Callable], classes: np.ndarray) -> ImpurityKernel:
+    """ returns the kernel evaluating the splits
+
+    the default entropy function is replaced by its kernel,
+    the other dataframe functions are wrapped by the adapter
+    """
+    if isinstance(evaluate_split_fn, ImpurityKernel):
+        return evaluate_split_fn
+    if evaluate_split_fn is class_entropy:
+        return EntropyKernel()
+    return DataFrameKernel(evaluate_split_fn, classes)
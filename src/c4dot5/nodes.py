@@ -4,7 +4,7 @@ from abc import ABC, abstractmethod
 from typing import Union
 import uuid
 import numpy as np
-from c4dot5.attributes import DecisionNodeAttributes, LeafNodeAttributes, NodeType
+from c4dot5.attributes import NodeAttributes, DecisionNodeAttributes, LeafNodeAttributes, NodeType
 from c4dot5.node_utils import continuous_test_fn, get_distribution
 from c4dot5.checking import check_attributes
 
@@ -26,7 +26,11 @@ class Node(ABC):
     @abstractmethod
     def get_id(self) -> str:
         """ Get the node's univoque index """
-    
+
+    @abstractmethod
+    def get_node_attributes(self) -> NodeAttributes:
+        """ Get the attributes the node has been created with """
+
 
 class DecisionNode(Node):
     """ Class implementing a decision node of a decision tree """
@@ -57,6 +61,9 @@ class DecisionNodeContinuous(DecisionNode):
         check_attributes(attributes, parent_node)
         self._parent_node = parent_node
         self._childs = set()
+        # children below and above the threshold
+        self._low_child = None
+        self._high_child = None
         self._attributes = attributes
         self._id = str(uuid.uuid4())
 
@@ -86,10 +93,15 @@ class DecisionNodeContinuous(DecisionNode):
     def add_child(self, child):
         """ Adds another node to the set of node childs """
         self._childs.add(child)
+        self._index_child(child)
 
     def delete_child(self, child):
         """ Removes a node from the set of node childs """
         self._childs.remove(child)
+        if child is self._low_child:
+            self._low_child = None
+        elif child is self._high_child:
+            self._high_child = None
 
     def get_children(self) -> set:
         """ Returns the set of the node childs """
@@ -107,15 +119,38 @@ class DecisionNodeContinuous(DecisionNode):
 
     def get_child(self, attr_value: float) -> Union[Node, None]:
         """ Returns the child compatible with the attribute value """
-        required_child = None
-        for child in self.get_children():
-            if child.get_label() == self.run_test(attr_value):
-                required_child = child
-        return required_child
+        if self._run_continuous_test(float(attr_value)):
+            return self._low_child
+        return self._high_child
+
+    def get_low_high_children(self) -> tuple[Union[Node, None], Union[Node, None]]:
+        """ Returns the children below and above the threshold (None if missing) """
+        return self._low_child, self._high_child
+
+    def __getattr__(self, name: str):
+        # nodes pickled before the children were indexed: the index is rebuilt from the
+        # labels of the children at the first use (when the node is unpickled its
+        # children may still be without their attributes)
+        if name in ('_low_child', '_high_child') and '_childs' in self.__dict__:
+            self._low_child = self._high_child = None
+            for child in self._childs:
+                self._index_child(child)
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _index_child(self, child):
+        """ stores child as the child below or above the threshold, by its label """
+        if child.get_label().startswith(f"{self._attributes.attribute_name} <= "):
+            self._low_child = child
+        elif child.get_label().startswith(f"{self._attributes.attribute_name} > "):
+            self._high_child = child
 
     def get_id(self) -> str:
         return self._id
 
+    def get_node_attributes(self) -> NodeAttributes:
+        return self._attributes
+
 
 class DecisionNodeCategorical(DecisionNode):
     """ Decision node splitting data on categorical attribute """
@@ -123,6 +158,9 @@ class DecisionNodeCategorical(DecisionNode):
         check_attributes(attributes, parent_node)
         self._parent_node = parent_node
         self._children = set()
+        # children by the value of the test, the end of their label
+        self._children_by_value = {}
+        self._children_by_bool = {}
         self._attributes = attributes
         self._id = str(uuid.uuid4())
 
@@ -145,10 +183,35 @@ class DecisionNodeCategorical(DecisionNode):
     def add_child(self, child):
         """ Adds another node to the set of node childs """
         self._children.add(child)
+        self._index_child(child)
+
+    def _index_child(self, child):
+        """ stores child by the value of the test, the end of its label """
+        prefix = f"{self._attributes.attribute_name} = "
+        if child.get_label().startswith(prefix):
+            value = child.get_label()[len(prefix):]
+            self._children_by_value[value] = child
+            if value in ("True", "False"):
+                self._children_by_bool[value == "True"] = child
+
+    def __getattr__(self, name: str):
+        # nodes pickled before the children were indexed: the index is rebuilt from the
+        # labels of the children at the first use (when the node is unpickled its
+        # children may still be without their attributes)
+        if name in ('_children_by_value', '_children_by_bool') and '_children' in self.__dict__:
+            self._children_by_value = {}
+            self._children_by_bool = {}
+            for child in self._children:
+                self._index_child(child)
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
     def delete_child(self, child):
         """ Removes a node from the set of node childs """
         self._children.remove(child)
+        for children_by_value in (self._children_by_value, self._children_by_bool):
+            for value in [value for value, value_child in children_by_value.items() if value_child is child]:
+                del children_by_value[value]
 
     def get_children(self) -> set:
         """ Returns the set of the node childs """
@@ -160,15 +223,23 @@ class DecisionNodeCategorical(DecisionNode):
 
     def get_child(self, attr_value: str | bool) -> Union[Node, None]:
         """ Returns the child fulfilling the condition given by the attribute value """
-        required_child = None
-        for child in self.get_children():
-            if child.get_label() == self.run_test(attr_value):
-                required_child = child
-        return required_child
+        if isinstance(attr_value, str):
+            return self._children_by_value.get(attr_value)
+        if isinstance(attr_value, (bool, np.bool_)):
+            return self._children_by_bool.get(bool(attr_value))
+        # other values are matched on their string as in the label
+        return self._children_by_value.get(f"{attr_value}")
+
+    def get_children_by_value(self) -> dict:
+        """ Returns the dictionary mapping the values of the test to the children """
+        return self._children_by_value
 
     def get_id(self) -> str:
         return self._id
 
+    def get_node_attributes(self) -> NodeAttributes:
+        return self._attributes
+
 
 class LeafNode(Node):
     """ class implementing a leaf node of the decision tree """
@@ -218,3 +289,6 @@ class LeafNode(Node):
 
     def get_id(self) -> str:
         return self._id
+
+    def get_node_attributes(self) -> NodeAttributes:
+        return self._attributes
@@ -0,0 +1,28 @@
+""" Predicts a CSV or Parquet file a chunk at a time: python -m c4dot5.predict model input output """
+import argparse
+import sys
+from typing import Optional
+from c4dot5.importing import import_classifier
+
+
+def main(argv: Optional[list]=None):
+    parser = argparse.ArgumentParser(
+            prog="python -m c4dot5.predict",
+            description="Predicts a CSV or Parquet file with a saved classifier, a chunk of rows at a time.")
+    parser.add_argument("model", help="classifier saved with DecisionTreeClassifier.save()")
+    parser.add_argument("input", help="CSV or Parquet (.parquet, .pq) file to predict")
+    parser.add_argument("output", help="CSV file written with the predictions")
+    parser.add_argument("--chunksize", type=int, default=100000, help="rows predicted at a time")
+    parser.add_argument("--proba", action="store_true", help="add the probabilities of the classes")
+    parser.add_argument("--n-jobs", type=int, default=1, help="threads predicting every chunk")
+    args = parser.parse_args(argv)
+    classifier = import_classifier(args.model)
+    n_rows = 0
+    for predictions in classifier.predict_stream(
+            args.input, args.chunksize, args.proba, args.output, args.n_jobs):
+        n_rows += len(predictions)
+    print(f"{n_rows} rows predicted in {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
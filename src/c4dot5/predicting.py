@@ -1,43 +1,64 @@
 """ functions for the prediction phase """
-from copy import deepcopy
+from typing import TYPE_CHECKING, Optional
 import numpy as np
-from c4dot5.nodes import Node
-
-def select_children_for_prediction(attr_value: str | bool | float, node: Node) -> list[Node]:
-    """ returns childs based on attribute known or unknown """
-    if attr_value == "?":
-        return node.get_children()
-    return [node.get_child(attr_value)]
-
-def create_predictions_dict(leaves_nodes: list[Node]) -> dict:
-    """ creates the dictionary of classes distribution """
-    leaves_names = []
-    for leave in leaves_nodes:
-        leaves_names.append(leave.get_label())
-    predictions_dict = dict.fromkeys(leaves_names, [])
-    return predictions_dict
-
-def create_distribution_dict(pred_dict: dict) -> dict:
-    """ returns a dictionary with the targets involved """
-    distribution_targets = set()
-    for leaf_node in pred_dict:
-        if pred_dict[leaf_node]:
-            for target in pred_dict[leaf_node]:
-                distribution_targets.add(target)
-    return dict.fromkeys(distribution_targets, 0)
-
-def get_predictions_distribution(pred_dict: dict) -> dict:
-    """ Returns a dictionary containing the distribution over the target classes """
-    pred_dict = deepcopy(pred_dict)
-    pred_dict = {key: pred_dict[key] for key in pred_dict if len(pred_dict[key]) > 0}
-    distribution_dict = create_distribution_dict(pred_dict)
-    total_count = 0
-    for item in pred_dict.items():
-        total_count += sum(item[1].values())
-    # in the paper is as follows:
-    # target_x: sum_leafcontainingx( samples_leaf / total_samples * perc_samples_in_leaf)
-    for item in pred_dict.items():
-        for target in item[1]:
-            distribution_dict[target] += item[1][target] / total_count
-    # round the result
-    return {item[0]: np.round(item[1], 4) for item in distribution_dict.items()}
+import pandas as pd
+from c4dot5.compiling import CompiledTree, CONTINUOUS
+from c4dot5.routing import route_columns
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+def get_unknown_mask(column: pd.Series) -> np.ndarray:
+    """ returns the mask of the unknown values (nan or '?') of a column """
+    return (column.isna() | (column == "?")).to_numpy()
+
+def route_rows(data_input: pd.DataFrame, compiled_tree: CompiledTree,
+               visited_nodes: Optional[list]=None) -> list[tuple[int, np.ndarray]]:
+    """ Routes the rows of data_input down the tree, one partition of row indices per node
+
+    Rows with unknown value of the attribute of a node are passed to all its children.
+    Returns the leaves reached and the indices of the rows reaching each of them.
+    If visited_nodes is given, every node reached is appended to it with its rows.
+    """
+    return route_columns(
+            lambda attr_idx, node_kind: get_prediction_column(
+                data_input[compiled_tree.attributes[attr_idx]], node_kind),
+            len(data_input), compiled_tree, visited_nodes)
+
+def get_prediction_column(column: pd.Series, node_kind: int) -> tuple[np.ndarray, object]:
+    """ returns the mask of the unknown values and the values of a column
+    (floats for continuous attributes, codes and unique values for categorical ones) """
+    unknown = get_unknown_mask(column)
+    if node_kind == CONTINUOUS:
+        return unknown, column.where(~unknown).to_numpy(dtype=float)
+    return unknown, pd.factorize(column)
+
+def get_leaves_weights(
+        compiled_tree: CompiledTree,
+        reached_leaves: list[tuple[int, np.ndarray]],
+        n_rows: int) -> 'sparse.csr_matrix':
+    """ Returns the (rows x nodes) matrix of the weight of every leaf reached by a row
+
+    the weight of a leaf is its share of the examples pooled for the row (1 for a single leaf)
+    """
+    total_count = np.zeros(n_rows)
+    for leaf_idx, rows in reached_leaves:
+        total_count[rows] += compiled_tree.leaf_totals[compiled_tree.leaf_index[leaf_idx]]
+    weights = [compiled_tree.leaf_totals[compiled_tree.leaf_index[leaf_idx]] / total_count[rows]
+               for leaf_idx, rows in reached_leaves]
+    return get_nodes_matrix(reached_leaves, weights, n_rows, len(compiled_tree))
+
+def get_nodes_matrix(
+        nodes_rows: list[tuple[int, np.ndarray]], values: list[np.ndarray],
+        n_rows: int, n_nodes: int) -> 'sparse.csr_matrix':
+    """ Returns the (rows x nodes) sparse matrix with the values of the rows reaching every node """
+    # scipy is imported only by apply() and decision_path()
+    try:
+        from scipy import sparse
+    except ImportError as exc:
+        raise ImportError("Sparse outputs require scipy: pip install c4dot5-decision-tree[sparse]") from exc
+    if not nodes_rows:
+        return sparse.csr_matrix((n_rows, n_nodes))
+    rows = np.concatenate([node_rows for _, node_rows in nodes_rows])
+    columns = np.concatenate([np.full(len(node_rows), node_idx) for node_idx, node_rows in nodes_rows])
+    return sparse.csr_matrix((np.concatenate(values), (rows, columns)), shape=(n_rows, n_nodes))
@@ -1,47 +1,135 @@
-import copy
 import pandas as pd
-from typing import Union
-from c4dot5.predicting import create_predictions_dict, select_children_for_prediction
-from c4dot5.predicting import get_predictions_distribution
-from c4dot5.nodes import Node, LeafNode, DecisionNode
-from c4dot5.exceptions import ChildrenNotFound
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Union, Callable, Optional
+import numpy as np
+from c4dot5.predicting import route_rows, get_leaves_weights, get_nodes_matrix
+from c4dot5.routing import get_batch_distributions, get_batch_predictions
+from c4dot5.routing import get_batch_labels, get_batch_probabilities
+from c4dot5.compiling import CompiledTree, compile_tree
+from c4dot5.nodes import Node
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+# minimum number of rows of the chunks predicted in parallel
+MIN_CHUNK_ROWS = 1000
 
 
 class PredictionHandler:
-    """ Takes care of the prediction part """
-    def __init__(self, leaves_nodes):
-        self._predictions_dict = create_predictions_dict(leaves_nodes)
-
-    def reset_predictions(self):
-        """ Resets the predictions list and predictions dictionary """
-        for target in self._predictions_dict:
-            self._predictions_dict[target] = []
-
-    def _predict(self, row_input: pd.Series, node: Node):
-        if node is None:
-            breakpoint()
-        attribute = node.get_attribute().split(":")[0]
-        # in case of unknown variable more the data are passed to all children
-        childs = select_children_for_prediction(row_input[attribute], node)
-        for child in childs:
-            if child is None:
-                raise ChildrenNotFound(f"Can't find children for node [{node.get_label()}] and attribute [{attribute}] \
-                                       with value {row_input[attribute]}")
-            if isinstance(child, LeafNode):
-                self._predictions_dict[child.get_label()] = child.get_classes()
-            else:
-                self._predict(row_input, child)
-
-    def predict(self, data_input: pd.DataFrame, root_node: Node) -> tuple[list[str], list[dict]]:
-        """ Returns the target predicted by the tree for every row in data_input """
-        data_input = data_input.fillna('?')
-        preds = []
-        preds_distributions = []
-        for _, row in data_input.iterrows():
-            self.reset_predictions()
-            self._predict(row, root_node)
-            pred_distribution = get_predictions_distribution(self._predictions_dict)
-            predicted_class = max(zip(pred_distribution.values(), pred_distribution.keys()))[1]
-            preds.append(copy.copy(predicted_class))
-            preds_distributions.append(copy.copy(pred_distribution))
+    """ Takes care of the prediction part
+
+    The handler keeps no state of the predictions: every call works on its own
+    arrays, so that concurrent threads can predict with the same tree.
+    """
+    def __setstate__(self, state: dict):
+        # handlers pickled by older versions kept the leaves of the tree
+        state.pop('_leaves_nodes', None)
+        self.__dict__.update(state)
+
+    def predict(self, data_input: pd.DataFrame,
+                root_node: Union[Node, CompiledTree]) -> tuple[list[str], list[dict]]:
+        """ Returns the target predicted by the tree for every row in data_input
+
+        All the rows are routed together over the compiled tree
+        (the tree below root_node is compiled if needed).
+        """
+        if len(data_input) == 0:
+            return [], []
+        compiled_tree = get_compiled_tree(root_node)
+        data_input = data_input.reset_index(drop=True)
+        reached_leaves = route_rows(data_input, compiled_tree)
+        distributions, present = get_batch_distributions(compiled_tree, reached_leaves, len(data_input))
+        classes = compiled_tree.classes
+        preds = classes[get_batch_predictions(distributions, present)].tolist()
+        preds_distributions = [
+                dict(zip(classes[row_present].tolist(), row_distribution[row_present].tolist()))
+                for row_distribution, row_present in zip(distributions, present)]
         return preds, preds_distributions
+
+    def predict_labels(self, data_input: pd.DataFrame, root_node: Union[Node, CompiledTree]) -> list:
+        """ Returns the target predicted for every row in data_input, without the distributions """
+        if len(data_input) == 0:
+            return []
+        compiled_tree = get_compiled_tree(root_node)
+        reached_leaves = route_rows(data_input.reset_index(drop=True), compiled_tree)
+        return compiled_tree.classes[get_batch_labels(compiled_tree, reached_leaves, len(data_input))].tolist()
+
+    def predict_proba(self, data_input: pd.DataFrame, root_node: Union[Node, CompiledTree],
+                      classes: np.ndarray) -> np.ndarray:
+        """ Returns the probabilities of the classes (columns ordered as classes) for every row in data_input """
+        if len(data_input) == 0:
+            return np.zeros((0, len(classes)))
+        compiled_tree = get_compiled_tree(root_node)
+        reached_leaves = route_rows(data_input.reset_index(drop=True), compiled_tree)
+        return get_probabilities(compiled_tree, reached_leaves, len(data_input), classes)
+
+    def predict_labels_proba(self, data_input: pd.DataFrame, root_node: Union[Node, CompiledTree],
+                             classes: np.ndarray) -> tuple[list, np.ndarray]:
+        """ Returns the target predicted and the probabilities of the classes for every row
+        in data_input, as predict_labels() and predict_proba() with the rows routed once """
+        if len(data_input) == 0:
+            return [], np.zeros((0, len(classes)))
+        compiled_tree = get_compiled_tree(root_node)
+        reached_leaves = route_rows(data_input.reset_index(drop=True), compiled_tree)
+        labels = compiled_tree.classes[get_batch_labels(compiled_tree, reached_leaves, len(data_input))].tolist()
+        return labels, get_probabilities(compiled_tree, reached_leaves, len(data_input), classes)
+
+    def apply(self, data_input: pd.DataFrame, root_node: Union[Node, CompiledTree],
+              sparse_output: Optional[bool]=None) -> Union[np.ndarray, 'sparse.csr_matrix']:
+        """ Returns the leaf reached by every row in data_input, as index of the node in the compiled tree
+
+        If a row reaches more leaves (unknown values) or sparse_output is True, returns
+        instead the (rows x nodes) sparse matrix of the weight of every leaf reached.
+        """
+        compiled_tree = get_compiled_tree(root_node)
+        reached_leaves = route_rows(data_input.reset_index(drop=True), compiled_tree)
+        n_reached = np.zeros(len(data_input), dtype=np.int64)
+        for _, rows in reached_leaves:
+            n_reached[rows] += 1
+        if sparse_output or (sparse_output is None and np.any(n_reached > 1)):
+            return get_leaves_weights(compiled_tree, reached_leaves, len(data_input))
+        if np.any(n_reached > 1):
+            raise ValueError("Some rows reach more leaves, use the sparse output.")
+        leaves = np.zeros(len(data_input), dtype=np.int64)
+        for leaf_idx, rows in reached_leaves:
+            leaves[rows] = leaf_idx
+        return leaves
+
+    def decision_path(self, data_input: pd.DataFrame, root_node: Union[Node, CompiledTree]) -> 'sparse.csr_matrix':
+        """ Returns the (rows x nodes) sparse indicator of the nodes visited by every row in data_input """
+        compiled_tree = get_compiled_tree(root_node)
+        visited_nodes = []
+        route_rows(data_input.reset_index(drop=True), compiled_tree, visited_nodes)
+        return get_nodes_matrix(
+                visited_nodes, [np.ones(len(rows), dtype=np.int8) for _, rows in visited_nodes],
+                len(data_input), len(compiled_tree))
+
+
+def get_compiled_tree(root_node: Union[Node, CompiledTree]) -> CompiledTree:
+    """ returns the compiled tree, compiling the tree below root_node if needed """
+    if isinstance(root_node, CompiledTree):
+        return root_node
+    return compile_tree(root_node)
+
+def get_probabilities(compiled_tree: CompiledTree, reached_leaves: list[tuple[int, np.ndarray]],
+                      n_rows: int, classes: np.ndarray) -> np.ndarray:
+    """ returns the probabilities of the leaves reached by the rows, the columns ordered as classes """
+    probabilities = np.zeros((n_rows, len(classes)))
+    classes_position = {target: idx for idx, target in enumerate(classes)}
+    columns = [classes_position[target] for target in compiled_tree.classes]
+    probabilities[:, columns] = get_batch_probabilities(compiled_tree, reached_leaves, n_rows)
+    return probabilities
+
+def predict_chunks(predict_fn: Callable, data_input: pd.DataFrame, n_workers: int) -> list:
+    """ Splits data_input in chunks of contiguous rows and predicts them in parallel threads
+
+    Returns the results of predict_fn on the chunks, in the order of the rows.
+    """
+    n_chunks = min(n_workers, len(data_input) // MIN_CHUNK_ROWS)
+    if n_chunks <= 1:
+        return [predict_fn(data_input)]
+    bounds = np.linspace(0, len(data_input), n_chunks + 1).astype(int)
+    chunks = [data_input.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(max_workers=n_chunks) as executor:
+        return list(executor.map(predict_fn, chunks))
@@ -0,0 +1,138 @@
+""" Functions routing rows over a compiled tree and pooling the leaves they reach (NumPy only) """
+from typing import Callable, Optional
+import numpy as np
+from c4dot5.compiling import CompiledTree, LEAF, CONTINUOUS
+from c4dot5.exceptions import ChildrenNotFound
+
+
+def route_columns(get_column: Callable, n_rows: int, compiled_tree: CompiledTree,
+                  visited_nodes: Optional[list]=None) -> list[tuple[int, np.ndarray]]:
+    """ Routes n_rows rows down the tree, one partition of row indices per node
+
+    get_column(attr_idx, node_kind) returns the mask of the unknown values and the values
+    of an attribute (floats for continuous attributes, codes and unique values for categorical ones).
+    Rows with unknown value of the attribute of a node are passed to all its children.
+    Returns the leaves reached and the indices of the rows reaching each of them.
+    If visited_nodes is given, every node reached is appended to it with its rows.
+    """
+    kind, feature, threshold = compiled_tree.kind, compiled_tree.feature, compiled_tree.threshold
+    columns = [None] * len(compiled_tree.attributes)
+    categories_lookup = {}
+    reached_leaves = []
+    nodes = [(0, np.arange(n_rows))]
+    while nodes:
+        node_idx, rows = nodes.pop()
+        if visited_nodes is not None:
+            visited_nodes.append((node_idx, rows))
+        if kind[node_idx] == LEAF:
+            reached_leaves.append((node_idx, rows))
+            continue
+        attr_idx = feature[node_idx]
+        if columns[attr_idx] is None:
+            columns[attr_idx] = get_column(attr_idx, kind[node_idx])
+        unknown, values = columns[attr_idx]
+        node_unknown = unknown[rows]
+        known_rows, unknown_rows = rows[~node_unknown], rows[node_unknown]
+        children = compiled_tree.get_children(node_idx)
+        if kind[node_idx] == CONTINUOUS:
+            low = values[known_rows] <= threshold[node_idx]
+            children_rows = [(children[0], known_rows[low]), (children[1], known_rows[~low])]
+        else:
+            codes, uniques = values
+            if node_idx not in categories_lookup:
+                categories = compiled_tree.categories[node_idx]
+                categories_lookup[node_idx] = np.array(
+                        [categories.get(f"{value}", -1) for value in uniques], dtype=np.int64)
+            children_rows = split_rows_categorical(known_rows, categories_lookup[node_idx][codes[known_rows]])
+        for child_idx, child_rows in children_rows:
+            if child_idx == -1 and len(child_rows) > 0:
+                value = values[child_rows[0]] if kind[node_idx] == CONTINUOUS else values[1][values[0][child_rows[0]]]
+                raise ChildrenNotFound(f"Can't find children for node [{compiled_tree.labels[node_idx]}] \
+                                       and attribute [{compiled_tree.attributes[attr_idx]}] \
+                                       with value {value}")
+        # in case of unknown variable the data are passed to all children
+        children_rows = dict(children_rows)
+        for child_idx in children:
+            if child_idx == -1:
+                continue
+            child_rows = children_rows.get(child_idx, unknown_rows[:0])
+            if len(unknown_rows) > 0:
+                child_rows = np.concatenate([child_rows, unknown_rows])
+            if len(child_rows) > 0:
+                nodes.append((child_idx, child_rows))
+    return reached_leaves
+
+def split_rows_categorical(rows: np.ndarray, rows_child: np.ndarray) -> list[tuple[int, np.ndarray]]:
+    """ groups the rows by the child they go to """
+    order = np.argsort(rows_child, kind='stable')
+    children, starts = np.unique(rows_child[order], return_index=True)
+    return list(zip(children.tolist(), np.split(rows[order], starts[1:])))
+
+def get_batch_distributions(
+        compiled_tree: CompiledTree,
+        reached_leaves: list[tuple[int, np.ndarray]],
+        n_rows: int) -> tuple[np.ndarray, np.ndarray]:
+    """ Returns the distribution over the classes of the tree and the mask of
+    the classes present in the leaves reached by every row
+
+    As for a single row, the distribution pools the examples of all the leaves reached.
+    """
+    class_counts = compiled_tree.class_counts
+    leaf_index = compiled_tree.leaf_index
+    total_count = np.zeros(n_rows)
+    for leaf_idx, rows in reached_leaves:
+        total_count[rows] += compiled_tree.leaf_totals[leaf_index[leaf_idx]]
+    distributions = np.zeros((n_rows, len(compiled_tree.classes)))
+    present = np.zeros((n_rows, len(compiled_tree.classes)), dtype=bool)
+    for leaf_idx, rows in reached_leaves:
+        distributions[rows] += class_counts[leaf_index[leaf_idx]] / total_count[rows, np.newaxis]
+        present[rows] |= compiled_tree.class_present[leaf_index[leaf_idx]]
+    return np.round(distributions, 4), present
+
+def get_batch_predictions(distributions: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """ Returns the index of the predicted class of every row
+
+    ties are broken in favour of the greatest class, as for a single row
+    """
+    distributions = np.where(present, distributions, -1)
+    is_max = distributions == distributions.max(axis=1, keepdims=True)
+    return distributions.shape[1] - 1 - np.argmax(is_max[:, ::-1], axis=1)
+
+def get_batch_probabilities(
+        compiled_tree: CompiledTree,
+        reached_leaves: list[tuple[int, np.ndarray]],
+        n_rows: int) -> np.ndarray:
+    """ Returns the (not rounded) probabilities of the classes of the tree for every row
+
+    the class weights of the leaves reached by a row are summed and divided by their total weight
+    """
+    class_counts = np.zeros((n_rows, len(compiled_tree.classes)))
+    total_count = np.zeros(n_rows)
+    for leaf_idx, rows in reached_leaves:
+        leaf = compiled_tree.leaf_index[leaf_idx]
+        class_counts[rows] += compiled_tree.class_counts[leaf]
+        total_count[rows] += compiled_tree.leaf_totals[leaf]
+    return class_counts / total_count[:, np.newaxis]
+
+def get_batch_labels(
+        compiled_tree: CompiledTree,
+        reached_leaves: list[tuple[int, np.ndarray]],
+        n_rows: int) -> np.ndarray:
+    """ Returns the index of the predicted class of every row
+
+    the rows reaching a single leaf take the class of the leaf,
+    the distribution is pooled only for the rows reaching more leaves
+    """
+    labels = np.zeros(n_rows, dtype=np.int64)
+    n_reached = np.zeros(n_rows, dtype=np.int64)
+    for leaf_idx, rows in reached_leaves:
+        labels[rows] = compiled_tree.leaf_labels[compiled_tree.leaf_index[leaf_idx]]
+        n_reached[rows] += 1
+    pooled = np.flatnonzero(n_reached > 1)
+    if len(pooled) > 0:
+        position = np.full(n_rows, -1)
+        position[pooled] = np.arange(len(pooled))
+        pooled_leaves = [(leaf_idx, position[rows][position[rows] != -1]) for leaf_idx, rows in reached_leaves]
+        distributions, present = get_batch_distributions(compiled_tree, pooled_leaves, len(pooled))
+        labels[pooled] = get_batch_predictions(distributions, present)
+    return labels
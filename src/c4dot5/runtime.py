@@ -0,0 +1,206 @@
+""" Inference-only runtime predicting with the files saved with save_model(), importing only NumPy
+
+pandas, scipy, graphviz and the training code are not imported: the compiled tree
+of the file is routed with the same functions used by DecisionTreeClassifier.predict().
+
+    from c4dot5.runtime import load_model
+
+    model = load_model('example.model')
+    predictions = model.predict([{'Outlook': 'sunny', 'Humidity': 70}, {'Outlook': 'rain'}])
+    prediction, distribution = model.predict_one({'Outlook': 'sunny'}, distribution=True)
+
+The batch inputs are a mapping from the attributes to their columns (arrays, lists
+or a pandas dataframe) or a sequence of records, mappings from the attributes to their
+values. Arrays are read as the columns of a dataframe with the same dtype, the values
+of lists and records as they are, as predict_one() does.
+"""
+import json
+from types import ModuleType
+from typing import Iterable, Mapping, Sequence, Union
+import numpy as np
+from c4dot5.compiling import CompiledTree, CONTINUOUS
+from c4dot5.exporting import MAGIC, FORMAT_VERSION, PREAMBLE
+from c4dot5.generating import generate_predictor_source, load_predictor
+from c4dot5.routing import route_columns, get_batch_distributions, get_batch_predictions
+from c4dot5.routing import get_batch_labels, get_batch_probabilities
+
+
+class Model:
+    """ A decision tree loaded from a model file, predicting without pandas
+
+    attributes are the attributes of the classifier, in the order of the tuple
+    records, and classes_ its classes, in the order of the predict_proba() columns.
+    """
+    def __init__(self, compiled_tree: CompiledTree, attributes: list, classes: np.ndarray):
+        self.compiled_tree = compiled_tree
+        self.attributes = attributes
+        self.classes_ = classes
+        self._predictor = None
+
+    def predict(self, data_input: Union[Mapping, Sequence[Mapping]],
+                distribution=False) -> Union[list, tuple[list, list[dict]]]:
+        """ Returns the target predicted for every row in data_input, as DecisionTreeClassifier.predict() """
+        n_rows, get_column = get_input_columns(data_input, self.compiled_tree)
+        if n_rows == 0:
+            return ([], []) if distribution else []
+        reached_leaves = route_columns(get_column, n_rows, self.compiled_tree)
+        classes = self.compiled_tree.classes
+        if not distribution:
+            return classes[get_batch_labels(self.compiled_tree, reached_leaves, n_rows)].tolist()
+        distributions, present = get_batch_distributions(self.compiled_tree, reached_leaves, n_rows)
+        preds_distributions = [
+                dict(zip(classes[row_present].tolist(), row_distribution[row_present].tolist()))
+                for row_distribution, row_present in zip(distributions, present)]
+        return classes[get_batch_predictions(distributions, present)].tolist(), preds_distributions
+
+    def predict_proba(self, data_input: Union[Mapping, Sequence[Mapping]]) -> np.ndarray:
+        """ Returns the probabilities of the classes (columns ordered as classes_) for every row in data_input """
+        n_rows, get_column = get_input_columns(data_input, self.compiled_tree)
+        probabilities = np.zeros((n_rows, len(self.classes_)))
+        if n_rows == 0:
+            return probabilities
+        reached_leaves = route_columns(get_column, n_rows, self.compiled_tree)
+        classes_position = {target: idx for idx, target in enumerate(self.classes_)}
+        columns = [classes_position[target] for target in self.compiled_tree.classes]
+        probabilities[:, columns] = get_batch_probabilities(self.compiled_tree, reached_leaves, n_rows)
+        return probabilities
+
+    def predict_one(self, record: Mapping, distribution=False) -> Union[str, tuple[str, dict]]:
+        """ Returns the target predicted for a single record, as DecisionTreeClassifier.predict_one() """
+        predictor_module = self.get_predictor_module()
+        if not distribution:
+            return predictor_module.predict_label(record)
+        prediction_distribution = predictor_module.predict_distribution(record)
+        return max(zip(prediction_distribution.values(), prediction_distribution.keys()))[1], prediction_distribution
+
+    def predict_records(self, records: Iterable[Mapping], distribution=False) -> Union[list, tuple[list, list[dict]]]:
+        """ Returns the target predicted for every record, as predict_one() """
+        predictor_module = self.get_predictor_module()
+        if not distribution:
+            predict_label = predictor_module.predict_label
+            return [predict_label(record) for record in records]
+        predict_distribution = predictor_module.predict_distribution
+        distributions = [predict_distribution(record) for record in records]
+        return ([max(zip(record_distribution.values(), record_distribution.keys()))[1]
+                 for record_distribution in distributions], distributions)
+
+    def get_predictor_module(self) -> ModuleType:
+        """ returns the module generated from the tree to predict single records """
+        if self._predictor is None:
+            self._predictor = load_predictor(generate_predictor_source(self.compiled_tree, self.attributes))
+        return self._predictor
+
+
+def load_model(file_path: str, mmap: bool=False) -> Model:
+    """ Loads the tree of a file saved with save_model()
+
+    With mmap the arrays are memory-mapped read-only instead of read.
+    The training data are not loaded.
+    """
+    with open(file_path, 'rb') as file:
+        header = read_header(file)
+        if not mmap:
+            file.seek(0)
+            content = file.read()
+    if mmap:
+        content = np.memmap(file_path, dtype=np.uint8, mode='r')
+    return Model(create_compiled_tree(header, read_arrays(header, content)),
+                 list(header["attributes_map"]), np.array(header["classes"], dtype=object))
+
+def read_header(file) -> dict:
+    """ returns the header of a model file, checking its format version """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("The file is not a c4dot5 model.")
+    version, header_length = PREAMBLE.unpack(file.read(PREAMBLE.size))
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Model format version [{version}] not supported, update c4dot5 \
+                (supported versions up to {FORMAT_VERSION}).")
+    return json.loads(file.read(header_length).decode("utf-8"))
+
+def read_arrays(header: dict, content) -> dict:
+    """ returns the arrays of a model file, views of its content (bytes or memory map) """
+    return {name: np.frombuffer(
+        content, dtype=description["dtype"], count=int(np.prod(description["shape"])),
+        offset=description["offset"]).reshape(description["shape"])
+        for name, description in header["arrays"].items()}
+
+def create_compiled_tree(header: dict, arrays: dict) -> CompiledTree:
+    """ creates the compiled tree of a model file from its header and arrays (without the node ids) """
+    tree = header["tree"]
+    return CompiledTree(
+            tree["attributes"], arrays["kind"], arrays["feature"], arrays["threshold"],
+            arrays["children_offset"], arrays["children"], tree["categories"], arrays["parent"],
+            np.array(tree["labels"], dtype=object), np.full(len(arrays["kind"]), None, dtype=object),
+            arrays["leaf_index"], np.array(tree["classes"], dtype=object),
+            arrays["class_counts"], arrays["class_present"], arrays["leaf_totals"],
+            arrays["leaf_labels"], arrays["levels"], tree["node_attributes"], tree.get("category_types", {}))
+
+def get_input_columns(data_input: Union[Mapping, Sequence[Mapping]], compiled_tree: CompiledTree) -> tuple:
+    """ returns the number of rows of data_input and the function returning
+    the prediction column of an attribute of the tree, as route_columns() needs """
+    if hasattr(data_input, "columns"):
+        # a pandas dataframe
+        get_values = lambda name: np.asarray(data_input[name])
+        n_rows = len(data_input)
+    elif isinstance(data_input, Mapping):
+        get_values = lambda name: get_column_values(data_input[name])
+        n_rows = len(next(iter(data_input.values()))) if data_input else 0
+    else:
+        records = list(data_input)
+        get_values = lambda name: get_object_array([record.get(name) for record in records])
+        n_rows = len(records)
+    return n_rows, lambda attr_idx, node_kind: get_prediction_column(
+            get_values(compiled_tree.attributes[attr_idx]), node_kind)
+
+def get_column_values(values) -> np.ndarray:
+    """ returns the values of a column as an array, keeping the dtype of arrays and the Python values of sequences """
+    if hasattr(values, "dtype"):
+        return np.asarray(values)
+    return get_object_array(values)
+
+def get_object_array(values) -> np.ndarray:
+    """ returns an array of objects with the values
+    (numpy would convert a list with booleans and nan into floats) """
+    column = np.empty(len(values), dtype=object)
+    for idx, value in enumerate(values):
+        column[idx] = value
+    return column
+
+def get_prediction_column(values: np.ndarray, node_kind: int) -> tuple[np.ndarray, object]:
+    """ returns the mask of the unknown values and the values of a column
+    (floats for continuous attributes, codes and unique values for categorical ones) """
+    unknown = get_unknown_mask(values)
+    if node_kind == CONTINUOUS:
+        if values.dtype.kind not in 'biuf':
+            values = values.astype(object)
+        return unknown, np.where(unknown, np.nan, values).astype(float)
+    if values.dtype.kind != 'O':
+        uniques, codes = np.unique(values, return_inverse=True)
+        return unknown, (codes.reshape(-1), uniques)
+    # objects of different types can't be sorted
+    positions = {}
+    codes = np.fromiter((positions.setdefault(value, len(positions)) for value in values),
+                        dtype=np.int64, count=len(values))
+    uniques = np.empty(len(positions), dtype=object)
+    uniques[:] = list(positions)
+    return unknown, (codes, uniques)
+
+def get_unknown_mask(values: np.ndarray) -> np.ndarray:
+    """ returns the mask of the unknown values (None, nan or '?') of a column """
+    if values.dtype.kind in 'fc':
+        return np.isnan(values)
+    if values.dtype.kind in 'US':
+        return values == ('?' if values.dtype.kind == 'U' else b'?')
+    if values.dtype.kind != 'O':
+        return np.zeros(len(values), dtype=bool)
+    return np.fromiter((is_unknown(value) for value in values), dtype=bool, count=len(values))
+
+def is_unknown(value) -> bool:
+    """ returns True if value is missing (None or nan) or '?' """
+    if value is None or (isinstance(value, str) and value == '?'):
+        return True
+    try:
+        return bool(value != value)
+    except TypeError:
+        # pandas.NA can't be converted to a boolean
+        return True
@@ -0,0 +1,374 @@
+""" Asyncio server predicting with saved classifiers, coalescing the concurrent requests in batches
+
+The server speaks a minimal HTTP/1.1 (keep-alive, JSON bodies) over TCP or a unix socket:
+
+- GET /models returns the attributes and the classes of the served models
+- POST /models/<name>/predict with {"records": [...], "distribution": false}
+  returns {"predictions": [...]} (and "distributions" if requested)
+
+With --reload the model files are memory-mapped and loaded again when they change.
+
+Run it with: python -m c4dot5.serving name=model.classifier --port 8000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Optional, Union
+import pandas as pd
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.importing import import_classifier, ModelReloader
+from c4dot5.exceptions import PredictionRequestError
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+# longest body of a request
+MAX_BODY_BYTES = 64 * 2**20
+
+
+@dataclass
+class PredictionRequest:
+    """ records of a request waiting for their batch """
+    records: list
+    distribution: bool
+    future: asyncio.Future = field(repr=False)
+
+
+class MicroBatcher:
+    """ Coalesces the requests to a classifier in batches predicted with one call
+
+    A batch is closed when max_rows records are waiting or max_delay seconds have passed
+    since its first request. The batch is predicted in a thread, so that the
+    event loop keeps receiving the next requests in the meantime.
+    With a ModelReloader every batch is predicted by the current version of the model.
+    """
+    def __init__(self, classifier: Union[DecisionTreeClassifier, ModelReloader],
+                 max_delay: float=0.002, max_rows: int=256):
+        self.classifier = classifier
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        # created in the running event loop (before Python 3.10 a queue is bound to
+        # the loop of the thread that creates it)
+        self._queue = None
+        self._task = None
+
+    def get_classifier(self) -> DecisionTreeClassifier:
+        """ returns the classifier predicting the next batch """
+        if isinstance(self.classifier, ModelReloader):
+            return self.classifier.get_classifier()
+        return self.classifier
+
+    def start(self):
+        """ starts collecting the requests in the running event loop """
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        """ stops collecting the requests """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._queue = None
+
+    async def predict(self, records: list, distribution: bool=False) -> tuple[list, Optional[list]]:
+        """ Returns the predictions (and the distributions) of the records, predicted in the next batch """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PredictionRequest(records, distribution, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n_rows = len(batch[0].records)
+            deadline = loop.time() + self.max_delay
+            while n_rows < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                n_rows += len(batch[-1].records)
+            await self._predict_batch(batch)
+
+    async def _predict_batch(self, batch: list[PredictionRequest]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, self.predict_requests, batch)
+        except Exception:
+            # a wrong record must not fail the other requests: they are predicted one at a time
+            results = []
+            for request in batch:
+                try:
+                    results.append(await loop.run_in_executor(None, self.predict_requests, [request]))
+                except Exception as exc:
+                    results.append(exc)
+            results = [result if isinstance(result, Exception) else result[0] for result in results]
+        for request, result in zip(batch, results):
+            if request.future.done():
+                continue
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+
+    def predict_requests(self, batch: list[PredictionRequest]) -> list[tuple[list, Optional[list]]]:
+        """ predicts the records of all the requests with one call and splits the results """
+        classifier = self.get_classifier()
+        records = [record for request in batch for record in request.records]
+        data_input = pd.DataFrame.from_records(records, columns=list(classifier.get_attributes()))
+        if any(request.distribution for request in batch):
+            predictions, distributions = classifier.predict(data_input, distribution=True)
+        else:
+            predictions, distributions = classifier.predict(data_input), None
+        results = []
+        start = 0
+        for request in batch:
+            end = start + len(request.records)
+            results.append((predictions[start:end],
+                            distributions[start:end] if request.distribution else None))
+            start = end
+        return results
+
+
+class PredictionServer:
+    """ Serves the predictions of named classifiers (or ModelReloader), one micro-batcher for each of them """
+    def __init__(self, models: dict, max_delay: float=0.002, max_rows: int=256):
+        self.models = models
+        self.batchers = {name: MicroBatcher(classifier, max_delay, max_rows)
+                         for name, classifier in models.items()}
+        self.server = None
+
+    @classmethod
+    def from_files(cls, model_paths: dict, max_delay: float=0.002, max_rows: int=256,
+                   reload: bool=False) -> PredictionServer:
+        """ Loads the classifiers saved in the files, mapped by the names of the models
+
+        With reload the files (saved with save_model()) are memory-mapped when first
+        used and loaded again when they change.
+        """
+        if reload:
+            return cls({name: ModelReloader(file_path) for name, file_path in model_paths.items()},
+                       max_delay, max_rows)
+        return cls({name: import_classifier(file_path) for name, file_path in model_paths.items()},
+                   max_delay, max_rows)
+
+    async def start(self, host: str='127.0.0.1', port: int=0, path: Optional[str]=None) -> asyncio.AbstractServer:
+        """ starts listening on host and port (0 for a free port) or on the unix socket path """
+        for batcher in self.batchers.values():
+            batcher.start()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    def get_port(self) -> int:
+        """ returns the port of the TCP server """
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """ stops the server and the batchers """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for batcher in self.batchers.values():
+            await batcher.stop()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ answers the requests of a connection until the client closes it
+
+        A malformed request is answered with 400, one with a line longer than the
+        limit of the stream or a body longer than MAX_BODY_BYTES with 413, then the
+        connection is closed.
+        """
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                except ValueError:
+                    # readline() raises ValueError for a line over the limit of the stream
+                    await self.send_answer(writer, 413, {"error": "Request line or header too long."})
+                    await discard_input(reader, writer)
+                    break
+                try:
+                    content_length = int(headers.get("content-length", 0))
+                    if content_length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self.send_answer(writer, 400, {"error": "Content-Length must be a non negative integer."})
+                    await discard_input(reader, writer)
+                    break
+                if content_length > MAX_BODY_BYTES:
+                    await self.send_answer(writer, 413, {"error": f"Body longer than {MAX_BODY_BYTES} bytes."})
+                    await discard_input(reader, writer)
+                    break
+                body = await reader.readexactly(content_length)
+                method, target = (request_line.decode("latin-1").split() + ["", ""])[:2]
+                status, payload = await self.dispatch(method, target, body)
+                await self.send_answer(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def send_answer(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        """ writes the answer to a request """
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple[int, dict]:
+        """ returns the status and the payload of the answer to a request """
+        parts = target.strip("/").split("/")
+        if parts == ["models"]:
+            if method != "GET":
+                return 405, {"error": "Use GET to list the models."}
+            classifiers = {name: batcher.get_classifier() for name, batcher in self.batchers.items()}
+            return 200, {"models": {name: {"attributes": list(classifier.get_attributes()),
+                                           "classes": list(classifier.classes_)}
+                                    for name, classifier in classifiers.items()}}
+        if len(parts) != 3 or parts[0] != "models" or parts[2] != "predict":
+            return 404, {"error": f"Unknown path {target}"}
+        if parts[1] not in self.batchers:
+            return 404, {"error": f"Unknown model {parts[1]}"}
+        if method != "POST":
+            return 405, {"error": "Use POST to predict."}
+        try:
+            payload = json.loads(body or b"{}")
+            records = payload["records"]
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "The body must be a JSON object with a list of records."}
+        distribution = bool(payload.get("distribution", False))
+        try:
+            predictions, distributions = await self.batchers[parts[1]].predict(records, distribution)
+        except Exception as exc:
+            return 422, {"error": f"{type(exc).__name__}: {exc}"}
+        if distribution:
+            return 200, {"predictions": predictions, "distributions": distributions}
+        return 200, {"predictions": predictions}
+
+
+async def discard_input(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float=1.0):
+    """ reads the rest of a rejected request before the connection is closed
+
+    Closing a socket with unread data resets the connection, and the client
+    could lose the answer.
+    """
+    async def read_all():
+        while await reader.read(2**16):
+            pass
+
+    if writer.can_write_eof():
+        writer.write_eof()
+    try:
+        await asyncio.wait_for(read_all(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+class PredictionClient:
+    """ Minimal client of a PredictionServer, keeping one connection open """
+    def __init__(self, host: str='127.0.0.1', port: Optional[int]=None, path: Optional[str]=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self._reader = None
+        self._writer = None
+
+    async def __aenter__(self) -> PredictionClient:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def connect(self):
+        """ opens the connection with the server """
+        if self.path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        """ closes the connection with the server """
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def request(self, method: str, target: str, payload: Optional[dict]=None) -> tuple[int, dict]:
+        """ sends a request and returns the status and the payload of the answer """
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self._writer.write(f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                           .encode("latin-1") + body)
+        await self._writer.drain()
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, json.loads(await self._reader.readexactly(int(headers["content-length"])))
+
+    async def predict(self, model: str, records: list, distribution: bool=False) -> dict:
+        """ returns the predictions of the records with the model """
+        status, payload = await self.request(
+                "POST", f"/models/{model}/predict", {"records": records, "distribution": distribution})
+        if status != 200:
+            raise PredictionRequestError(f"{status}: {payload.get('error')}")
+        return payload
+
+
+def main(argv: Optional[list]=None):
+    parser = argparse.ArgumentParser(
+            prog="python -m c4dot5.serving",
+            description="Serves the predictions of saved classifiers, coalescing concurrent requests in batches.")
+    parser.add_argument("models", nargs="+", help="name=path of every classifier saved with .save()")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", default=None, help="path of a unix socket, instead of host and port")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="maximum wait of a request for its batch")
+    parser.add_argument("--max-rows", type=int, default=256, help="rows closing a batch")
+    parser.add_argument("--reload", action="store_true",
+                        help="memory-map the files saved with .save_model() and reload them when they change")
+    args = parser.parse_args(argv)
+    model_paths = dict(model.split("=", 1) for model in args.models)
+
+    async def serve():
+        server = PredictionServer.from_files(model_paths, args.max_delay_ms / 1000, args.max_rows, args.reload)
+        await server.start(args.host, args.port, args.unix_socket)
+        async with server.server:
+            await server.server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
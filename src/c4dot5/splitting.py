@@ -1,63 +1,98 @@
 """ Functions related to the splitting of the dataset """
 
+from concurrent.futures import Executor
+from functools import partial
 import pandas as pd
 import numpy as np
-from typing import Union, Callable
+from typing import Union, Optional
 from c4dot5.attributes import SplitAttributes, TrainingAttributes
+from c4dot5.encoding import NodeData
 from c4dot5.training import extract_max_gain_attributes, Actions
-from c4dot5.training import check_minimum_instances, compute_local_threshold_gain
-from c4dot5.training import get_minimum_instances_categorical, get_minimum_instances_continuous
-from c4dot5.filtering import filter_dataset_cat, filter_dataset_high, filter_dataset_low
-from c4dot5.exceptions import WrongSplitEvaluationFunction
+from c4dot5.training import check_minimum_instances, has_multiple_values
+from c4dot5.training import get_values_class_counts, compute_thresholds_gain
+from c4dot5.training import get_categories_class_counts, compute_categories_gain
+from c4dot5.impurity import ImpurityKernel
 
 
 def get_split(
-        data_in: pd.DataFrame, attr_fn_map: dict,
-        min_instances: int, attr_map: dict, 
-        evaluate_split_fn: Callable) -> SplitAttributes:
-    """ Compute the best split of the input data """
-    chosen_split_attributes = SplitAttributes(None, None, False)
+        data_in: NodeData, attr_fn_map: dict,
+        min_instances: int, attr_map: dict,
+        impurity: ImpurityKernel,
+        executor: Optional[Executor]=None) -> SplitAttributes:
+    """ Compute the best split of the input data
+
+    If an executor is given, the attributes are evaluated by its workers.
+    The results are collected in the attributes order, as in the serial case.
+    """
     # if there is only the target column or there aren't data the split doesn't exist
-    if len(data_in['target'].unique()) > 1 and len(data_in) > 0:
-        # in order the split to be chosen,
-        # its information gain must be at least equal to the mean of all the tests considered
-        tests_examined = {'gain_ratio': [], 'info_gain': [], 'threshold': [],
-                'attribute': [], 'not_near_trivial_subset': [], 'errs_perc': []}
-        for column in data_in.columns:
-            # gain ratio and threshold (if exist) for every feature
-            if not column in ['target', 'weight'] and len(data_in[column].unique()) > 1:
-                attr_type = attr_map[column]
-                data_column = data_in[[column, 'target', 'weight']]
-                split_attributes = attr_fn_map[attr_type](data_column, min_instances, evaluate_split_fn)
-                tests_examined['gain_ratio'].append(split_attributes.gain_ratio)
-                tests_examined['info_gain'].append(split_attributes.info_gain)
-                tests_examined['threshold'].append(split_attributes.local_threshold)
-                tests_examined['attribute'].append(column)
-                tests_examined['not_near_trivial_subset'].append(split_attributes.min_instances_condition)
-                tests_examined['errs_perc'].append(split_attributes.errs_perc)
-        # select the best split
-        tests_examined = pd.DataFrame.from_dict(tests_examined)
-        mean_info_gain = np.round(tests_examined['info_gain'].mean(), 4)
-        # keep only splits with info gain greater then zero
-        tests_examined = tests_examined[tests_examined['info_gain'] > 0.0].reset_index(drop=True)
-        # two conditions for the split to be chosen 
-        # 1) info gain greater then the mean AND minimum instances condition
-        # 2) only minimum instances condition 
-        gain_ratio_gt_mean = tests_examined['info_gain'] >= mean_info_gain
-        not_near_trivial_subset = tests_examined['not_near_trivial_subset']
-        select_max_gain_ratio = tests_examined[
-                (gain_ratio_gt_mean) & (not_near_trivial_subset)].reset_index(drop=True)
-        if len(select_max_gain_ratio) != 0:
-            chosen_split_attributes = extract_max_gain_attributes(
-                    select_max_gain_ratio, chosen_split_attributes)
-        elif len(tests_examined[tests_examined['not_near_trivial_subset']]) != 0:
-            # Otherwise 'select_max_gain_ratio' computed before is empty
-            select_max_gain_ratio = tests_examined[tests_examined['not_near_trivial_subset']].reset_index(drop=True)
-            chosen_split_attributes = extract_max_gain_attributes(
-                    select_max_gain_ratio, chosen_split_attributes)
+    if not is_splittable(data_in):
+        return SplitAttributes(None, None, False)
+    # gain ratio and threshold (if exist) for every feature
+    evaluate_attribute = partial(
+            get_split_gain_attribute, data_in, attr_fn_map, min_instances, attr_map, impurity)
+    if executor is None:
+        attributes_splits = map(evaluate_attribute, data_in.attributes)
+    else:
+        attributes_splits = executor.map(evaluate_attribute, data_in.attributes)
+    return select_split(list(zip(data_in.attributes, attributes_splits)))
+
+def is_splittable(data_in: NodeData) -> bool:
+    """ checks if there are data with more than one target class """
+    return len(data_in) > 0 and data_in.target.min() != data_in.target.max()
+
+def select_split(attributes_splits: list[tuple[str, Optional[SplitAttributes]]]) -> SplitAttributes:
+    """ select the best split among the ones of the attributes examined
+
+    attributes taking only one value in the node have no split (None)
+    """
+    chosen_split_attributes = SplitAttributes(None, None, False)
+    # in order the split to be chosen,
+    # its information gain must be at least equal to the mean of all the tests considered
+    tests_examined = {'gain_ratio': [], 'info_gain': [], 'threshold': [],
+            'attribute': [], 'not_near_trivial_subset': [], 'errs_perc': []}
+    for column, split_attributes in attributes_splits:
+        if split_attributes is not None:
+            tests_examined['gain_ratio'].append(split_attributes.gain_ratio)
+            tests_examined['info_gain'].append(split_attributes.info_gain)
+            tests_examined['threshold'].append(split_attributes.local_threshold)
+            tests_examined['attribute'].append(column)
+            tests_examined['not_near_trivial_subset'].append(split_attributes.min_instances_condition)
+            tests_examined['errs_perc'].append(split_attributes.errs_perc)
+    # select the best split
+    tests_examined = pd.DataFrame.from_dict(tests_examined)
+    mean_info_gain = np.round(tests_examined['info_gain'].mean(), 4)
+    # keep only splits with info gain greater then zero
+    tests_examined = tests_examined[tests_examined['info_gain'] > 0.0].reset_index(drop=True)
+    # two conditions for the split to be chosen
+    # 1) info gain greater then the mean AND minimum instances condition
+    # 2) only minimum instances condition
+    gain_ratio_gt_mean = tests_examined['info_gain'] >= mean_info_gain
+    not_near_trivial_subset = tests_examined['not_near_trivial_subset']
+    select_max_gain_ratio = tests_examined[
+            (gain_ratio_gt_mean) & (not_near_trivial_subset)].reset_index(drop=True)
+    if len(select_max_gain_ratio) != 0:
+        chosen_split_attributes = extract_max_gain_attributes(
+                select_max_gain_ratio, chosen_split_attributes)
+    elif len(tests_examined[tests_examined['not_near_trivial_subset']]) != 0:
+        # Otherwise 'select_max_gain_ratio' computed before is empty
+        select_max_gain_ratio = tests_examined[tests_examined['not_near_trivial_subset']].reset_index(drop=True)
+        chosen_split_attributes = extract_max_gain_attributes(
+                select_max_gain_ratio, chosen_split_attributes)
     return chosen_split_attributes
 
-def get_split_gain_categorical(data_in: pd.DataFrame, min_instances: int, evaluate_split_fn: Callable) -> SplitAttributes:
+def get_split_gain_attribute(
+        data_in: NodeData, attr_fn_map: dict,
+        min_instances: int, attr_map: dict,
+        impurity: ImpurityKernel, attr_name: str) -> Optional[SplitAttributes]:
+    """ Computes the split attributes of one attribute, None if it takes only one value """
+    if not has_multiple_values(data_in, attr_name):
+        return None
+    attr_type = attr_map[attr_name]
+    return attr_fn_map[attr_type](data_in, attr_name, min_instances, impurity)
+
+def get_split_gain_categorical(
+        data_in: NodeData, attr_name: str,
+        min_instances: int, impurity: ImpurityKernel) -> SplitAttributes:
     """ Computes the information gain, the gain ratio, the local threshold
     and the meaningfulness of the split
 
@@ -66,48 +101,30 @@ def get_split_gain_categorical(data_in: pd.DataFrame, min_instances: int, evalua
     The gain ratio is computed considering one more class if unknown data are present.
     For the split to be meaningful, it has to have at least two subsplits
     with more than min_instances example each.
+    Everything is derived from the value x class contingency table, built in a single pass.
     """
-    attr_name = [col for col in data_in.columns if col not in ['target', 'weight']][0]
-    try:
-        split_gain = evaluate_split_fn(data_in[data_in[attr_name] != '?'][['target', 'weight']])
-    except:
-        raise WrongSplitEvaluationFunction("Do you used a custom split evaluation function? \
-                Check its compatibility with categorical data.")
-    if not isinstance(split_gain, float):
-        raise WrongSplitEvaluationFunction("The output of the split evaluation function \
-                must be a float.")
-    split_info = 0
-    at_least_two = False
-    # if categorical number of split = number of attributes
-    data_counts = data_in[attr_name].value_counts()
+    known = ~data_in.get_missing(attr_name)
     # deals with unknown data
-    total_count = len(data_in)
-    known_count = len(data_in[data_in[attr_name] != '?'])
-    freq_known = known_count / total_count
-    for attr_value in data_in[attr_name].unique():
-        if not attr_value == '?':
-            freq_attr = data_counts[attr_value] / known_count
-            split_gain -= freq_attr * evaluate_split_fn(
-                    data_in[data_in[attr_name] == attr_value][['target', 'weight']])
-            split_info += - freq_attr * np.log2(freq_attr)
-        else:
-            # one more class for the unknown data
-            split_info += -(1 - freq_known) * np.log2(1 - freq_known)
-    gain_ratio = (freq_known * split_gain) / split_info
+    freq_known = np.count_nonzero(known) / len(data_in)
+    # if categorical number of split = number of attributes
+    _, class_counts, values_counts = get_categories_class_counts(
+            data_in.get_column(attr_name)[known], data_in.target[known],
+            data_in.weight[known], len(data_in.classes))
+    categories_gain = compute_categories_gain(
+            class_counts, values_counts, data_in.get_class_counts(~known), freq_known, impurity)
     # check also if at least two of the subset contain at least two cases,
     # to avoid near-trivial splits
-    #breakpoint()
-    # len_subsets = list(data_in[attr_name].value_counts())
-    #at_least_two = are_there_at_least_two(len_subsets, min_instances)
-    len_subsets = get_minimum_instances_categorical(data_in, attr_name)
-    minimum_instances_condition = check_minimum_instances(len_subsets, min_instances)
+    minimum_instances_condition = check_minimum_instances(values_counts.tolist(), min_instances)
     # split_gain = info_gain
     split_attributes = SplitAttributes(
-            np.round(gain_ratio, 4), np.round(split_gain, 4), minimum_instances_condition, attr_name)
-    split_attributes.errs_perc = np.round(compute_split_error_cat(data_in), 4)
+            np.round(categories_gain['gain_ratio'], 4), np.round(categories_gain['info_gain'], 4),
+            minimum_instances_condition, attr_name)
+    split_attributes.errs_perc = np.round(categories_gain['errs_perc'], 4)
     return split_attributes
 
-def get_split_gain_continuous(data_in: pd.DataFrame, min_instances: int, evaluate_split_fn: Callable) -> SplitAttributes:
+def get_split_gain_continuous(
+        data_in: NodeData, attr_name: str,
+        min_instances: int, impurity: ImpurityKernel) -> SplitAttributes:
     """ Computes the information gain, the gain ratio, the local threshold
     and the meaningfulness of the split
 
@@ -116,65 +133,167 @@ def get_split_gain_continuous(data_in: pd.DataFrame, min_instances: int, evaluat
     The gain ratio is computed considering one more class if unknown data are present.
     For the split to be meaningful, it has to have at least two subsplits
     with more than min_instances example each.
+    The known values are taken in sorted order (inherited from the parent
+    when presorted) and every threshold is evaluated sweeping the cumulative
+    weight of each class.
     """
-    attr_name = [col for col in data_in.columns if col not in ['target', 'weight']][0]
-    try:
-        split_gain = evaluate_split_fn(data_in[data_in[attr_name] != '?'][['target', 'weight']])
-    except:
-        raise WrongSplitEvaluationFunction("Do you used a custom split evaluation function? \
-                Check its compatibility with continuous data.")
-    if not isinstance(split_gain, float):
-        raise WrongSplitEvaluationFunction("The output of the split evaluation function \
-                must be a float.")
-    split_attributes = SplitAttributes(0, 0, False, None)
-    split_info = 0
     # deals wìth unknown data
-    freq_known = len(data_in[data_in[attr_name] != '?']) / len(data_in)
-    data_in = data_in[data_in[attr_name] != '?']
-    # sorted and compute thresolds
-    data_in_sorted = data_in[attr_name].sort_values()
-    thresholds = data_in_sorted.unique()[1:] - (np.diff(data_in_sorted.unique()) / 2)
-    for threshold in thresholds:
-        split_gain_threshold, split_info = compute_local_threshold_gain(
-                data_in, threshold, attr_name, split_gain, evaluate_split_fn)
-        # one more class for the unknown data
-        if freq_known < 1.0:
-            split_info += - (1 - freq_known) * np.log2(1 - freq_known)
-        gain_ratio_temp = (freq_known * split_gain_threshold) / split_info
-        #breakpoint()
-        # data_in[data_in[attr_name] <= threshold]['weight'].sum() 
-        # len_subsets = [len(data_in[data_in[attr_name] <= threshold]),
-        #         len(data_in[data_in[attr_name] > threshold])]
-        len_subsets = get_minimum_instances_continuous(data_in, attr_name, threshold)
-        minimum_instances_condition = check_minimum_instances(len_subsets, min_instances)
-        # save if better threshold
-        if gain_ratio_temp > split_attributes.gain_ratio and minimum_instances_condition:
+    sorted_positions = data_in.get_sorted_positions(attr_name)
+    freq_known = len(sorted_positions) / len(data_in)
+    unique_values, class_counts, values_counts = get_values_class_counts(
+            data_in.get_column(attr_name)[sorted_positions], data_in.target[sorted_positions],
+            data_in.weight[sorted_positions], len(data_in.classes))
+    thresholds_gain = compute_thresholds_gain(unique_values, class_counts, values_counts, freq_known, impurity)
+    return select_threshold(thresholds_gain, attr_name, min_instances)
+
+def get_split_gain_continuous_histogram(
+        data_in: NodeData, attr_name: str,
+        min_instances: int, impurity: ImpurityKernel) -> SplitAttributes:
+    """ Computes the split attributes of a continuous attribute evaluating only the bin edges
+
+    The class weights of every bin are counted in a single pass over the bin codes,
+    without sorting. The threshold between two bins is the upper edge of the lower one,
+    so it is already a value of the dataset.
+    """
+    known = ~data_in.get_missing(attr_name)
+    freq_known = np.count_nonzero(known) / len(data_in)
+    bin_edges = data_in.dataset.bin_edges[attr_name]
+    codes = data_in.dataset.bin_codes[attr_name][data_in.rows[known]].astype(np.int64)
+    n_classes = len(data_in.classes)
+    class_counts = np.bincount(
+            codes * n_classes + data_in.target[known], weights=data_in.weight[known],
+            minlength=len(bin_edges) * n_classes).reshape(len(bin_edges), n_classes)
+    values_counts = np.bincount(codes, minlength=len(bin_edges))
+    # only the bins with examples in the node
+    present = values_counts > 0
+    bin_values = bin_edges[present]
+    thresholds_gain = compute_thresholds_gain(
+            bin_values, class_counts[present], values_counts[present], freq_known, impurity,
+            thresholds=bin_values[:-1])
+    return select_threshold(thresholds_gain, attr_name, min_instances)
+
+def get_split_gain_continuous_nodes(
+        datas_in: list[NodeData], attr_name: str,
+        min_instances: int, impurity: ImpurityKernel) -> list[SplitAttributes]:
+    """ Computes the split attributes of a continuous attribute on several nodes at once
+
+    The sorted known values of all the nodes are concatenated and grouped
+    with a single bincount; then the thresholds of each node are swept
+    as in get_split_gain_continuous, with the same results.
+    """
+    nodes_positions = [data_in.get_sorted_positions(attr_name) for data_in in datas_in]
+    known_counts = np.array([len(positions) for positions in nodes_positions])
+    values = np.concatenate([
+        data_in.get_column(attr_name)[positions] for data_in, positions in zip(datas_in, nodes_positions)])
+    targets = np.concatenate([data_in.target[positions] for data_in, positions in zip(datas_in, nodes_positions)])
+    weights = np.concatenate([data_in.weight[positions] for data_in, positions in zip(datas_in, nodes_positions)])
+    # one group for every value of every node
+    nodes_starts = np.concatenate([[0], np.cumsum(known_counts)[:-1]])
+    new_group = np.ones(len(values), dtype=bool)
+    new_group[1:] = values[1:] != values[:-1]
+    new_group[nodes_starts] = True
+    groups_values, class_counts, values_counts = get_values_class_counts(
+            values, targets, weights, len(datas_in[0].classes), new_group)
+    groups_bounds = np.append((np.cumsum(new_group) - 1)[nodes_starts], len(groups_values))
+    nodes_split_attributes = []
+    for node_idx, data_in in enumerate(datas_in):
+        start, end = groups_bounds[node_idx], groups_bounds[node_idx + 1]
+        thresholds_gain = compute_thresholds_gain(
+                groups_values[start:end], class_counts[start:end],
+                values_counts[start:end], known_counts[node_idx] / len(data_in), impurity)
+        nodes_split_attributes.append(select_threshold(thresholds_gain, attr_name, min_instances))
+    return nodes_split_attributes
+
+def select_threshold(thresholds_gain: dict, attr_name: str, min_instances: int) -> SplitAttributes:
+    """ select the threshold with the maximum gain ratio among the meaningful ones """
+    split_attributes = SplitAttributes(0, 0, False, None)
+    minimum_instances_condition = (thresholds_gain['len_low'] >= min_instances) \
+            & (thresholds_gain['len_high'] >= min_instances)
+    # scan the thresholds in order to keep the same choice of the one-by-one evaluation
+    candidates = np.flatnonzero(minimum_instances_condition)
+    for idx, gain_ratio_temp in zip(candidates, thresholds_gain['gain_ratio'][candidates].tolist()):
+        if gain_ratio_temp > split_attributes.gain_ratio:
+            threshold = thresholds_gain['threshold'][idx]
             split_attributes.gain_ratio = np.round(gain_ratio_temp, 4)
-            split_attributes.info_gain = np.round(split_gain_threshold, 4)
-            split_attributes.min_instances_condition = minimum_instances_condition
+            split_attributes.info_gain = np.round(thresholds_gain['info_gain'][idx], 4)
+            split_attributes.min_instances_condition = True
             split_attributes.local_threshold = threshold
             split_attributes.threshold = threshold
             split_attributes.attr_name = attr_name
-            split_attributes.errs_perc = np.round(compute_split_error_cont(data_in, threshold), 4)
+            split_attributes.errs_perc = np.round(thresholds_gain['errs_perc'][idx], 4)
     return split_attributes
 
-def check_split(data_in: pd.DataFrame,
+def check_split(data_in: NodeData,
         attributes: TrainingAttributes,
         attr_fn_map: dict,
         attr_map: dict,
-        evaluate_split_fn: Callable) -> tuple[Actions, Union[SplitAttributes, None]]:
+        impurity: ImpurityKernel,
+        executor: Optional[Executor]=None) -> tuple[Actions, Union[SplitAttributes, None]]:
     """ check the split on a node and tells the action to take """
-    if data_in.empty:
+    if len(data_in) == 0:
         raise Exception("you should not be here")
-    split_attributes = get_split(data_in, attr_fn_map, attributes.min_instances, attr_map, evaluate_split_fn)
-    # breakpoint()
-    # node_purity = data_in["target"].value_counts().max() / len(data_in)
+    split_attributes = get_split(
+            data_in, attr_fn_map, attributes.min_instances, attr_map, impurity, executor)
+    return get_split_action(data_in, split_attributes, attributes)
+
+def check_splits(datas_in: list[NodeData],
+        attributes: TrainingAttributes,
+        attr_fn_map: dict,
+        attr_map: dict,
+        impurity: ImpurityKernel,
+        executor: Optional[Executor]=None) -> list[tuple[Actions, Union[SplitAttributes, None]]]:
+    """ check the splits on several nodes and tells the action to take on each of them
+
+    Every continuous attribute is evaluated on all the nodes in a single pass. The results are the same of check_split.
+    """
+    if any(len(data_in) == 0 for data_in in datas_in):
+        raise Exception("you should not be here")
+    splittable = [data_in for data_in in datas_in if is_splittable(data_in)]
+    evaluate_attribute = partial(
+            get_split_gain_attribute_nodes, splittable, attr_fn_map,
+            attributes.min_instances, attr_map, impurity)
+    attributes_names = list(datas_in[0].attributes)
+    if executor is None:
+        attributes_splits = list(map(evaluate_attribute, attributes_names))
+    else:
+        attributes_splits = list(executor.map(evaluate_attribute, attributes_names))
+    actions = []
+    splittable_idx = 0
+    for data_in in datas_in:
+        split_attributes = SplitAttributes(None, None, False)
+        if splittable_idx < len(splittable) and data_in is splittable[splittable_idx]:
+            split_attributes = select_split([
+                    (attr_name, nodes_splits[splittable_idx])
+                    for attr_name, nodes_splits in zip(attributes_names, attributes_splits)])
+            splittable_idx += 1
+        actions.append(get_split_action(data_in, split_attributes, attributes))
+    return actions
+
+def get_split_gain_attribute_nodes(
+        datas_in: list[NodeData], attr_fn_map: dict,
+        min_instances: int, attr_map: dict,
+        impurity: ImpurityKernel, attr_name: str) -> list[Optional[SplitAttributes]]:
+    """ Computes the split attributes of one attribute on several nodes """
+    if attr_fn_map[attr_map[attr_name]] is not get_split_gain_continuous:
+        return [get_split_gain_attribute(
+            data_in, attr_fn_map, min_instances, attr_map, impurity, attr_name)
+            for data_in in datas_in]
+    nodes_splits = [None] * len(datas_in)
+    multiple_values = [idx for idx, data_in in enumerate(datas_in) if has_multiple_values(data_in, attr_name)]
+    if multiple_values:
+        splits = get_split_gain_continuous_nodes(
+                [datas_in[idx] for idx in multiple_values], attr_name, min_instances, impurity)
+        for idx, split_attributes in zip(multiple_values, splits):
+            nodes_splits[idx] = split_attributes
+    return nodes_splits
+
+def get_split_action(
+        data_in: NodeData, split_attributes: SplitAttributes,
+        attributes: TrainingAttributes) -> tuple[Actions, Union[SplitAttributes, None]]:
+    """ tells the action to take on a node given its best split """
     node_purity = compute_node_purity(data_in)
     if not split_attributes.attr_name or node_purity > attributes.node_purity:
         return Actions.ADD_LEAF, None
-    #node_errs_perc = data_in['target'].value_counts().sum() - data_in['target'].value_counts().max()
-    # values_count = data_in.groupby(['target'])["weight"].sum()
-    # node_errs = values_count.sum() - values_count.max()
     node_errs = compute_node_errors(data_in)
     node_errs_perc = np.round(node_errs / len(data_in), 4)
     child_errs_perc = split_attributes.errs_perc
@@ -182,57 +301,10 @@ def check_split(data_in: pd.DataFrame,
         return Actions.ADD_LEAF, None
     return Actions.SPLIT_NODE, split_attributes
 
-def compute_split_error_cont(data_in: pd.DataFrame, threshold: float) -> float:
-    """
-    Computes the error made by the split of a continuous attribute if predicting
-    the most frequent class for every child born after it. data_in contains only
-    the attribute and the target columns.
-    NEW The returned error is the minimum error between the children, otherwise """
-    attr_name = [column for column in data_in.columns if column != 'target'][0]
-    # if continuous type the split is binary given by th threshold
-    split_left = filter_dataset_low(data_in, attr_name, threshold)
-    # pandas function to count the occurnces of the different value of target
-    # values_count = split_left.groupby(['target'])["weight"].sum()
-    # # errors given by the difference between the sum of all occurrences and the most frequent
-    # errors_left = values_count.sum() - values_count.max()
-    errors_left = compute_node_errors(split_left)
-    # # compute perc
-    errors_left_perc = errors_left / len(split_left)
-    split_right = filter_dataset_high(data_in, attr_name, threshold)
-    # values_count = split_right.groupby(['target'])["weight"].sum()
-    # # errors given by the difference between the sum of all occurrences and the most frequent
-    # errors_right = values_count.sum() - values_count.max()
-    errors_right = compute_node_errors(split_right)
-    # compute perc
-    errors_right_perc = errors_right / len(split_right)
-#    total_child_error = errors_left + errors_right
-#    return total_child_error/len(data_in)
-    #return min(errors_left_perc, errors_right_perc)
-    return (errors_left + errors_right) / len(data_in)
-
-def compute_split_error_cat(data_in: pd.DataFrame) -> float:
-#def compute_split_error_cat(data_in: pd.DataFrame, threshold: float=None) -> int:
-    """
-    Computes the error made by the split if predicting
-    the most frequent class for every child born after it.
-    NEW The returned error is the minimum error between the children, otherwise """
-    attr_name = [column for column in data_in.columns if column != 'target'][0]
-    # if continuous type the split is binary given by th threshold
-    #total_child_error = 0
-    errors = []
-    for attr_value in data_in[attr_name].unique():
-        split = filter_dataset_cat(data_in, attr_name, attr_value)
-        values_count = split.groupby(['target'])["weight"].sum()
-        #total_child_error += values_count.sum() - values_count.max()
-        errors.append(values_count.sum() - values_count.max())# / len(split))
-    #return total_child_error/len(data_in)
-    #return min(errors)
-    return sum(errors) / len(data_in)
-
-def compute_node_errors(data_in: pd.DataFrame) -> float:
-    values_count = data_in.groupby(['target'])["weight"].sum()
+def compute_node_errors(data_in: NodeData) -> float:
+    values_count = data_in.get_class_counts()
     return values_count.sum() - values_count.max()
 
-def compute_node_purity(data_in: pd.DataFrame) -> float:
-    values_count = data_in.groupby(['target'])["weight"].sum()
+def compute_node_purity(data_in: NodeData) -> float:
+    values_count = data_in.get_class_counts()
     return values_count.max() / len(data_in)
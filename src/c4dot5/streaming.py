@@ -0,0 +1,86 @@
+""" Functions reading the inputs of the predictions in chunks """
+import os
+from typing import Iterable, Iterator, Optional, Union
+import numpy as np
+import pandas as pd
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+# dtype kinds of the columns already holding values of the type of the training ones
+CATEGORY_KINDS = {'bool': 'b', 'int': 'iu', 'float': 'f'}
+
+
+def read_chunks(source: Union[str, os.PathLike, pd.DataFrame, Iterable[pd.DataFrame]],
+                chunksize: int, category_types: Optional[dict]=None) -> Iterator[pd.DataFrame]:
+    """ Yields the rows of source in dataframes of at most chunksize rows
+
+    source can be the path of a CSV or Parquet file (read a chunk at a time),
+    a dataframe or any iterable of dataframes.
+    category_types maps the categorical attributes to the type of their training values
+    (as CompiledTree.category_types): the chunks are read with the same types, whatever
+    the values of each chunk (e.g. integer categories in a chunk with unknown values).
+    """
+    if chunksize < 1:
+        raise ValueError("The chunk size must be a positive number of rows.")
+    category_types = category_types or {}
+    if isinstance(source, (str, os.PathLike)):
+        if str(source).lower().endswith(PARQUET_SUFFIXES):
+            for chunk in read_parquet_chunks(source, chunksize):
+                yield cast_categories(chunk, category_types)
+        else:
+            # text categories are read as they are written (e.g. '01234')
+            string_columns = {name: str for name, value_type in category_types.items() if value_type == 'str'}
+            with pd.read_csv(source, chunksize=chunksize, dtype=string_columns) as reader:
+                for chunk in reader:
+                    yield cast_categories(chunk, category_types)
+        return
+    if isinstance(source, pd.DataFrame):
+        source = [source]
+    for dataframe in source:
+        for start in range(0, len(dataframe), chunksize):
+            yield cast_categories(dataframe.iloc[start:start + chunksize], category_types)
+
+def cast_categories(chunk: pd.DataFrame, category_types: dict) -> pd.DataFrame:
+    """ returns chunk with the values of the categorical attributes cast to the type of their training values
+
+    the tests of the tree compare the values as text: an integer category read as a float
+    (because of unknown values) or a float one read as an integer would not match.
+    """
+    columns = {}
+    for name, value_type in category_types.items():
+        # the text of the values is compared, the strings are never cast
+        if name not in chunk.columns or value_type not in CATEGORY_KINDS \
+                or chunk[name].dtype.kind in CATEGORY_KINDS[value_type]:
+            continue
+        codes, uniques = pd.factorize(chunk[name])
+        # the unknown values (code -1) stay unknown
+        values = np.full(len(uniques) + 1, np.nan, dtype=object)
+        for idx, value in enumerate(uniques):
+            values[idx] = cast_value(value, value_type)
+        columns[name] = values[codes]
+    return chunk.assign(**columns) if columns else chunk
+
+def cast_value(value, value_type: str):
+    """ returns value as value_type ('bool', 'int' or 'float'), or value if it is not a number of another type """
+    if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.integer, np.floating)):
+        return value
+    if value_type == 'int' and float(value).is_integer():
+        return int(value)
+    if value_type == 'float':
+        return float(value)
+    if value_type == 'bool' and value in (0, 1):
+        return bool(value)
+    return value
+
+def read_parquet_chunks(file_path: Union[str, os.PathLike], chunksize: int) -> Iterator[pd.DataFrame]:
+    """ Yields the rows of a Parquet file in batches read from its row groups (needs pyarrow) """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Reading Parquet files in chunks requires pyarrow: pip install c4dot5-decision-tree[parquet]") from exc
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+def write_chunk(predictions: pd.DataFrame, file_path: Union[str, os.PathLike], first_chunk: bool):
+    """ writes the predictions of a chunk in a CSV file, the first chunk with the header """
+    predictions.to_csv(file_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
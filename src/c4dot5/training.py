@@ -7,6 +7,7 @@ import numpy as np
 from c4dot5.nodes import DecisionNodeCategorical
 from c4dot5.nodes import DecisionNodeContinuous, LeafNode, Node, DecisionNode
 from c4dot5.attributes import NodeAttributes, SplitAttributes, DecisionNodeAttributes, LeafNodeAttributes
+from c4dot5.encoding import NodeData
 
 
 class Actions(Enum):
@@ -54,18 +55,101 @@ def extract_max_gain_attributes(data: pd.DataFrame, split_attr: SplitAttributes)
     split_attr.errs_perc = data.iloc[max_idx]['errs_perc']
     return split_attr
 
-def compute_local_threshold_gain(data_in: pd.DataFrame, threshold: float,
-                                 attr_name: str, split_gain: float, evaluate_split_fn: Callable) -> tuple[float, float]:
-    """ compute infomation gain and split infomation """
-    freq_attr = data_in[data_in[attr_name] <= threshold][attr_name].count() / len(data_in)
-    class_entropy_low = evaluate_split_fn(
-            data_in[data_in[attr_name] <= threshold][['target', 'weight']])
-    class_entropy_high = evaluate_split_fn(
-            data_in[data_in[attr_name] > threshold][['target', 'weight']])
-    split_gain_threshold = split_gain - freq_attr * class_entropy_low \
-            - (1 - freq_attr) * class_entropy_high
+def get_values_class_counts(
+        sorted_values: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+        n_classes: int, new_group: np.ndarray=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ groups the known values of a continuous attribute, sorted by value
+
+    Returns the unique values, the weight of every target class for
+    each unique value and the number of examples having each unique value.
+    new_group marks the positions starting a group even if the value does not change.
+    """
+    starts = np.ones(len(sorted_values), dtype=bool)
+    starts[1:] = sorted_values[1:] != sorted_values[:-1]
+    if new_group is not None:
+        starts |= new_group
+    groups = np.cumsum(starts) - 1
+    n_groups = np.count_nonzero(starts)
+    class_counts = np.bincount(
+            groups * n_classes + targets, weights=weights,
+            minlength=n_groups * n_classes).reshape(n_groups, n_classes)
+    values_counts = np.bincount(groups, minlength=n_groups)
+    return sorted_values[starts], class_counts, values_counts
+
+def get_categories_class_counts(
+        codes: np.ndarray, targets: np.ndarray,
+        weights: np.ndarray, n_classes: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ builds the contingency table of the known codes of a categorical attribute
+
+    Returns the codes in order of appearance, the weight of every target class for
+    each code and the number of examples having each code.
+    """
+    categories = pd.unique(codes)
+    n_codes = categories.max(initial=-1) + 1
+    class_counts = np.bincount(
+            codes * n_classes + targets, weights=weights,
+            minlength=n_codes * n_classes).reshape(n_codes, n_classes)
+    values_counts = np.bincount(codes, minlength=n_codes)
+    return categories, class_counts[categories], values_counts[categories]
+
+def compute_categories_gain(class_counts: np.ndarray, values_counts: np.ndarray,
+                            unknown_counts: np.ndarray, freq_known: float, impurity: Callable) -> dict:
+    """ compute information gain, gain ratio and error percentage of the split
+    of a categorical attribute from its contingency table
+
+    The unknown examples go in every child with a weight proportional to its size:
+    unknown_counts is the weight of every class among them.
+    """
+    known_count = values_counts.sum()
+    freq_attr = values_counts / known_count
+    info_gain = impurity(class_counts.sum(axis=0)) - np.sum(freq_attr * impurity(class_counts))
+    split_info = - np.sum(freq_attr * np.log2(freq_attr))
+    # one more class for the unknown data
+    if freq_known < 1.0:
+        split_info += - (1 - freq_known) * np.log2(1 - freq_known)
+    children_counts = class_counts + freq_attr[:, np.newaxis] * unknown_counts
+    errors = children_counts.sum(axis=1) - children_counts.max(axis=1)
+    return {
+            'info_gain': info_gain,
+            'gain_ratio': (freq_known * info_gain) / split_info,
+            # errors over all the examples, unknown included
+            'errs_perc': errors.sum() * freq_known / known_count}
+
+def compute_thresholds_gain(unique_values: np.ndarray, class_counts: np.ndarray,
+                            values_counts: np.ndarray, freq_known: float, impurity: Callable,
+                            thresholds: np.ndarray=None) -> dict:
+    """ compute information gain, gain ratio, subsets length and error
+    percentage of every threshold in a single sweep over the sorted values
+
+    Thresholds are the midpoints between consecutive unique values, if not given.
+    The cumulative class weights up to a threshold describe the low split,
+    the ones after it the high split: impurity evaluates all of them at once.
+    """
+    if thresholds is None:
+        thresholds = unique_values[1:] - (np.diff(unique_values) / 2)
+    counts_low = np.cumsum(class_counts, axis=0)[:-1]
+    # reversed cumulative sum keeps the absent classes exactly at zero
+    counts_high = np.cumsum(class_counts[::-1], axis=0)[::-1][1:]
+    len_low = np.cumsum(values_counts)[:-1]
+    known_count = values_counts.sum()
+    len_high = known_count - len_low
+    split_gain = impurity(class_counts.sum(axis=0))
+    freq_attr = len_low / known_count
+    info_gain = split_gain - freq_attr * impurity(counts_low) \
+            - (1 - freq_attr) * impurity(counts_high)
     split_info = - freq_attr * np.log2(freq_attr) - (1 - freq_attr) * np.log2(1 - freq_attr)
-    return split_gain_threshold, split_info
+    # one more class for the unknown data
+    if freq_known < 1.0:
+        split_info += - (1 - freq_known) * np.log2(1 - freq_known)
+    errors_low = counts_low.sum(axis=1) - counts_low.max(axis=1, initial=0)
+    errors_high = counts_high.sum(axis=1) - counts_high.max(axis=1, initial=0)
+    return {
+            'threshold': thresholds,
+            'info_gain': info_gain,
+            'gain_ratio': (freq_known * info_gain) / split_info,
+            'len_low': len_low,
+            'len_high': len_high,
+            'errs_perc': (errors_low + errors_high) / known_count}
 
 def are_there_at_least_two(len_subsets: list[int], min_instances: int):
     """ checks if in the subsets are present at least two subset with
@@ -77,23 +161,18 @@ def check_minimum_instances(len_subsets: list[int], min_instances: int) -> bool:
     return len([True for len_subset in len_subsets if len_subset >= min_instances]) == len(len_subsets)
 
 
-def get_total_threshold(data, local_threshold) -> float:
+def get_total_threshold(sorted_values: np.ndarray, local_threshold: float) -> float:
     """ Computes the threshold on the total dataset
 
-    The global threshold is the maximum number less then or equal to the local one
+    The global threshold is the maximum number less then or equal to the local one.
+    sorted_values are the sorted unique known values of the attribute in the dataset.
     """
-    data = data[data != '?'].astype(float)
-    return data[data.le(local_threshold)].max()
-
-def substitute_nan(dataset: pd.DataFrame) -> pd.DataFrame:
-    return dataset.fillna('?')
-
-def get_minimum_instances_categorical(dataset: pd.DataFrame, attr_name: str) -> list[int]:
-    return list(dataset[dataset[attr_name] != '?'][attr_name].value_counts())
-
-def get_minimum_instances_continuous(dataset: pd.DataFrame, attr_name: str, threshold: float) -> list[int]:
-    dataset_known = dataset[dataset[attr_name] != '?'].copy()
-    len_subsets = [
-            len(dataset_known[dataset_known[attr_name] <= threshold]),
-            len(dataset_known[dataset_known[attr_name] > threshold])]
-    return len_subsets
+    return sorted_values[np.searchsorted(sorted_values, local_threshold, side='right') - 1]
+
+def has_multiple_values(data: NodeData, attr_name: str) -> bool:
+    """ checks if the attribute takes more than one value, the unknown one included """
+    missing = data.get_missing(attr_name)
+    if missing.any():
+        return not missing.all()
+    column = data.get_column(attr_name)
+    return column.min() != column.max()
@@ -1,12 +1,22 @@
+import os
+from collections import deque
+from copy import copy
+from contextlib import ExitStack
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from typing import Callable
+from typing import Callable, Optional, Union
 from c4dot5.attributes import AttributeType, TrainingAttributes, NodeType
 from c4dot5.attributes import DecisionNodeAttributes, LeafNodeAttributes, SplitAttributes
-from c4dot5.nodes import Node
+from c4dot5.attributes import NodeAttributes, GrowthOrder
+from c4dot5.nodes import Node, DecisionNode
 from c4dot5.DecisionTree import DecisionTree
-from c4dot5.training import Actions, get_total_threshold, substitute_nan, class_entropy
-from c4dot5.filtering import filter_dataset_cat, filter_dataset_high, filter_dataset_low
-from c4dot5.splitting import check_split, get_split_gain_categorical, get_split_gain_continuous
+from c4dot5.training import Actions, get_total_threshold, class_entropy
+from c4dot5.encoding import EncodedDataset, NodeData, encode_dataset
+from c4dot5.filtering import filter_dataset_cat, filter_dataset_cont
+from c4dot5.splitting import check_split, check_splits, get_split_gain_categorical, get_split_gain_continuous
+from c4dot5.splitting import get_split_gain_continuous_histogram
+from c4dot5.impurity import ImpurityKernel, get_impurity_kernel
 from c4dot5.exceptions import SplitError
 
 
@@ -16,13 +26,52 @@ class TrainingHandler:
             decision_tree: DecisionTree,
             #complete_dataset: pd.DataFrame,
             training_attributes: TrainingAttributes,
-            evaluate_split_fn: Callable=class_entropy):
+            evaluate_split_fn: Union[ImpurityKernel, Callable]=class_entropy,
+            n_jobs: int=1,
+            subtree_jobs: int=1,
+            subtree_min_rows: int=10000,
+            subtree_backend: str='process',
+            growth_order: str='depth-first',
+            presort: bool=True,
+            split_strategy: str='exact',
+            n_bins: int=255):
         self.decision_tree = decision_tree
         self.complete_dataset = None
+        self.encoded_dataset = None
         self.training_attributes = training_attributes
         self.eval_split_fn = evaluate_split_fn
+        # kernel evaluating the splits on the class counts, set once the classes are known
+        self.impurity_kernel = None
+        # number of workers evaluating the attributes of a node (-1 uses all the cpus)
+        self.n_jobs = n_jobs
+        self.executor = None
+        # number of workers growing independent subtrees, only subtrees
+        # with at least subtree_min_rows rows are sent to the workers
+        if subtree_backend not in ('process', 'thread'):
+            raise ValueError(f"Subtree backend [{subtree_backend}] not supported. Use 'process' or 'thread'")
+        self.subtree_jobs = subtree_jobs
+        self.subtree_min_rows = subtree_min_rows
+        self.subtree_backend = subtree_backend
+        self.subtree_executor = None
+        self.pending_subtrees = []
+        # order in which the nodes of the frontier are expanded
+        if growth_order not in [order.value for order in GrowthOrder]:
+            raise ValueError(
+                f"Growth order [{growth_order}] not supported. Use 'depth-first', 'breadth-first' or 'level-wise'")
+        self.growth_order = GrowthOrder(growth_order)
+        # sort the continuous columns once at the root, the children inherit the order
+        self.presort = presort
+        # 'histogram' evaluates only the edges of at most n_bins quantile bins
+        # of every continuous attribute, instead of every value
+        if split_strategy not in ('exact', 'histogram'):
+            raise ValueError(f"Split strategy [{split_strategy}] not supported. Use 'exact' or 'histogram'")
+        if not 2 <= n_bins <= 65536:
+            raise ValueError(f"Number of bins [{n_bins}] not supported. Use a number between 2 and 65536")
+        self.split_strategy = split_strategy
+        self.n_bins = n_bins
         self.get_split_fn = {
-                AttributeType.CONTINUOUS: get_split_gain_continuous,
+                AttributeType.CONTINUOUS: get_split_gain_continuous_histogram \
+                        if split_strategy == 'histogram' else get_split_gain_continuous,
                 AttributeType.CATEGORICAL: get_split_gain_categorical,
                 AttributeType.BOOLEAN: get_split_gain_categorical
                 }
@@ -37,20 +86,57 @@ class TrainingHandler:
                 AttributeType.BOOLEAN: NodeType.DECISION_NODE_CATEGORICAL
                 }
 
-    def split_dataset(self, dataset: pd.DataFrame):
+    def __setstate__(self, state: dict):
+        if 'split_strategy' not in state:
+            # handlers pickled before the training options: default options and split functions
+            self.__init__(state['decision_tree'], state['training_attributes'], state['eval_split_fn'])
+            self.complete_dataset = state['complete_dataset']
+            return
+        self.__dict__.update(state)
+
+    def split_dataset(self, dataset: pd.DataFrame) -> EncodedDataset:
         """
-        Recursively splits a dataset until some conditions are met.
+        Splits a dataset until some conditions are met.
         decision tree adds the nodes
+        Returns the encoded dataset, the handler does not keep it after the training
         """
-        # substitute nan in dataframe with '?'
-        dataset = substitute_nan(dataset.copy(deep=True))
-        self.complete_dataset = dataset 
-        # add weight for the dataset used in the training
-        dataset.insert(len(dataset.columns) ,"weight", [1]*len(dataset))
+        with ExitStack() as stack:
+            if self.n_jobs != 1:
+                # threads share the encoded dataset and the node data without copying them
+                self.executor = stack.enter_context(
+                        ThreadPoolExecutor(max_workers=get_workers_number(self.n_jobs)))
+            try:
+                self._split_dataset(dataset, stack)
+                # add the subtrees grown by the workers, in the order they have been sent
+                for node, future in self.pending_subtrees:
+                    self.stitch_subtree(node, *future.result())
+                return self.encoded_dataset
+            finally:
+                self.encoded_dataset = None
+                self.executor = None
+                self.subtree_executor = None
+                self.pending_subtrees = []
+
+    def _split_dataset(self, dataset: pd.DataFrame, stack: ExitStack):
+        """ splits the root node and grows the tree below it """
+        # own copy of the training data, for the rules extraction
+        self.complete_dataset = dataset.copy()
+        # encode the dataset once: nodes only hold row indices and weights
+        self.encoded_dataset = encode_dataset(
+                dataset, self.decision_tree.get_attributes(),
+                self.n_bins if self.split_strategy == 'histogram' else None)
+        self.impurity_kernel = get_impurity_kernel(self.eval_split_fn, self.encoded_dataset.classes)
+        self.decision_tree.set_category_types(self.encoded_dataset.get_category_types())
+        if self.subtree_jobs != 1:
+            self.subtree_executor = stack.enter_context(self.create_subtree_executor())
+        # the bins do not need the sorted order
+        dataset = NodeData.from_dataset(
+                self.encoded_dataset, self.presort and self.split_strategy == 'exact')
         # check if the split exists, create node and recurse
         action, split_attribute = check_split(
                 dataset, self.training_attributes,
-                self.get_split_fn, self.decision_tree.get_attributes(), self.eval_split_fn)
+                self.get_split_fn, self.decision_tree.get_attributes(), self.impurity_kernel,
+                self.executor)
         # if split attribute does not exist then is a leaf
         if action == Actions.ADD_LEAF:
             raise SplitError(
@@ -64,84 +150,158 @@ class TrainingHandler:
         threshold = None
         if split_attribute.local_threshold:
             threshold = get_total_threshold(
-                    dataset[split_attribute.attr_name],
+                    self.encoded_dataset.sorted_values[split_attribute.attr_name],
                     split_attribute.local_threshold)
         root_node_attr = DecisionNodeAttributes(
                 0, "root", node_type, split_attribute.attr_name, attr_type, threshold)
         root_node = self.decision_tree.create_node(root_node_attr, None)
         self.decision_tree.add_root_node(root_node)
-        self.split_fn[attr_type](root_node, dataset, split_attribute)
+        self.grow_tree(root_node, dataset, split_attribute)
 
     def split_continuous(self,
-                         parent_node: Node, data_in: pd.DataFrame, 
-                         split_attribute: SplitAttributes):
+                         parent_node: Node, data_in: NodeData,
+                         split_attribute: SplitAttributes) -> list[tuple[str, NodeData]]:
         """
-        Recursively splits a dataset based on a continuous variable.
-        decision tree adds the nodes
+        Splits a dataset based on a continuous variable.
+        Returns the name and the data of the children
         """
         threshold = get_total_threshold(
-                self.complete_dataset[split_attribute.attr_name], split_attribute.local_threshold)
+                self.encoded_dataset.sorted_values[split_attribute.attr_name], split_attribute.local_threshold)
         # change the local threshold of the parent with the total one
         parent_node.set_threshold(threshold)
-        data_low = filter_dataset_low(data_in, split_attribute.attr_name, threshold)
-        # check the split to know what kind of node we have to add
-        action, split_attribute_low = check_split(data_low,
-                                                  self.training_attributes, self.get_split_fn,
-                                                  self.decision_tree.get_attributes(), self.eval_split_fn)
-        node_name = f"{parent_node.get_attribute()} <= {threshold}"
-        if parent_node.get_level()+1 == self.training_attributes.max_depth:
-            action = Actions.ADD_LEAF
-        if action == Actions.ADD_LEAF:
-            self.leaf_node_creation(parent_node, node_name, data_low)
-        else:
-            node, attr_type = self.node_creation(parent_node,
-                    node_name, split_attribute_low)
-            self.split_fn[attr_type](node, data_low, split_attribute_low)
-
-        # Higher than the threshold
-        data_high = filter_dataset_high(data_in, split_attribute.attr_name, threshold)
-        # check the split to know what kind of node we have to add
-        action, split_attribute_high = check_split(data_high,
-                                                   self.training_attributes, self.get_split_fn, 
-                                                   self.decision_tree.get_attributes(), self.eval_split_fn)
-        node_name = f"{parent_node.get_attribute()} > {threshold}"
-        if parent_node.get_level()+1 == self.training_attributes.max_depth:
-            action = Actions.ADD_LEAF
-        if action == Actions.ADD_LEAF:
-            self.leaf_node_creation(parent_node, node_name, data_high)
-        else:
-            node, attr_type = self.node_creation(parent_node,
-                    node_name, split_attribute_high)
-            self.split_fn[attr_type](node, data_high, split_attribute_high)
+        low_data, high_data = filter_dataset_cont(data_in, split_attribute.attr_name, threshold)
+        return [
+            (f"{parent_node.get_attribute()} <= {threshold}", low_data),
+            (f"{parent_node.get_attribute()} > {threshold}", high_data)]
 
     def split_categorical(self,
-            parent_node: Node, data_in: pd.DataFrame, split_attribute: SplitAttributes):
+            parent_node: Node, data_in: NodeData,
+            split_attribute: SplitAttributes) -> list[tuple[str, NodeData]]:
         """
-        Recursively splits a dataset based on a categorical variable.
+        Splits a dataset based on a categorical variable.
+        Returns the name and the data of the children
+        """
+        vocabulary = data_in.get_vocabulary(split_attribute.attr_name)
+        attr_codes, children_data = filter_dataset_cat(data_in, split_attribute.attr_name)
+        return [
+            (f"{split_attribute.attr_name} = {vocabulary[attr_code]}", data)
+            for attr_code, data in zip(attr_codes, children_data)]
+
+    def grow_tree(self, node: Node, data_in: NodeData, split_attribute: SplitAttributes):
+        """
+        Grows the tree below a decision node, visiting the nodes in the growth order.
         decision tree adds the nodes
         """
-        data_known = data_in[data_in[split_attribute.attr_name] != '?']
-        for attr_value in data_known[split_attribute.attr_name].unique():
-            # divide data
-            data = filter_dataset_cat(data_in, split_attribute.attr_name, attr_value)
-            action, split_attribute_child = check_split(data,
-                                                        self.training_attributes, self.get_split_fn,
-                                                        self.decision_tree.get_attributes(), self.eval_split_fn)
-            # change the local threshold to total if exists
-            node_name = f"{split_attribute.attr_name} = {attr_value}"
-            if parent_node.get_level()+1 == self.training_attributes.max_depth:
-                action = Actions.ADD_LEAF
+        frontier = deque([(node, data_in, split_attribute)])
+        while frontier:
+            if self.growth_order == GrowthOrder.LEVEL_WISE:
+                expanding = list(frontier)
+                frontier.clear()
+            elif self.growth_order == GrowthOrder.BREADTH_FIRST:
+                expanding = [frontier.popleft()]
+            else:
+                expanding = [frontier.pop()]
+            children = self.expand_nodes(expanding)
+            if self.growth_order == GrowthOrder.DEPTH_FIRST:
+                # the first child is the next one to be expanded
+                children.reverse()
+            frontier.extend(children)
+
+    def expand_nodes(self,
+            expanding: list[tuple[Node, NodeData, SplitAttributes]]
+            ) -> list[tuple[Node, NodeData, SplitAttributes]]:
+        """ adds the children of the decision nodes in expanding
+
+        The splits of all the children are checked together.
+        Returns the children to be expanded, the others are leaves or are sent to the subtree workers.
+        """
+        children = []
+        for parent_node, data_in, split_attribute in expanding:
+            attr_type = self.decision_tree.get_attributes()[split_attribute.attr_name]
+            for node_name, data in self.split_fn[attr_type](parent_node, data_in, split_attribute):
+                children.append((parent_node, node_name, data))
+        # the data of the parents is not needed anymore
+        expanding.clear()
+        # check the split to know what kind of node we have to add
+        to_check = [data for parent_node, _, data in children
+                    if parent_node.get_level()+1 != self.training_attributes.max_depth]
+        checked = iter(check_splits(
+            to_check, self.training_attributes, self.get_split_fn,
+            self.decision_tree.get_attributes(), self.impurity_kernel, self.executor) if to_check else [])
+        to_expand = []
+        for parent_node, node_name, data in children:
+            action = Actions.ADD_LEAF
+            if parent_node.get_level()+1 != self.training_attributes.max_depth:
+                action, split_attribute_child = next(checked)
             if action == Actions.ADD_LEAF:
                 self.leaf_node_creation(parent_node, node_name, data)
+                continue
+            node, _ = self.node_creation(parent_node, node_name, split_attribute_child)
+            if self.subtree_executor is not None and len(data) >= self.subtree_min_rows:
+                self.submit_subtree(node, data, split_attribute_child)
             else:
-                if split_attribute_child.local_threshold:
-                    threshold = get_total_threshold(
-                            self.complete_dataset[split_attribute_child.attr_name],
-                            split_attribute_child.local_threshold)
-                    split_attribute_child.threshold = threshold
-                node, attr_type = self.node_creation(parent_node,
-                        node_name, split_attribute_child)
-                self.split_fn[attr_type](node, data, split_attribute_child)
+                to_expand.append((node, data, split_attribute_child))
+        return to_expand
+
+    def submit_subtree(self, node: Node, data_in: NodeData, split_attribute: SplitAttributes):
+        """ sends the growth of the subtree below node to a subtree worker """
+        if self.subtree_backend == 'process':
+            future = self.subtree_executor.submit(
+                    _grow_subtree_worker, node.get_node_attributes(),
+                    data_in.rows, data_in.weight, data_in.sorted_positions, split_attribute)
+        else:
+            future = self.subtree_executor.submit(
+                    grow_subtree, self.encoded_dataset, self.training_attributes,
+                    self.decision_tree.get_attributes(), self.impurity_kernel,
+                    self.growth_order, self.split_strategy,
+                    node.get_node_attributes(), data_in.rows, data_in.weight,
+                    data_in.sorted_positions, split_attribute)
+        self.pending_subtrees.append((node, future))
+
+    def create_subtree_executor(self) -> Executor:
+        """ creates the pool of workers growing the subtrees """
+        n_workers = get_workers_number(self.subtree_jobs)
+        if self.subtree_backend == 'thread':
+            return ThreadPoolExecutor(max_workers=n_workers)
+        # the encoded dataset is sent once to every worker process
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_subtree_worker,
+                initargs=(self.encoded_dataset, self.training_attributes,
+                          self.decision_tree.get_attributes(), self.impurity_kernel,
+                          self.growth_order, self.split_strategy))
+
+    def export_subtree(self, node: Node) -> list[tuple[int, NodeAttributes]]:
+        """ returns the attributes of the nodes below node, with the position of their parent
+
+        Parents come before their children and the children are sorted by label.
+        The position -1 refers to node itself.
+        """
+        records = []
+        parents = deque([(node, -1)])
+        while parents:
+            parent_node, parent_idx = parents.popleft()
+            if not isinstance(parent_node, DecisionNode):
+                continue
+            for child in sorted(parent_node.get_children(), key=lambda child: child.get_label()):
+                records.append((parent_idx, child.get_node_attributes()))
+                parents.append((child, len(records) - 1))
+        return records
+
+    def stitch_subtree(self,
+            node: Node, threshold: Optional[float],
+            records: list[tuple[int, NodeAttributes]]):
+        """ adds to the decision tree the nodes grown by a worker below node """
+        if threshold is not None:
+            node.set_threshold(threshold)
+        created_nodes = []
+        for parent_idx, node_attributes in records:
+            parent_node = node if parent_idx == -1 else created_nodes[parent_idx]
+            child = self.decision_tree.create_node(node_attributes, parent_node)
+            self.decision_tree.add_node(child)
+            created_nodes.append(child)
 
     def node_creation(self,
             parent_node: Node, node_name: str,
@@ -157,11 +317,64 @@ class TrainingHandler:
         self.decision_tree.add_node(node)
         return node, attr_type
 
-    def leaf_node_creation(self, parent_node: Node, node_name: str, data_leaf: pd.DataFrame):
+    def leaf_node_creation(self, parent_node: Node, node_name: str, data_leaf: NodeData):
         """ create a leaf node corresponding to split attribute """
-        data_leaf = data_leaf.round({'weight': 4})
+        weight = np.round(data_leaf.weight, 4)
+        classes_weight = np.bincount(data_leaf.target, weights=weight, minlength=len(data_leaf.classes))
+        # only the classes present in the leaf
+        present = np.bincount(data_leaf.target, minlength=len(data_leaf.classes)) > 0
         leaf_attr = LeafNodeAttributes(
                 parent_node.get_level()+1, node_name, NodeType.LEAF_NODE,
-                data_leaf.groupby("target")["weight"].sum().to_dict())
+                dict(zip(data_leaf.classes[present].tolist(), classes_weight[present].tolist())))
         node = self.decision_tree.create_node(leaf_attr, parent_node)
         self.decision_tree.add_node(node)
+
+
+def get_workers_number(n_jobs: int) -> int:
+    """ returns the number of workers, -1 means all the cpus """
+    return os.cpu_count() if n_jobs == -1 else n_jobs
+
+def grow_subtree(
+        encoded_dataset: EncodedDataset, training_attributes: TrainingAttributes,
+        attributes_map: dict, impurity_kernel: ImpurityKernel,
+        growth_order: GrowthOrder, split_strategy: str,
+        node_attributes: DecisionNodeAttributes, rows: np.ndarray, weight: np.ndarray,
+        sorted_positions: Optional[dict],
+        split_attribute: SplitAttributes) -> tuple[Optional[float], list[tuple[int, NodeAttributes]]]:
+    """ grows the subtree below a decision node in a separate decision tree
+
+    Returns the final threshold of the node (None if not continuous)
+    and the attributes of the nodes of the subtree.
+    """
+    decision_tree = DecisionTree({name: attr_type.value for name, attr_type in attributes_map.items()})
+    training_handler = TrainingHandler(
+            decision_tree, training_attributes, impurity_kernel,
+            growth_order=growth_order.value, split_strategy=split_strategy)
+    training_handler.encoded_dataset = encoded_dataset
+    training_handler.impurity_kernel = impurity_kernel
+    node_attributes = copy(node_attributes)
+    node = decision_tree.create_node(node_attributes, None)
+    decision_tree.add_root_node(node)
+    training_handler.grow_tree(
+            node, NodeData(encoded_dataset, rows, weight, sorted_positions), split_attribute)
+    threshold = None
+    if node_attributes.attribute_type == AttributeType.CONTINUOUS:
+        threshold = node_attributes.threshold
+    return threshold, training_handler.export_subtree(node)
+
+_subtree_worker_args = None
+
+def _init_subtree_worker(
+        encoded_dataset: EncodedDataset, training_attributes: TrainingAttributes,
+        attributes_map: dict, impurity_kernel: ImpurityKernel,
+        growth_order: GrowthOrder, split_strategy: str):
+    """ keeps in the worker process the arguments shared by all the subtrees """
+    global _subtree_worker_args
+    _subtree_worker_args = (
+            encoded_dataset, training_attributes, attributes_map, impurity_kernel, growth_order, split_strategy)
+
+def _grow_subtree_worker(
+        node_attributes: DecisionNodeAttributes, rows: np.ndarray, weight: np.ndarray,
+        sorted_positions: Optional[dict],
+        split_attribute: SplitAttributes) -> tuple[Optional[float], list[tuple[int, NodeAttributes]]]:
+    return grow_subtree(*_subtree_worker_args, node_attributes, rows, weight, sorted_positions, split_attribute)
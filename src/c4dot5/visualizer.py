@@ -1,6 +1,9 @@
 import os
 from pathlib import Path
-import graphviz
+try:
+    import graphviz
+except ImportError as exc:
+    raise ImportError("Drawing the trees requires graphviz: pip install c4dot5-decision-tree[viz]") from exc
 from c4dot5.DecisionTree import DecisionTree
 from c4dot5.nodes import Node, LeafNode
 from c4dot5.visualizing import create_label_leaf_node
@@ -1,4 +1,6 @@
 import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 import numpy as np
 import pandas as pd
@@ -6,6 +8,7 @@ from pathlib import Path
 from sklearn import metrics
 import graphviz
 from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.exceptions import ChildrenNotFound
 
 
 @pytest.fixture
@@ -71,6 +74,16 @@ def test_classifier_paper_training(paper_dataset, paper_attributes_map):
     leaves_labels = {leaf.get_label() for leaf in decision_tree.get_leaves_nodes()}
     assert leaves_labels == expected_leaves_labels
 
+def test_training_data_not_kept(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(paper_attributes_map)
+    decision_tree.fit(paper_dataset)
+    assert pickle.loads(pickle.dumps(decision_tree)).training_handler.encoded_dataset is None
+    # the classifier keeps its own copy of the training data
+    training_data = decision_tree.training_handler.complete_dataset
+    assert training_data is not paper_dataset and training_data.equals(paper_dataset)
+    paper_dataset.loc[0, 'Outlook'] = 'rain'
+    assert training_data.loc[0, 'Outlook'] == 'sunny'
+
 def test_sunny_weight(paper_dataset_unknown, paper_attributes_map):
     decision_tree = DecisionTreeClassifier(paper_attributes_map, max_depth=1)
     decision_tree.fit(paper_dataset_unknown)
@@ -106,3 +119,132 @@ def test_view(paper_dataset, paper_attributes_map):
     Path(os.path.join(os.getcwd(), 'figures', 'Paper-tree.gv.png')).unlink()
     Path(os.path.join(os.getcwd(), 'figures', 'Paper-tree.gv')).unlink()
     Path(os.path.join(os.getcwd(), 'figures')).rmdir()
+
+def test_parallel_attributes_same_tree(paper_dataset_unknown, paper_attributes_map):
+    serial_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    serial_tree.fit(paper_dataset_unknown)
+    parallel_tree = DecisionTreeClassifier(dict(paper_attributes_map), n_jobs=2)
+    parallel_tree.fit(paper_dataset_unknown)
+    serial_nodes = {(node.get_level(), node.get_label()) for node in serial_tree.get_nodes()}
+    parallel_nodes = {(node.get_level(), node.get_label()) for node in parallel_tree.get_nodes()}
+    assert serial_nodes == parallel_nodes
+    assert parallel_tree.training_handler.executor is None
+
+def test_generated_predictor(paper_dataset, paper_attributes_map, tmp_path):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    predictor = decision_tree.get_predictor()
+    assert decision_tree.get_predictor() is predictor
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[2, 6], 'Humidity'] = None
+    data_input.loc[[4], 'Outlook'] = '?'
+    predictions, distributions = decision_tree.predict(data_input, distribution=True)
+    attributes = list(decision_tree.get_attributes())
+    for (_, row), prediction, distribution in zip(data_input.iterrows(), predictions, distributions):
+        row = row.to_dict()
+        generated = predictor(row)
+        assert predictor(tuple(row[attribute] for attribute in attributes)) == generated
+        if isinstance(generated, dict):
+            assert generated == distribution
+        else:
+            assert generated == prediction
+    # unknown sunny humidity and unknown outlook pool the leaves
+    assert isinstance(predictor(data_input.loc[2].to_dict()), dict)
+    assert isinstance(predictor(data_input.loc[4].to_dict()), dict)
+    with pytest.raises(ChildrenNotFound):
+        predictor({'Outlook': 'cloudy'})
+    decision_tree.export_predictor(tmp_path / 'paper_predictor.py')
+    namespace = {}
+    exec((tmp_path / 'paper_predictor.py').read_text(), namespace)
+    assert namespace['predict']({'Outlook': 'overcast'}) == 'Play'
+    assert pickle.loads(pickle.dumps(decision_tree)).get_predictor()({'Outlook': 'overcast'}) == 'Play'
+
+def test_generated_predictor_attribute_names(paper_dataset, paper_attributes_map):
+    # quotes and braces in the names must not end up in the generated code
+    names = {'Outlook': 'Out"look {look}', 'Humidity': "Humidity's {0}"}
+    decision_tree = DecisionTreeClassifier({names.get(name, name): attribute_type
+                                            for name, attribute_type in paper_attributes_map.items()})
+    decision_tree.fit(paper_dataset.rename(columns=names))
+    data_input = paper_dataset.drop(columns=['target']).rename(columns=names)
+    records = data_input.to_dict('records')
+    assert decision_tree.predict_records(records) == decision_tree.predict(data_input)
+    with pytest.raises(ChildrenNotFound, match=r'Out"look \{look\}'):
+        decision_tree.predict_one({names['Outlook']: 'cloudy'})
+
+def test_predict_proba(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    assert list(decision_tree.classes_) == ["Don't Play", "Play"]
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[0, 3], 'Humidity'] = None
+    data_input.loc[[9], 'Outlook'] = '?'
+    probabilities = decision_tree.predict_proba(data_input)
+    assert probabilities.shape == (len(data_input), 2)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    predictions, distributions = decision_tree.predict(data_input, distribution=True)
+    for row_probabilities, distribution in zip(probabilities, distributions):
+        assert np.allclose(np.round(row_probabilities, 4),
+                           [distribution.get(target, 0.0) for target in decision_tree.classes_])
+    assert decision_tree.predict(data_input) == predictions
+    # sunny with unknown humidity: 2 Play and 3 Don't Play examples
+    assert np.allclose(probabilities[0], [0.6, 0.4])
+    assert decision_tree.predict_proba(data_input.iloc[:0]).shape == (0, 2)
+
+def test_predict_threads(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    data_input = paper_dataset.drop(columns=['target']).astype(object).sample(
+            5000, replace=True, random_state=0)
+    data_input.loc[data_input.index[::7], 'Humidity'] = None
+    predictions = decision_tree.predict(data_input, distribution=True)
+    assert decision_tree.predict(data_input, distribution=True, n_jobs=3) == predictions
+    assert decision_tree.predict(data_input, n_jobs=-1) == predictions[0]
+    assert np.array_equal(decision_tree.predict_proba(data_input, n_jobs=2),
+                          decision_tree.predict_proba(data_input))
+    # the same model shared by concurrent threads
+    chunks = [data_input.iloc[start:start + 500] for start in range(0, 5000, 500)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda chunk: decision_tree.predict(chunk, distribution=True), chunks))
+    assert [prediction for chunk, _ in results for prediction in chunk] == predictions[0]
+    assert [distribution for _, chunk in results for distribution in chunk] == predictions[1]
+
+def test_predict_one(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    records = paper_dataset.drop(columns=['target']).to_dict('records')
+    records[0]['Humidity'] = None
+    del records[9]['Outlook']
+    records[5]['Windy'] = '?'
+    data_input = pd.DataFrame(records, columns=list(paper_attributes_map)).astype(object)
+    predictions, distributions = decision_tree.predict(data_input, distribution=True)
+    assert decision_tree.predict_records(records) == predictions
+    assert decision_tree.predict_records(iter(records), distribution=True) == (predictions, distributions)
+    assert decision_tree.predict_one(records[1]) == "Don't Play"
+    assert decision_tree.predict_one(records[0], distribution=True) == ("Don't Play", {"Don't Play": 0.6, "Play": 0.4})
+    # no known value: all the training examples are pooled
+    assert decision_tree.predict_one({}, distribution=True) == ("Play", {"Don't Play": 0.3571, "Play": 0.6429})
+
+def test_apply_decision_path(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    compiled_tree = decision_tree.get_compiled_tree()
+    data_input = paper_dataset.drop(columns=['target'])
+    leaves = decision_tree.apply(data_input)
+    assert isinstance(leaves, np.ndarray)
+    assert compiled_tree.labels[leaves[0]] == 'Humidity <= 75.0'
+    assert compiled_tree.labels[leaves[5]] == 'Outlook = overcast'
+    path = decision_tree.decision_path(data_input)
+    assert path.shape == (len(data_input), len(compiled_tree))
+    for row, leaf in enumerate(leaves):
+        assert list(path[row].indices) == sorted(compiled_tree.get_path(leaf))
+    # unknown humidity on a sunny day: the row reaches both the humidity leaves
+    data_input = data_input.astype(object)
+    data_input.loc[0, 'Humidity'] = None
+    weights = decision_tree.apply(data_input)
+    assert weights.shape == (len(data_input), len(compiled_tree))
+    assert np.allclose(weights.sum(axis=1), 1.0)
+    assert {compiled_tree.labels[leaf]: weight for leaf, weight in zip(weights[0].indices, weights[0].data)} == \
+            {'Humidity <= 75.0': 0.4, 'Humidity > 75.0': 0.6}
+    assert np.array_equal(weights[1:].nonzero()[1], leaves[1:])
+    with pytest.raises(ValueError):
+        decision_tree.apply(data_input, sparse_output=False)
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from c4dot5.attributes import AttributeType, DecisionNodeAttributes, NodeType
 from c4dot5.nodes import DecisionNodeCategorical
 
@@ -57,3 +58,15 @@ def test_delete_child(root_attributes, node_a_attributes, node_b_attributes):
     root_node.add_child(node_b)
     root_node.delete_child(node_a)
     assert root_node.get_children() == set([node_b])
+
+def test_get_child_bool_types(root_attributes, node_a_attributes, node_b_attributes):
+    """ python and numpy booleans and their strings reach the same child """
+    root_node = DecisionNodeCategorical(root_attributes, None)
+    node_a = DecisionNodeCategorical(node_a_attributes, root_node)
+    node_b = DecisionNodeCategorical(node_b_attributes, root_node)
+    root_node.add_child(node_a)
+    root_node.add_child(node_b)
+    assert root_node.get_child(np.True_) == node_a
+    assert root_node.get_child("False") == node_b
+    root_node.delete_child(node_a)
+    assert root_node.get_child(True) is None
@@ -64,3 +64,15 @@ def test_delete_child(root_attributes, node_a_attributes, node_b_attributes):
     root_node.add_child(node_b)
     root_node.delete_child(node_a)
     assert root_node.get_children() == set([node_b])
+
+def test_get_child_after_delete(root_attributes, node_a_attributes, node_b_attributes):
+    """ the lookup of the children follows the deleted ones """
+    root_node = DecisionNodeCategorical(root_attributes, None)
+    node_a = DecisionNodeCategorical(node_a_attributes, root_node)
+    node_b = DecisionNodeCategorical(node_b_attributes, root_node)
+    root_node.add_child(node_a)
+    root_node.add_child(node_b)
+    root_node.delete_child(node_a)
+    assert root_node.get_child("Red") is None
+    assert root_node.get_child("Blue") == node_b
+    assert root_node.get_children_by_value() == {"Blue": node_b}
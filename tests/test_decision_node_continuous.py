@@ -92,3 +92,16 @@ def test_delete_child(root_attributes, node_a_attributes, node_b_attributes):
     root_node.add_child(node_b)
     root_node.delete_child(node_a)
     assert root_node.get_children() == set([node_b])
+
+def test_get_child_low_high(root_attributes, node_a_attributes, node_b_attributes):
+    """ the low and high children follow the added and deleted ones """
+    root_node = DecisionNodeContinuous(root_attributes, None)
+    node_a = DecisionNodeContinuous(node_a_attributes, root_node)
+    node_b = DecisionNodeContinuous(node_b_attributes, root_node)
+    root_node.add_child(node_a)
+    root_node.add_child(node_b)
+    assert root_node.get_child(10.0) == node_a
+    assert root_node.get_child(15.0) == node_b
+    assert root_node.get_low_high_children() == (node_a, node_b)
+    root_node.delete_child(node_b)
+    assert root_node.get_child(15.0) is None
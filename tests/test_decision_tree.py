@@ -96,7 +96,7 @@ def paper_tree():
     paper_tree.add_node(windy_true_node)
     windy_false_node = paper_tree.create_node(windy_false_node_attr, rain_node)
     paper_tree.add_node(windy_false_node)
-    paper_tree.prediction_handler = PredictionHandler(paper_tree.get_leaves_nodes())
+    paper_tree.prediction_handler = PredictionHandler()
     return paper_tree
 
 @pytest.fixture
@@ -140,7 +140,7 @@ def paper_tree_unknown():
     paper_tree_unknown.add_node(windy_true_node)
     windy_false_node = paper_tree_unknown.create_node(windy_false_node_attr, rain_node)
     paper_tree_unknown.add_node(windy_false_node)
-    paper_tree_unknown.prediction_handler = PredictionHandler(paper_tree_unknown.get_leaves_nodes())
+    paper_tree_unknown.prediction_handler = PredictionHandler()
     return paper_tree_unknown
 
 def test_add_node(decision_tree, root_attributes, node_a_attributes):
@@ -206,7 +206,7 @@ def test_predictions_distribution(decision_tree, root_attributes, node_a_attribu
     decision_tree.add_node(node_a)
     node_b = decision_tree.create_node(node_b_attributes_leave, root_node)
     decision_tree.add_node(node_b)
-    decision_tree.prediction_handler = PredictionHandler(decision_tree.get_leaves_nodes())
+    decision_tree.prediction_handler = PredictionHandler()
     data = pd.DataFrame.from_dict({"attr1": [5.0], "target": ["target_a"]})
     expected_distr = [{"target_a": np.round(5/7, 4), "target_b": np.round(2/7, 4)}]
     _, distr = decision_tree.predict(data)
@@ -0,0 +1,156 @@
+import struct
+from pathlib import Path
+import pytest
+import numpy as np
+import pandas as pd
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.importing import import_classifier, import_model, map_model, ModelReloader
+from c4dot5.exporting import MAGIC
+from c4dot5.nodes import DecisionNodeContinuous, DecisionNodeCategorical
+
+# paper classifier saved with save() before the compiled tree
+BASELINE_CLASSIFIER = Path(__file__).parent / 'data' / 'paper-baseline.classifier'
+
+
+@pytest.fixture
+def paper_dataset():
+    # df from the paper c4.5
+    dataframe = pd.DataFrame(
+            {'Outlook': ['sunny', 'sunny', 'sunny', 'sunny', 'sunny', 'overcast',
+                'overcast', 'overcast', 'overcast', 'rain', 'rain', 'rain', 'rain', 'rain'],
+        'Temperature': [75, 80, 85, 72, 69, 72, 83, 64, 81, 71, 65, 75, 68, 70],
+        'Humidity': [70, 90, 85, 95, 70, 90, 78, 65, 75, 80, 70, 80, 80, 96],
+        'Windy': [True, True, False, False, False, True, False,
+            True, False, True, True, False, False, False],
+        'target': ["Play", "Don't Play", "Don't Play", "Don't Play", "Play", "Play", "Play",
+            "Play", "Play", "Don't Play", "Don't Play", "Play", "Play", "Play"]})
+    return dataframe
+
+@pytest.fixture
+def paper_attributes_map():
+    attr = {"Outlook": "categorical", "Humidity": "continuous",
+            "Windy": "boolean", "Temperature": "continuous"}
+    return attr
+
+@pytest.fixture
+def classifier(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map), max_depth=5, growth_order='breadth-first')
+    decision_tree.fit(paper_dataset)
+    return decision_tree
+
+def get_nodes_description(classifier):
+    return {(node.get_level(), node.get_label(), type(node).__name__,
+             str(node.get_node_attributes())) for node in classifier.get_nodes()}
+
+def test_model_same_predictions(classifier, paper_dataset, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    loaded = import_model(tmp_path / 'paper.model')
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[0, 6], 'Humidity'] = None
+    data_input.loc[[9], 'Outlook'] = '?'
+    assert loaded.predict(data_input, distribution=True) == classifier.predict(data_input, distribution=True)
+    assert np.array_equal(loaded.predict_proba(data_input), classifier.predict_proba(data_input))
+    assert list(loaded.classes_) == list(classifier.classes_)
+    assert loaded.get_attributes() == classifier.get_attributes()
+    assert loaded.training_handler.training_attributes.max_depth == 5
+    # the nodes are created when first needed, with the compiled tree still in use
+    compiled_tree = loaded.get_compiled_tree()
+    assert get_nodes_description(loaded) == get_nodes_description(classifier)
+    assert loaded.get_compiled_tree() is compiled_tree
+    assert set(compiled_tree.node_ids) == {node.get_id() for node in loaded.get_nodes()}
+    assert loaded.predict(data_input) == classifier.predict(data_input)
+
+def test_model_training_data(classifier, paper_dataset, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    assert import_model(tmp_path / 'paper.model').training_handler.complete_dataset is None
+    classifier.save_model(tmp_path / 'paper-data.model', training_data=True)
+    loaded = import_model(tmp_path / 'paper-data.model')
+    assert loaded.training_handler.complete_dataset.equals(classifier.training_handler.complete_dataset)
+    assert (tmp_path / 'paper.model').stat().st_size < (tmp_path / 'paper-data.model').stat().st_size
+
+def test_model_format(classifier, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    content = (tmp_path / 'paper.model').read_bytes()
+    assert content.startswith(MAGIC)
+    # saved with pickle or in the model format, the same loader
+    classifier.save(tmp_path / 'paper.classifier')
+    assert isinstance(import_classifier(tmp_path / 'paper.classifier'), DecisionTreeClassifier)
+    assert isinstance(import_classifier(tmp_path / 'paper.model'), DecisionTreeClassifier)
+    (tmp_path / 'future.model').write_bytes(MAGIC + struct.pack("<IQ", 99, 0) + content[len(MAGIC) + 12:])
+    with pytest.raises(ValueError):
+        import_model(tmp_path / 'future.model')
+    with pytest.raises(ValueError):
+        import_model(tmp_path / 'paper.classifier')
+
+def test_map_model(classifier, paper_dataset, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model', training_data=True)
+    mapped = map_model(tmp_path / 'paper.model')
+    data_input = paper_dataset.drop(columns=['target'])
+    assert mapped.predict(data_input, distribution=True) == classifier.predict(data_input, distribution=True)
+    assert mapped.training_handler.complete_dataset.equals(classifier.training_handler.complete_dataset)
+    # the arrays are read-only views of the file
+    compiled_tree = mapped.get_compiled_tree()
+    base = compiled_tree.class_counts
+    while not isinstance(base, np.memmap) and isinstance(base.base, np.ndarray):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    assert not compiled_tree.threshold.flags.writeable
+
+def test_model_reloader(classifier, paper_dataset, paper_attributes_map, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    reloader = ModelReloader(tmp_path / 'paper.model')
+    first = reloader.get_classifier()
+    assert reloader.get_classifier() is first
+    stump = DecisionTreeClassifier(dict(paper_attributes_map), max_depth=1)
+    stump.fit(paper_dataset)
+    stump.save_model(tmp_path / 'paper.model')
+    second = reloader.get_classifier()
+    assert second is not first
+    data_input = paper_dataset.drop(columns=['target'])
+    assert second.predict(data_input) == stump.predict(data_input)
+    # the previous version keeps working on the replaced file
+    assert first.predict(data_input) == classifier.predict(data_input)
+
+def test_baseline_pickle_nodes():
+    # pickled by a version without the children indexed by the value of the test
+    classifier = import_classifier(BASELINE_CLASSIFIER)
+    for node in classifier.decision_tree._nodes:
+        if isinstance(node, DecisionNodeContinuous):
+            low_child, high_child = node.get_low_high_children()
+            assert low_child.get_label().startswith(f"{node.get_attribute()} <= ")
+            assert high_child.get_label().startswith(f"{node.get_attribute()} > ")
+        elif isinstance(node, DecisionNodeCategorical):
+            assert {f"{node.get_attribute()} = {value}" for value in node.get_children_by_value()} == {
+                    child.get_label() for child in node.get_children()}
+            for child in node.get_children():
+                value = child.get_label().split(" = ")[1]
+                assert node.get_child(value) is child
+
+def test_baseline_pickle(paper_dataset, paper_attributes_map):
+    classifier = import_classifier(BASELINE_CLASSIFIER)
+    fitted = DecisionTreeClassifier(dict(paper_attributes_map))
+    fitted.fit(paper_dataset)
+    assert get_nodes_description(classifier) == get_nodes_description(fitted)
+    assert classifier.get_root_node().get_label() == 'root'
+    assert list(classifier.classes_) == list(fitted.classes_)
+    assert not hasattr(classifier.decision_tree.prediction_handler, '_leaves_nodes')
+    # trained again with the default options
+    classifier.fit(paper_dataset)
+    assert get_nodes_description(classifier) == get_nodes_description(fitted)
+
+def test_baseline_pickle_predictions(paper_dataset, paper_attributes_map, tmp_path):
+    classifier = import_classifier(BASELINE_CLASSIFIER)
+    fitted = DecisionTreeClassifier(dict(paper_attributes_map))
+    fitted.fit(paper_dataset)
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[0, 6], 'Humidity'] = None
+    data_input.loc[[9], 'Outlook'] = '?'
+    # the tree is compiled at the first prediction
+    assert classifier.decision_tree.compiled_tree is None
+    assert classifier.predict(data_input, distribution=True) == fitted.predict(data_input, distribution=True)
+    assert classifier.predict(data_input) == fitted.predict(data_input)
+    assert np.array_equal(classifier.predict_proba(data_input), fitted.predict_proba(data_input))
+    records = data_input.to_dict('records')
+    assert classifier.predict_records(records) == fitted.predict_records(records)
+    classifier.save_model(tmp_path / 'paper.model')
+    assert import_model(tmp_path / 'paper.model').predict(data_input) == fitted.predict(data_input)
@@ -0,0 +1,49 @@
+import sys
+import subprocess
+import pytest
+
+
+def get_imported_modules(statement):
+    # a new interpreter, the modules imported by the tests don't count
+    output = subprocess.run(
+            [sys.executable, "-c", f"{statement}; import sys; print(' '.join(sys.modules))"],
+            check=True, capture_output=True, text=True).stdout
+    return set(output.split())
+
+@pytest.mark.parametrize("statement", [
+    "from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier",
+    "from c4dot5.importing import import_classifier"])
+def test_lazy_imports(statement):
+    modules = get_imported_modules(statement)
+    # needed only to draw the trees, extract the rules, train in processes or get the decision paths
+    for module in ("graphviz", "statsmodels", "tqdm", "multiprocessing", "scipy"):
+        assert module not in modules
+
+def test_lazy_imports_predicting(tmp_path):
+    modules = get_imported_modules(
+            "import pandas as pd; from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier; "
+            "data = pd.DataFrame({'Humidity': [70, 90, 85, 95], 'target': ['Play', 'Play', 'Stay', 'Stay']}); "
+            "classifier = DecisionTreeClassifier({'Humidity': 'continuous'}, min_instances=1); "
+            "classifier.fit(data); "
+            f"classifier.save_model({str(tmp_path / 'model')!r}); "
+            "from c4dot5.importing import import_model; "
+            f"import_model({str(tmp_path / 'model')!r}).predict(data.drop(columns=['target']))")
+    for module in ("graphviz", "statsmodels", "tqdm"):
+        assert module not in modules
+
+def test_runtime_imports():
+    modules = get_imported_modules("from c4dot5.runtime import load_model")
+    # only numpy and the standard library
+    for module in ("pandas", "scipy", "graphviz", "statsmodels", "tqdm", "c4dot5.DecisionTree"):
+        assert module not in modules
+
+@pytest.mark.parametrize("statement, extra", [
+    ("import c4dot5.visualizer", "viz"),
+    ("from c4dot5.predicting import get_nodes_matrix; get_nodes_matrix([], [], 1, 1)", "sparse")])
+def test_missing_extras(statement, extra):
+    # the optional dependencies hidden as if they were not installed
+    completed = subprocess.run(
+            [sys.executable, "-c", f"import sys; sys.modules.update(graphviz=None, scipy=None); {statement}"],
+            capture_output=True, text=True)
+    assert completed.returncode != 0
+    assert f"pip install c4dot5-decision-tree[{extra}]" in completed.stderr
@@ -1,10 +1,13 @@
 import pytest
+import numpy as np
 import pandas as pd
 from sklearn import metrics
 from c4dot5.DecisionTree import DecisionTree
 from c4dot5.traininghandler import TrainingHandler
 from c4dot5.attributes import TrainingAttributes
 from c4dot5.predictor import PredictionHandler
+from c4dot5.compiling import LEAF, CONTINUOUS, CATEGORICAL
+from c4dot5.exceptions import ChildrenNotFound
 
 
 @pytest.fixture
@@ -52,7 +55,72 @@ def test_predict(paper_dataset, paper_attributes_map):
     training_attributes = TrainingAttributes()
     training_handler = TrainingHandler(decision_tree,
             training_attributes)
-    prediction_handler = PredictionHandler(decision_tree.get_leaves_nodes())
+    prediction_handler = PredictionHandler()
     training_handler.split_dataset(paper_dataset)
     predictions, _ = prediction_handler.predict(paper_dataset, decision_tree.get_root_node())
     assert metrics.accuracy_score(paper_dataset['target'], predictions) == 1.0
+
+def test_predict_batch_same_as_single_rows(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(paper_attributes_map)
+    training_handler = TrainingHandler(decision_tree, TrainingAttributes())
+    training_handler.split_dataset(paper_dataset)
+    prediction_handler = PredictionHandler()
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[0, 3, 7], 'Humidity'] = None
+    data_input.loc[[3, 9], 'Outlook'] = '?'
+    predictions, distributions = prediction_handler.predict(data_input, decision_tree.get_root_node())
+    for idx in range(len(data_input)):
+        prediction, distribution = prediction_handler.predict(
+                data_input.iloc[[idx]], decision_tree.get_root_node())
+        assert predictions[idx] == prediction[0]
+        assert distributions[idx] == distribution[0]
+    # unknown outlook: all the leaves are reached
+    assert set(distributions[3]) == {"Play", "Don't Play"}
+    assert prediction_handler.predict(data_input.iloc[:0], decision_tree.get_root_node()) == ([], [])
+
+def test_compiled_tree(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(paper_attributes_map)
+    training_handler = TrainingHandler(decision_tree, TrainingAttributes())
+    training_handler.split_dataset(paper_dataset)
+    compiled_tree = decision_tree.compile()
+    assert len(compiled_tree) == len(decision_tree.get_nodes())
+    assert compiled_tree.kind[0] == CATEGORICAL
+    assert compiled_tree.attributes[compiled_tree.feature[0]] == 'Outlook'
+    assert list(compiled_tree.classes) == ["Don't Play", "Play"]
+    for node_idx in np.flatnonzero(compiled_tree.kind == LEAF):
+        path = compiled_tree.get_path(node_idx)
+        node = [node for node in decision_tree.get_nodes() if node.get_id() == compiled_tree.node_ids[node_idx]][0]
+        labels = []
+        while node is not None:
+            labels.append(node.get_label())
+            node = node.get_parent_node()
+        assert list(compiled_tree.labels[path]) == labels[::-1]
+    sunny = list(compiled_tree.labels).index('Outlook = sunny')
+    assert compiled_tree.kind[sunny] == CONTINUOUS
+    assert compiled_tree.threshold[sunny] == 75.0
+    assert list(compiled_tree.labels[compiled_tree.get_children(sunny)]) == ['Humidity <= 75.0', 'Humidity > 75.0']
+
+def test_predict_compiled_same_as_nodes(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(paper_attributes_map)
+    training_handler = TrainingHandler(decision_tree, TrainingAttributes())
+    training_handler.split_dataset(paper_dataset)
+    decision_tree.set_prediction_handler(PredictionHandler())
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[1, 5], 'Windy'] = None
+    data_input.loc[[2, 9], 'Outlook'] = '?'
+    assert decision_tree.predict(data_input) == \
+            decision_tree.prediction_handler.predict(data_input, decision_tree.get_root_node())
+    data_input.loc[4, 'Outlook'] = 'cloudy'
+    with pytest.raises(ChildrenNotFound):
+        decision_tree.predict(data_input)
+
+def test_compiled_tree_invalidated(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(paper_attributes_map)
+    training_handler = TrainingHandler(decision_tree, TrainingAttributes())
+    training_handler.split_dataset(paper_dataset)
+    compiled_tree = decision_tree.get_compiled_tree()
+    assert decision_tree.get_compiled_tree() is compiled_tree
+    leaf = next(iter(decision_tree.get_leaves_nodes()))
+    decision_tree.delete_node(leaf)
+    assert decision_tree.compiled_tree is None
+    assert len(decision_tree.get_compiled_tree()) == len(compiled_tree) - 1
@@ -0,0 +1,80 @@
+import pytest
+import numpy as np
+import pandas as pd
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.runtime import load_model
+import c4dot5.exporting
+from c4dot5.exceptions import ChildrenNotFound
+
+
+@pytest.fixture
+def paper_dataset():
+    # df from the paper c4.5
+    dataframe = pd.DataFrame(
+            {'Outlook': ['sunny', 'sunny', 'sunny', 'sunny', 'sunny', 'overcast',
+                'overcast', 'overcast', 'overcast', 'rain', 'rain', 'rain', 'rain', 'rain'],
+        'Temperature': [75, 80, 85, 72, 69, 72, 83, 64, 81, 71, 65, 75, 68, 70],
+        'Humidity': [70, 90, 85, 95, 70, 90, 78, 65, 75, 80, 70, 80, 80, 96],
+        'Windy': [True, True, False, False, False, True, False,
+            True, False, True, True, False, False, False],
+        'target': ["Play", "Don't Play", "Don't Play", "Don't Play", "Play", "Play", "Play",
+            "Play", "Play", "Don't Play", "Don't Play", "Play", "Play", "Play"]})
+    return dataframe
+
+@pytest.fixture
+def paper_attributes_map():
+    attr = {"Outlook": "categorical", "Humidity": "continuous",
+            "Windy": "boolean", "Temperature": "continuous"}
+    return attr
+
+@pytest.fixture
+def classifier(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    return decision_tree
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_runtime_same_predictions(classifier, paper_dataset, tmp_path, mmap):
+    classifier.save_model(tmp_path / 'paper.model')
+    model = load_model(tmp_path / 'paper.model', mmap=mmap)
+    data_input = paper_dataset.drop(columns=['target']).astype(object)
+    data_input.loc[[0, 6], 'Humidity'] = None
+    data_input.loc[[9], 'Outlook'] = '?'
+    data_input.loc[[11], 'Windy'] = np.nan
+    expected = classifier.predict(data_input, distribution=True)
+    assert model.predict(data_input, distribution=True) == expected
+    assert model.predict(data_input) == classifier.predict(data_input)
+    assert np.array_equal(model.predict_proba(data_input), classifier.predict_proba(data_input))
+    # columns as lists or arrays and records, without pandas
+    columns = {name: data_input[name].tolist() for name in data_input.columns}
+    assert model.predict(columns, distribution=True) == expected
+    records = data_input.to_dict('records')
+    assert model.predict(records, distribution=True) == expected
+    assert model.predict_records(records, distribution=True) == classifier.predict_records(records, distribution=True)
+    assert model.predict_one(records[0]) == classifier.predict_one(records[0])
+    assert list(model.classes_) == list(classifier.classes_)
+
+def test_runtime_typed_columns(classifier, paper_dataset, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    model = load_model(tmp_path / 'paper.model')
+    data_input = paper_dataset.drop(columns=['target'])
+    columns = {name: data_input[name].to_numpy() for name in data_input.columns}
+    assert model.predict(columns, distribution=True) == classifier.predict(data_input, distribution=True)
+    assert model.predict({'Outlook': [], 'Humidity': [], 'Windy': [], 'Temperature': []}) == []
+
+def test_runtime_unknown_category(classifier, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+    model = load_model(tmp_path / 'paper.model')
+    with pytest.raises(ChildrenNotFound):
+        model.predict([{'Outlook': 'cloudy', 'Humidity': 70, 'Windy': True, 'Temperature': 70}])
+
+def test_runtime_format_version_1(classifier, paper_dataset, tmp_path, monkeypatch):
+    # version 1 files also saved the distributions of the leaves
+    compiled_tree = classifier.get_compiled_tree()
+    compiled_tree.leaf_distributions = compiled_tree.class_counts / compiled_tree.leaf_totals[:, np.newaxis]
+    monkeypatch.setattr(c4dot5.exporting, "FORMAT_VERSION", 1)
+    monkeypatch.setattr(c4dot5.exporting, "ARRAY_FIELDS", c4dot5.exporting.ARRAY_FIELDS + ("leaf_distributions",))
+    classifier.save_model(tmp_path / 'paper.model')
+    model = load_model(tmp_path / 'paper.model')
+    data_input = paper_dataset.drop(columns=['target'])
+    assert model.predict(data_input, distribution=True) == classifier.predict(data_input, distribution=True)
@@ -0,0 +1,169 @@
+import asyncio
+import pytest
+import pandas as pd
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.serving import PredictionServer, PredictionClient, MicroBatcher
+from c4dot5.exceptions import PredictionRequestError, ChildrenNotFound
+
+
+@pytest.fixture
+def paper_dataset():
+    # df from the paper c4.5
+    dataframe = pd.DataFrame(
+            {'Outlook': ['sunny', 'sunny', 'sunny', 'sunny', 'sunny', 'overcast',
+                'overcast', 'overcast', 'overcast', 'rain', 'rain', 'rain', 'rain', 'rain'],
+        'Temperature': [75, 80, 85, 72, 69, 72, 83, 64, 81, 71, 65, 75, 68, 70],
+        'Humidity': [70, 90, 85, 95, 70, 90, 78, 65, 75, 80, 70, 80, 80, 96],
+        'Windy': [True, True, False, False, False, True, False,
+            True, False, True, True, False, False, False],
+        'target': ["Play", "Don't Play", "Don't Play", "Don't Play", "Play", "Play", "Play",
+            "Play", "Play", "Don't Play", "Don't Play", "Play", "Play", "Play"]})
+    return dataframe
+
+@pytest.fixture
+def paper_attributes_map():
+    attr = {"Outlook": "categorical", "Humidity": "continuous",
+            "Windy": "boolean", "Temperature": "continuous"}
+    return attr
+
+@pytest.fixture
+def classifier(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    return decision_tree
+
+@pytest.fixture
+def records(paper_dataset):
+    records = paper_dataset.drop(columns=['target']).to_dict('records')
+    del records[0]['Humidity']
+    return records
+
+def test_micro_batcher(classifier, records):
+    calls = []
+
+    class CountingBatcher(MicroBatcher):
+        def predict_requests(self, batch):
+            calls.append(len(batch))
+            return super().predict_requests(batch)
+
+    async def predict_all():
+        batcher = CountingBatcher(classifier, max_delay=0.05, max_rows=1000)
+        results = await asyncio.gather(*[batcher.predict([record], distribution=True) for record in records])
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(predict_all())
+    predictions, distributions = classifier.predict(
+            pd.DataFrame.from_records(records, columns=list(classifier.get_attributes())), distribution=True)
+    assert [result[0][0] for result in results] == predictions
+    assert [result[1][0] for result in results] == distributions
+    # all the concurrent requests in one batch
+    assert calls == [len(records)]
+
+def test_micro_batcher_event_loops(classifier, records):
+    # created outside the event loops it is used in
+    batcher = MicroBatcher(classifier, max_delay=0.01)
+
+    async def predict_all():
+        results = await asyncio.gather(*[batcher.predict([record]) for record in records])
+        await batcher.stop()
+        return [result[0][0] for result in results]
+
+    # a queue bound to the first loop would never answer in the second one
+    for _ in range(2):
+        assert asyncio.run(asyncio.wait_for(predict_all(), 5)) == classifier.predict_records(records)
+
+def test_micro_batcher_wrong_record(classifier, records):
+    async def predict_all():
+        batcher = MicroBatcher(classifier, max_delay=0.05)
+        results = await asyncio.gather(batcher.predict(records[:3]), batcher.predict([{'Outlook': 'cloudy'}]),
+                                       return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(predict_all())
+    assert results[0][0] == classifier.predict(pd.DataFrame(records[:3]))
+    assert isinstance(results[1], ChildrenNotFound)
+
+def test_server(classifier, records, tmp_path):
+    classifier.save(tmp_path / 'paper.classifier')
+
+    async def serve():
+        server = PredictionServer.from_files({'paper': tmp_path / 'paper.classifier'}, max_rows=4)
+        await server.start(port=0)
+        try:
+            async with PredictionClient(port=server.get_port()) as client:
+                status, models = await client.request("GET", "/models")
+                single = await client.predict('paper', records[:1], distribution=True)
+                with pytest.raises(PredictionRequestError):
+                    await client.predict('other', records)
+            clients = [PredictionClient(port=server.get_port()) for _ in records]
+            for client in clients:
+                await client.connect()
+            answers = await asyncio.gather(*[client.predict('paper', [record]) for client, record in zip(clients, records)])
+            for client in clients:
+                await client.close()
+        finally:
+            await server.stop()
+        return status, models, single, answers
+
+    status, models, single, answers = asyncio.run(serve())
+    assert status == 200
+    assert models['models']['paper']['classes'] == ["Don't Play", "Play"]
+    assert single == {'predictions': ["Don't Play"], 'distributions': [{"Don't Play": 0.6, "Play": 0.4}]}
+    assert [answer['predictions'][0] for answer in answers] == classifier.predict_records(records)
+
+def test_server_unix_socket(classifier, records, tmp_path):
+    async def serve():
+        server = PredictionServer({'paper': classifier})
+        await server.start(path=str(tmp_path / 'c4dot5.sock'))
+        try:
+            async with PredictionClient(path=str(tmp_path / 'c4dot5.sock')) as client:
+                return await client.predict('paper', records)
+        finally:
+            await server.stop()
+
+    assert asyncio.run(serve())['predictions'] == classifier.predict_records(records)
+
+def test_server_reload(classifier, records, tmp_path):
+    classifier.save_model(tmp_path / 'paper.model')
+
+    async def serve():
+        server = PredictionServer.from_files({'paper': tmp_path / 'paper.model'}, reload=True)
+        await server.start(port=0)
+        try:
+            async with PredictionClient(port=server.get_port()) as client:
+                return await client.predict('paper', records)
+        finally:
+            await server.stop()
+
+    assert asyncio.run(serve())['predictions'] == classifier.predict_records(records)
+
+def send_raw_request(classifier, request: bytes) -> bytes:
+    async def serve():
+        server = PredictionServer({'paper': classifier})
+        await server.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.get_port())
+            writer.write(request)
+            await writer.drain()
+            answer = await reader.read()
+            writer.close()
+            return answer
+        finally:
+            await server.stop()
+
+    return asyncio.run(serve())
+
+@pytest.mark.parametrize("content_length", ["ten", "-1"])
+def test_server_malformed_content_length(classifier, content_length):
+    answer = send_raw_request(
+            classifier, f"POST /models/paper/predict HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode())
+    assert answer.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+
+@pytest.mark.parametrize("request_head", [
+    b"GET /models HTTP/1.1\r\nX-Long: " + b"a" * 2**17 + b"\r\n\r\n",
+    b"POST /models/paper/predict HTTP/1.1\r\nContent-Length: " + str(2**40).encode() + b"\r\n\r\n"], ids=["header", "body"])
+def test_server_oversized_request(classifier, request_head):
+    answer = send_raw_request(classifier, request_head)
+    assert answer.startswith(b"HTTP/1.1 413 Payload Too Large\r\n")
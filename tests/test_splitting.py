@@ -0,0 +1,149 @@
+import pytest
+import numpy as np
+import pandas as pd
+from c4dot5.splitting import get_split_gain_continuous, get_split_gain_categorical
+from c4dot5.training import class_entropy, get_total_threshold
+from c4dot5.impurity import EntropyKernel, GiniKernel, DataFrameKernel
+from c4dot5.encoding import encode_dataset, NodeData
+from c4dot5.attributes import AttributeType
+
+
+@pytest.fixture
+def continuous_dataset():
+    rng = np.random.default_rng(42)
+    feat = rng.integers(0, 40, size=200).astype(object)
+    feat[rng.random(200) < 0.1] = '?'
+    dataframe = pd.DataFrame({
+        "feat": feat,
+        "target": rng.choice(["target_1", "target_2", "target_3"], size=200)})
+    dataset = encode_dataset(dataframe, {"feat": AttributeType.CONTINUOUS})
+    return NodeData(dataset, np.arange(200), rng.choice([1.0, 0.5, 0.25], size=200))
+
+@pytest.fixture
+def class_counts():
+    return np.array([[2.0, 0.5, 0.0], [0.0, 0.0, 3.0], [1.0, 1.0, 1.0]])
+
+def best_threshold(data, min_instances):
+    """ evaluates the thresholds one at a time on the dataframe of every subsplit """
+    known = ~data.get_missing("feat")
+    freq_known = np.count_nonzero(known) / len(data)
+    data = data.subset(known)
+    values = data.get_column("feat")
+    split_gain = class_entropy(data.get_target_dataframe())
+    unique_values = np.unique(values)
+    best = (None, 0)
+    for threshold in unique_values[1:] - (np.diff(unique_values) / 2):
+        low = values <= threshold
+        if min(np.count_nonzero(low), np.count_nonzero(~low)) < min_instances:
+            continue
+        freq_low = np.count_nonzero(low) / len(data)
+        info_gain = split_gain - freq_low * class_entropy(data.get_target_dataframe(low)) \
+                - (1 - freq_low) * class_entropy(data.get_target_dataframe(~low))
+        split_info = - freq_low * np.log2(freq_low) - (1 - freq_low) * np.log2(1 - freq_low) \
+                - (1 - freq_known) * np.log2(1 - freq_known)
+        gain_ratio = freq_known * info_gain / split_info
+        if gain_ratio > best[1]:
+            best = (threshold, np.round(gain_ratio, 4))
+    return best
+
+def gini_index(data) -> float:
+    ops = data.groupby('target')['weight'].sum() / data['weight'].sum()
+    return float(1 - np.sum(ops ** 2))
+
+@pytest.mark.parametrize("min_instances", [1, 2, 10, 50])
+def test_sweep_same_as_thresholds(continuous_dataset, min_instances):
+    sweep = get_split_gain_continuous(continuous_dataset, "feat", min_instances, EntropyKernel())
+    threshold, gain_ratio = best_threshold(continuous_dataset, min_instances)
+    assert sweep.local_threshold == threshold
+    assert sweep.gain_ratio == gain_ratio
+
+@pytest.mark.parametrize("min_instances", [1, 10])
+def test_dataframe_kernel_same_as_entropy(continuous_dataset, min_instances):
+    sweep = get_split_gain_continuous(continuous_dataset, "feat", min_instances, EntropyKernel())
+    adapted = get_split_gain_continuous(
+            continuous_dataset, "feat", min_instances,
+            DataFrameKernel(class_entropy, continuous_dataset.classes))
+    assert sweep.local_threshold == adapted.local_threshold
+    assert sweep.gain_ratio == adapted.gain_ratio
+    assert sweep.info_gain == adapted.info_gain
+    assert sweep.errs_perc == adapted.errs_perc
+
+def test_sweep_no_valid_threshold(continuous_dataset):
+    split_attributes = get_split_gain_continuous(continuous_dataset, "feat", 1000, EntropyKernel())
+    assert split_attributes.attr_name is None
+    assert split_attributes.local_threshold is None
+
+@pytest.mark.parametrize("kernel", [EntropyKernel(), GiniKernel()])
+def test_kernel_batch(kernel, class_counts):
+    batch = kernel(class_counts)
+    assert batch.shape == (3,)
+    assert np.allclose(batch, [kernel(split_counts) for split_counts in class_counts])
+    assert batch[1] == 0
+
+def test_gini_kernel(class_counts):
+    adapter = DataFrameKernel(gini_index, np.array(["target_1", "target_2", "target_3"], dtype=object))
+    assert np.allclose(GiniKernel()(class_counts), adapter(class_counts))
+    assert np.isclose(GiniKernel()(class_counts[2]), 2 / 3)
+
+def test_categorical_unknown_paper():
+    # example with an unknown value from the paper c4.5
+    dataframe = pd.DataFrame({
+        "Outlook": ['sunny', 'sunny', 'sunny', 'sunny', 'sunny', '?', 'overcast', 'overcast',
+            'overcast', 'rain', 'rain', 'rain', 'rain', 'rain'],
+        "target": ['Play', 'DontPlay', 'DontPlay', 'DontPlay', 'Play', 'Play', 'Play', 'Play',
+            'Play', 'DontPlay', 'DontPlay', 'Play', 'Play', 'Play']})
+    dataset = encode_dataset(dataframe, {"Outlook": AttributeType.CATEGORICAL})
+    split_attributes = get_split_gain_categorical(
+            NodeData.from_dataset(dataset), "Outlook", 2, EntropyKernel())
+    # gain 0.199 in the paper is the information gain scaled by the known fraction
+    assert np.round(split_attributes.info_gain * 13 / 14, 3) == 0.199
+    assert np.isclose(split_attributes.gain_ratio, 0.199 / 1.809, atol=1e-3)
+    assert split_attributes.min_instances_condition
+
+def test_total_threshold(continuous_dataset):
+    sorted_values = continuous_dataset.dataset.sorted_values["feat"]
+    values = continuous_dataset.get_column("feat")
+    assert np.all(np.diff(sorted_values) > 0)
+    for local_threshold in [0.5, 10.0, 17.5, 39.0, 100.0]:
+        assert get_total_threshold(sorted_values, local_threshold) == values[values <= local_threshold].max()
+
+def test_sorted_positions_inherited(continuous_dataset):
+    presorted = NodeData(continuous_dataset.dataset, continuous_dataset.rows, continuous_dataset.weight,
+                         {"feat": continuous_dataset.get_sorted_positions("feat")})
+    split_knw = presorted.get_column("feat") <= 20
+    child = presorted.select(
+            np.flatnonzero(split_knw | presorted.get_missing("feat")),
+            presorted.weight[split_knw | presorted.get_missing("feat")])
+    sorted_positions = child.get_sorted_positions("feat")
+    child.sorted_positions = None
+    assert np.array_equal(child.get_column("feat")[sorted_positions],
+                          child.get_column("feat")[child.get_sorted_positions("feat")])
+
+def test_partition_same_as_select():
+    rng = np.random.default_rng(7)
+    dataframe = pd.DataFrame({
+        "zone": rng.choice(["a", "b", "c", "d", "?"], size=300).astype(object),
+        "feat": np.where(rng.random(300) < 0.2, np.nan, rng.integers(0, 30, size=300)),
+        "other": rng.normal(size=300),
+        "target": rng.choice(["target_1", "target_2"], size=300)})
+    attributes = {"zone": AttributeType.CATEGORICAL, "feat": AttributeType.CONTINUOUS,
+                  "other": AttributeType.CONTINUOUS}
+    root_data = NodeData.from_dataset(encode_dataset(dataframe, attributes), presort=True)
+    parent = root_data.select(np.arange(0, 300, 2), rng.choice([1.0, 0.5], size=150))
+    missing = parent.get_missing("zone")
+    codes = parent.get_column("zone")
+    attr_codes = pd.unique(codes[~missing])
+    lookup = np.full(len(parent.get_vocabulary("zone")), -1, dtype=np.int32)
+    lookup[attr_codes] = np.arange(len(attr_codes))
+    children = parent.partition(np.where(missing, -1, lookup[codes]), len(attr_codes))
+    for attr_code, child in zip(attr_codes, children):
+        # one child at a time: known rows of the value, then the unknown ones with the weight fraction
+        split_knw = codes == attr_code
+        expected = parent.select(
+                np.concatenate([np.flatnonzero(split_knw), np.flatnonzero(missing)]),
+                np.concatenate([parent.weight[split_knw],
+                                np.count_nonzero(split_knw) / np.count_nonzero(~missing) * parent.weight[missing]]))
+        assert np.array_equal(child.rows, expected.rows)
+        assert np.allclose(child.weight, expected.weight)
+        for attr_name in ("feat", "other"):
+            assert np.array_equal(child.get_sorted_positions(attr_name), expected.get_sorted_positions(attr_name))
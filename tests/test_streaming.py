@@ -0,0 +1,127 @@
+import pytest
+import numpy as np
+import pandas as pd
+import c4dot5.predictor
+from c4dot5.DecisionTreeClassifier import DecisionTreeClassifier
+from c4dot5.runtime import load_model
+from c4dot5.importing import import_model
+from c4dot5.streaming import read_chunks
+from c4dot5.predict import main
+
+
+@pytest.fixture
+def paper_dataset():
+    # df from the paper c4.5
+    dataframe = pd.DataFrame(
+            {'Outlook': ['sunny', 'sunny', 'sunny', 'sunny', 'sunny', 'overcast',
+                'overcast', 'overcast', 'overcast', 'rain', 'rain', 'rain', 'rain', 'rain'],
+        'Temperature': [75, 80, 85, 72, 69, 72, 83, 64, 81, 71, 65, 75, 68, 70],
+        'Humidity': [70, 90, 85, 95, 70, 90, 78, 65, 75, 80, 70, 80, 80, 96],
+        'Windy': [True, True, False, False, False, True, False,
+            True, False, True, True, False, False, False],
+        'target': ["Play", "Don't Play", "Don't Play", "Don't Play", "Play", "Play", "Play",
+            "Play", "Play", "Don't Play", "Don't Play", "Play", "Play", "Play"]})
+    return dataframe
+
+@pytest.fixture
+def paper_attributes_map():
+    attr = {"Outlook": "categorical", "Humidity": "continuous",
+            "Windy": "boolean", "Temperature": "continuous"}
+    return attr
+
+@pytest.fixture
+def classifier(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTreeClassifier(dict(paper_attributes_map))
+    decision_tree.fit(paper_dataset)
+    return decision_tree
+
+@pytest.fixture
+def input_dataset(paper_dataset):
+    data_input = paper_dataset.drop(columns=['target']).sample(100, replace=True, random_state=0)
+    data_input = data_input.astype(object).reset_index(drop=True)
+    data_input.loc[::9, 'Humidity'] = None
+    return data_input
+
+def test_read_chunks(input_dataset):
+    chunks = list(read_chunks([input_dataset.iloc[:30], input_dataset.iloc[30:]], 25))
+    assert [len(chunk) for chunk in chunks] == [25, 5, 25, 25, 20]
+    with pytest.raises(ValueError):
+        next(read_chunks(input_dataset, 0))
+
+def test_predict_stream_csv(classifier, input_dataset, tmp_path):
+    input_dataset.to_csv(tmp_path / 'input.csv', index=False)
+    predictions = pd.concat(classifier.predict_stream(
+        tmp_path / 'input.csv', chunksize=16, proba=True, output=tmp_path / 'output.csv'))
+    assert predictions['prediction'].tolist() == classifier.predict(input_dataset)
+    assert np.allclose(predictions[["proba_Don't Play", "proba_Play"]].to_numpy(),
+                       classifier.predict_proba(input_dataset))
+    written = pd.read_csv(tmp_path / 'output.csv')
+    assert written['prediction'].tolist() == predictions['prediction'].tolist()
+
+def test_predict_stream_routes_once(classifier, input_dataset, monkeypatch):
+    routings = []
+    route_rows = c4dot5.predictor.route_rows
+    monkeypatch.setattr(c4dot5.predictor, 'route_rows',
+                        lambda *args: routings.append(len(args[0])) or route_rows(*args))
+    predictions = pd.concat(classifier.predict_stream(input_dataset, chunksize=40, proba=True))
+    # one routing of the rows for every chunk, for the labels and the probabilities
+    assert routings == [40, 40, 20]
+    assert predictions['prediction'].tolist() == classifier.predict(input_dataset)
+    assert np.array_equal(predictions[["proba_Don't Play", "proba_Play"]].to_numpy(),
+                          classifier.predict_proba(input_dataset))
+
+@pytest.fixture
+def zones_dataset():
+    # integer and numeric-looking text categories
+    return pd.DataFrame({
+        'zone': [1, 2, 3] * 10,
+        'code': ['01234', '00042', '01234', '00042', '00042', '01234'] * 5,
+        'target': ['north', 'south', 'south'] * 10})
+
+def test_predict_stream_csv_categories(zones_dataset, tmp_path):
+    classifier = DecisionTreeClassifier({'zone': 'categorical', 'code': 'categorical'})
+    classifier.fit(zones_dataset)
+    assert classifier.get_compiled_tree().category_types == {'zone': 'int', 'code': 'str'}
+    input_dataset = zones_dataset.drop(columns=['target']).astype(object)
+    # unknown zone only in the second chunk, read as floats
+    input_dataset.loc[14, 'zone'] = None
+    input_dataset.to_csv(tmp_path / 'input.csv', index=False)
+    expected = classifier.predict(input_dataset)
+    predictions = pd.concat(classifier.predict_stream(tmp_path / 'input.csv', chunksize=10))
+    assert predictions['prediction'].tolist() == expected
+    # the types are saved with the model
+    classifier.save_model(tmp_path / 'zones.model')
+    assert load_model(tmp_path / 'zones.model').compiled_tree.category_types == {'zone': 'int', 'code': 'str'}
+    loaded = import_model(tmp_path / 'zones.model')
+    assert pd.concat(loaded.predict_stream(tmp_path / 'input.csv', chunksize=10))['prediction'].tolist() == expected
+
+def test_predict_stream_csv_text_categories(zones_dataset, tmp_path):
+    classifier = DecisionTreeClassifier({'code': 'categorical'})
+    classifier.fit(zones_dataset.drop(columns=['zone']).assign(target=lambda data: data['code'] + '-target'))
+    input_dataset = zones_dataset[['code']].astype(object)
+    input_dataset.loc[3, 'code'] = None
+    input_dataset.to_csv(tmp_path / 'input.csv', index=False)
+    predictions = pd.concat(classifier.predict_stream(tmp_path / 'input.csv', chunksize=10))
+    assert predictions['prediction'].tolist() == classifier.predict(input_dataset)
+
+def test_predict_stream_dataframes(classifier, input_dataset):
+    chunks = [input_dataset.iloc[start:start + 40] for start in range(0, 100, 40)]
+    predictions = list(classifier.predict_stream(iter(chunks), chunksize=32))
+    assert [len(chunk) for chunk in predictions] == [32, 8, 32, 8, 20]
+    assert pd.concat(predictions)['prediction'].tolist() == classifier.predict(input_dataset)
+
+def test_predict_stream_parquet(classifier, input_dataset, tmp_path):
+    pytest.importorskip("pyarrow")
+    input_dataset.astype({'Humidity': float, 'Temperature': float, 'Windy': bool}).to_parquet(
+            tmp_path / 'input.parquet', row_group_size=30)
+    predictions = pd.concat(classifier.predict_stream(tmp_path / 'input.parquet', chunksize=30))
+    assert predictions['prediction'].tolist() == classifier.predict(input_dataset)
+
+def test_predict_entry_point(classifier, input_dataset, tmp_path):
+    classifier.save(tmp_path / 'paper.classifier')
+    input_dataset.to_csv(tmp_path / 'input.csv', index=False)
+    main([str(tmp_path / 'paper.classifier'), str(tmp_path / 'input.csv'),
+          str(tmp_path / 'output.csv'), '--chunksize', '7', '--proba'])
+    written = pd.read_csv(tmp_path / 'output.csv')
+    assert written['prediction'].tolist() == classifier.predict(input_dataset)
+    assert list(written.columns) == ['prediction', "proba_Don't Play", "proba_Play"]
@@ -1,8 +1,12 @@
+import inspect
 import pytest
+import numpy as np
 import pandas as pd
 from c4dot5.DecisionTree import DecisionTree
 from c4dot5.traininghandler import TrainingHandler
 from c4dot5.attributes import TrainingAttributes
+from c4dot5.impurity import GiniKernel
+from c4dot5.nodes import DecisionNodeContinuous
 from c4dot5.exceptions import SplitError, WrongSplitEvaluationFunction
 
 
@@ -138,3 +142,107 @@ def test_wrong_eval_split_fn_cont(wrong_out_entropy, wrong_out_type_entropy):
             decision_tree, training_attributes, evaluate_split_fn=wrong_out_type_entropy)
     with pytest.raises(WrongSplitEvaluationFunction):
         training_handler.split_dataset(dataset)
+
+def test_impurity_kernel(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(paper_attributes_map)
+    training_handler = TrainingHandler(
+            decision_tree, TrainingAttributes(), evaluate_split_fn=GiniKernel())
+    training_handler.split_dataset(paper_dataset)
+    assert decision_tree.get_root_node().get_attribute() == "Outlook"
+    assert len(decision_tree.get_leaves_nodes()) > 0
+
+@pytest.mark.parametrize("subtree_backend", ["thread", "process"])
+def test_parallel_subtrees(paper_dataset, paper_attributes_map, subtree_backend):
+    decision_tree = DecisionTree(dict(paper_attributes_map))
+    training_handler = TrainingHandler(decision_tree, TrainingAttributes())
+    training_handler.split_dataset(paper_dataset)
+    parallel_tree = DecisionTree(dict(paper_attributes_map))
+    parallel_handler = TrainingHandler(
+            parallel_tree, TrainingAttributes(), subtree_jobs=2,
+            subtree_min_rows=1, subtree_backend=subtree_backend)
+    parallel_handler.split_dataset(paper_dataset)
+    expected_nodes = {(node.get_level(), node.get_label(), node.get_parent_node() and node.get_parent_node().get_label())
+                      for node in decision_tree.get_nodes()}
+    nodes = {(node.get_level(), node.get_label(), node.get_parent_node() and node.get_parent_node().get_label())
+             for node in parallel_tree.get_nodes()}
+    assert nodes == expected_nodes
+    sunny_node = [node for node in parallel_tree.get_nodes() if node.get_label() == 'Outlook = sunny'][0]
+    assert sunny_node.get_child(70).get_label() == 'Humidity <= 75.0'
+
+def test_wrong_subtree_backend(paper_attributes_map):
+    with pytest.raises(ValueError):
+        TrainingHandler(DecisionTree(paper_attributes_map), TrainingAttributes(), subtree_backend='gpu')
+
+@pytest.mark.parametrize("growth_order", ["breadth-first", "level-wise"])
+def test_growth_order(paper_dataset, paper_attributes_map, growth_order):
+    decision_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(decision_tree, TrainingAttributes()).split_dataset(paper_dataset)
+    ordered_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(ordered_tree, TrainingAttributes(), growth_order=growth_order).split_dataset(paper_dataset)
+    expected_nodes = {(node.get_level(), node.get_label(), node.get_parent_node() and node.get_parent_node().get_label())
+                      for node in decision_tree.get_nodes()}
+    nodes = {(node.get_level(), node.get_label(), node.get_parent_node() and node.get_parent_node().get_label())
+             for node in ordered_tree.get_nodes()}
+    assert nodes == expected_nodes
+
+def test_growth_no_recursion(monkeypatch):
+    # blocks of examples of different classes, every split separates some of them
+    dataset = pd.DataFrame({
+        "feat": np.arange(64, dtype=float),
+        "target": [f"target_{idx // 4}" for idx in range(64)]})
+    decision_tree = DecisionTree({"feat": "continuous"})
+    training_handler = TrainingHandler(
+            decision_tree, TrainingAttributes(min_instances=1, node_purity=1.0, max_depth=100))
+    stack_depths = []
+    expand_nodes = training_handler.expand_nodes
+    def record_expand_nodes(expanding):
+        stack_depths.append(len(inspect.stack(0)))
+        return expand_nodes(expanding)
+    monkeypatch.setattr(training_handler, "expand_nodes", record_expand_nodes)
+    training_handler.split_dataset(dataset)
+    assert max(node.get_level() for node in decision_tree.get_nodes()) > 2
+    assert len(set(stack_depths)) == 1
+
+def test_presort_same_tree(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(decision_tree, TrainingAttributes(), presort=False).split_dataset(paper_dataset)
+    presorted_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(presorted_tree, TrainingAttributes(), presort=True).split_dataset(paper_dataset)
+    expected_nodes = {(node.get_level(), node.get_label()) for node in decision_tree.get_nodes()}
+    assert {(node.get_level(), node.get_label()) for node in presorted_tree.get_nodes()} == expected_nodes
+
+def test_histogram_split(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(decision_tree, TrainingAttributes()).split_dataset(paper_dataset)
+    histogram_tree = DecisionTree(dict(paper_attributes_map))
+    training_handler = TrainingHandler(
+            histogram_tree, TrainingAttributes(), split_strategy='histogram', n_bins=255)
+    encoded_dataset = training_handler.split_dataset(paper_dataset)
+    assert encoded_dataset.bin_codes["Humidity"].dtype == np.uint8
+    assert training_handler.encoded_dataset is None
+    # enough bins for all the values: same partitions, thresholds on the values of the node
+    expected_leaves = sorted((leaf.get_level(), sorted(leaf.get_classes().items()))
+                             for leaf in decision_tree.get_leaves_nodes())
+    assert sorted((leaf.get_level(), sorted(leaf.get_classes().items()))
+                  for leaf in histogram_tree.get_leaves_nodes()) == expected_leaves
+    sunny_node = [node for node in histogram_tree.get_nodes() if node.get_label() == 'Outlook = sunny'][0]
+    assert sunny_node.get_node_attributes().threshold == 70.0
+
+def test_histogram_few_bins(paper_dataset, paper_attributes_map):
+    decision_tree = DecisionTree(dict(paper_attributes_map))
+    TrainingHandler(decision_tree, TrainingAttributes(min_instances=1),
+                    split_strategy='histogram', n_bins=2).split_dataset(paper_dataset)
+    for node in decision_tree.get_nodes():
+        if isinstance(node, DecisionNodeContinuous):
+            assert node.get_node_attributes().threshold in paper_dataset[node.get_attribute()].to_numpy()
+
+def test_wrong_split_strategy(paper_attributes_map):
+    with pytest.raises(ValueError):
+        TrainingHandler(DecisionTree(dict(paper_attributes_map)), TrainingAttributes(), split_strategy='random')
+    with pytest.raises(ValueError):
+        TrainingHandler(DecisionTree(dict(paper_attributes_map)), TrainingAttributes(),
+                        split_strategy='histogram', n_bins=1)
+
+def test_wrong_growth_order(paper_attributes_map):
+    with pytest.raises(ValueError):
+        TrainingHandler(DecisionTree(paper_attributes_map), TrainingAttributes(), growth_order='random')